@@ -0,0 +1,171 @@
+import json
+import sqlite3
+import threading
+import zlib
+from typing import Dict, Iterator, List, Optional
+
+from web3 import Web3
+
+from provider import BaseProvider, Web3Provider, make_tx
+from type import TxDict
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS txs (
+    txhash TEXT PRIMARY KEY,
+    blknum INTEGER NOT NULL,
+    txpos INTEGER NOT NULL,
+    payload BLOB NOT NULL
+);
+CREATE INDEX IF NOT EXISTS txs_blknum ON txs (blknum, txpos);
+CREATE TABLE IF NOT EXISTS blocks (
+    blknum INTEGER PRIMARY KEY,
+    payload BLOB NOT NULL
+);
+"""
+
+
+def _pack(payload: Dict) -> bytes:
+    return zlib.compress(Web3.toJSON(payload).encode(), 6)
+
+
+def _unpack(blob: bytes) -> Dict:
+    return json.loads(zlib.decompress(blob))
+
+
+class ArchiveProvider(BaseProvider):
+    """
+    Record/replay provider backed by a local SQLite archive.
+
+    The raw transaction, receipt and block header payloads are stored as
+    zlib compressed JSON, indexed by txhash and block number. With an
+    `upstream` provider, misses are fetched and recorded; without one the
+    archive replays offline at disk speed, which also makes it a fixture
+    source for tests and benchmarks.
+
+    Blocks are always recorded whole, their header keeps the hashes of its
+    transactions so that replaying a block that is missing some of them
+    raises instead of returning it partially.
+    """
+
+    def __init__(self, path: str, upstream: Optional[Web3Provider] = None) -> None:
+        super().__init__()
+        self.upstream = upstream
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+
+    def record_block(self, blknum: int) -> List[TxDict]:
+        """
+        Fetches a block with all its transactions and receipts from the
+        upstream provider and archives it.
+        """
+        block, rtns = self.upstream.get_raw_block(blknum)
+        raws = list(zip(block["transactions"], rtns))
+        txs = [make_tx(tx, rtn, block["timestamp"]) for tx, rtn in raws]
+        header = {k: v for k, v in block.items() if k != "transactions"}
+        header["transactions"] = [tx["txhash"] for tx in txs]
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO blocks (blknum, payload) VALUES (?, ?)",
+                (blknum, _pack(header)),
+            )
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO txs (txhash, blknum, txpos, payload) "
+                "VALUES (?, ?, ?, ?)",
+                [
+                    (
+                        tx["txhash"].lower(),
+                        blknum,
+                        rtn["transactionIndex"],
+                        _pack({"tx": raw_tx, "receipt": rtn}),
+                    )
+                    for tx, (raw_tx, rtn) in zip(txs, raws)
+                ],
+            )
+        return txs
+
+    def record(self, txhash: str) -> TxDict:
+        """
+        Archives the whole block of a transaction and returns the transaction.
+        """
+        blknum = self.upstream.w3.eth.get_transaction_receipt(txhash)["blockNumber"]
+        for tx in self.record_block(blknum):
+            if tx["txhash"].lower() == txhash.lower():
+                return tx
+        raise KeyError(f"Transaction {txhash} is not in block {blknum}")
+
+    def _block_headers(self, start: int, end: int) -> Dict[int, Dict]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT blknum, payload FROM blocks WHERE blknum BETWEEN ? AND ?",
+                (start, end),
+            ).fetchall()
+        return {blknum: _unpack(payload) for blknum, payload in rows}
+
+    def get_tx_by_hash(self, txhash: str) -> TxDict:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT blknum, payload FROM txs WHERE txhash = ?", (txhash.lower(),)
+            ).fetchone()
+        if row is None:
+            if self.upstream is None:
+                raise KeyError(f"Transaction {txhash} is not archived")
+            return self.record(txhash)
+        blknum, payload = row
+        raw = _unpack(payload)
+        timestamp = self._block_headers(blknum, blknum)[blknum]["timestamp"]
+        return make_tx(raw["tx"], raw["receipt"], timestamp)
+
+    def get_txs_by_block(self, blknum: int) -> List[TxDict]:
+        return list(self.iter_txs_by_range(blknum, blknum))
+
+    def _missing_blocks(
+        self, headers: Dict[int, Dict], start: int, end: int
+    ) -> Iterator[int]:
+        with self._lock:
+            counts = dict(
+                self._conn.execute(
+                    "SELECT blknum, COUNT(*) FROM txs WHERE blknum BETWEEN ? AND ? "
+                    "GROUP BY blknum",
+                    (start, end),
+                ).fetchall()
+            )
+        for blknum in range(start, end + 1):
+            header = headers.get(blknum)
+            # Archives written before whole blocks were recorded have no hashes
+            if header is None or "transactions" not in header:
+                yield blknum
+            elif len(header["transactions"]) != counts.get(blknum, 0):
+                yield blknum
+
+    def iter_txs_by_range(self, start: int, end: int) -> Iterator[TxDict]:
+        """
+        Replays the archived transactions of blocks [start, end] in order.
+
+        Blocks that are not archived, or only partly, are recorded first when
+        there is an upstream provider. Without one a `KeyError` is raised
+        before any transaction is yielded.
+        """
+        headers = self._block_headers(start, end)
+        missing = list(self._missing_blocks(headers, start, end))
+        if missing:
+            if self.upstream is None:
+                raise KeyError(
+                    f"{len(missing)} blocks in [{start}, {end}] are not fully "
+                    f"archived, first {missing[0]}"
+                )
+            for blknum in missing:
+                self.record_block(blknum)
+            headers = self._block_headers(start, end)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT blknum, payload FROM txs WHERE blknum BETWEEN ? AND ? "
+                "ORDER BY blknum, txpos",
+                (start, end),
+            ).fetchall()
+        for blknum, payload in rows:
+            raw = _unpack(payload)
+            yield make_tx(raw["tx"], raw["receipt"], headers[blknum]["timestamp"])
+
+    def close(self) -> None:
+        self._conn.close()
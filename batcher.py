@@ -0,0 +1,156 @@
+import logging
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Type
+
+from multicall import Call, Multicall
+
+from ratelimit import is_rate_limited
+
+# Rough gas cost of a simple view call (decimals(), token0(), ...) inside an aggregate
+DEFAULT_CALL_GAS = 50_000
+
+
+class MulticallBatcher:
+    """
+    Splits Multicall aggregates into bounded chunks and isolates failing calls.
+
+    Every chunk is first sent as one tolerant aggregate. Transport and
+    rate-limit errors are retried with exponential backoff, then raised: an
+    outage fails the fetch at once. Any other failure of a chunk (e.g. a
+    non-conforming token breaking the whole aggregate) is bisected until the
+    offending calls are isolated, so the remaining calls still resolve.
+    """
+
+    def __init__(
+        self,
+        mc: Multicall,
+        max_calls: int = 500,
+        max_gas: int = 25_000_000,
+        call_gas: Dict[str, int] = None,
+        max_retries: int = 3,
+        backoff: float = 0.5,
+        retry_on: Tuple[Type[Exception], ...] = (OSError,),
+        logger: logging.Logger = None,
+    ) -> None:
+        self.mc = mc
+        self.max_calls = max_calls
+        self.max_gas = max_gas
+        self.call_gas = call_gas or {}
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.retry_on = retry_on
+        self.logger = logger
+
+    def _is_transient(self, e: Exception) -> bool:
+        return isinstance(e, self.retry_on) or is_rate_limited(e)
+
+    def _estimate_gas(self, call: Call) -> int:
+        return self.call_gas.get(call.function, DEFAULT_CALL_GAS)
+
+    def _chunks(
+        self, calls: Sequence[Tuple[int, Call]]
+    ) -> Iterator[List[Tuple[int, Call]]]:
+        chunk, gas = [], 0
+        for item in calls:
+            call_gas = self._estimate_gas(item[1])
+            full = len(chunk) >= self.max_calls or gas + call_gas > self.max_gas
+            if chunk and full:
+                yield chunk
+                chunk, gas = [], 0
+            chunk.append(item)
+            gas += call_gas
+        if chunk:
+            yield chunk
+
+    def _agg(self, calls: List[Tuple[int, Call]], block: Optional[int]) -> List[Dict]:
+        # Tag every call with its position so results map back even when the
+        # aggregate drops or reorders failed calls
+        tagged = [
+            Call(
+                target=call.target,
+                function=call.function,
+                args=call.args,
+                request_id=idx,
+            )
+            for idx, call in calls
+        ]
+        kwargs = {} if block is None else {"block_identifier": block}
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self.mc.agg(tagged, **kwargs)
+            except Exception as e:
+                if not self._is_transient(e) or attempt == self.max_retries:
+                    raise
+                delay = self.backoff * 2**attempt
+                if self.logger:
+                    self.logger.warning(
+                        f"Multicall of {len(tagged)} calls failed ({e}), "
+                        f"retry in {delay}s"
+                    )
+                time.sleep(delay)
+
+    def _resolve(
+        self,
+        calls: List[Tuple[int, Call]],
+        block: Optional[int],
+        results: Dict[int, Any],
+    ) -> None:
+        try:
+            items = self._agg(calls, block)
+        except Exception as e:
+            if self._is_transient(e):
+                # Bisecting an outage would only multiply the retries
+                raise
+            if len(calls) == 1:
+                if self.logger:
+                    _, call = calls[0]
+                    self.logger.warning(
+                        f"Call {call.function} on {call.target} failed: {e}"
+                    )
+                return
+            mid = len(calls) // 2
+            self._resolve(calls[:mid], block, results)
+            self._resolve(calls[mid:], block, results)
+            return
+        for item in items:
+            if item.get("result") is not None:
+                results[item["request_id"]] = item["result"]
+
+    def fetch(
+        self, calls: Sequence[Call], block: Optional[int] = None
+    ) -> List[Optional[Any]]:
+        """
+        Executes the calls and returns their results in input order.
+
+        Parameters
+        ----------
+        calls : Sequence[Call]
+            Calls to aggregate, possibly more than fits into one Multicall.
+        block : Optional[int]
+            The block number to execute the calls at, defaults to latest.
+
+        Returns
+        -------
+        List[Optional[Any]]
+            The result of each call, or None if the call failed.
+
+        Raises
+        ------
+        Exception
+            The transport or rate-limit error still failing after the retries.
+
+        """
+        results: Dict[int, Any] = {}
+        for chunk in self._chunks(list(enumerate(calls))):
+            self._resolve(chunk, block, results)
+        return [results.get(idx) for idx in range(len(calls))]
+
+    def agg(self, calls: Sequence[Call], block: Optional[int] = None) -> List[Dict]:
+        """
+        Drop-in replacement of `Multicall.agg`, failed calls are omitted.
+        """
+        return [
+            {"request_id": call.request_id, "result": result}
+            for call, result in zip(calls, self.fetch(calls, block))
+            if result is not None
+        ]
@@ -0,0 +1,73 @@
+from typing import Iterable, List, TypeVar, Union
+
+from eth_utils import keccak
+
+T = TypeVar("T")
+
+BloomValue = Union[str, bytes, int]
+
+
+def bloom_mask(item: bytes) -> int:
+    """
+    Returns the 2048 bits bloom mask of an address or topic (yellow paper M3:2048).
+
+    Parameters
+    ----------
+    item : bytes
+        The raw address (20 bytes) or topic (32 bytes).
+
+    Returns
+    -------
+    int
+        The mask with the 3 bits the item sets in a `logsBloom`.
+
+    """
+    digest = keccak(item)
+    mask = 0
+    for i in (0, 2, 4):
+        mask |= 1 << (((digest[i] << 8) | digest[i + 1]) & 2047)
+    return mask
+
+
+def _hex_to_bytes(value: str) -> bytes:
+    return bytes.fromhex(value[2:] if value.startswith("0x") else value)
+
+
+def _bloom_to_int(bloom: BloomValue) -> int:
+    if isinstance(bloom, int):
+        return bloom
+    if isinstance(bloom, str):
+        return int(bloom, 16)
+    return int.from_bytes(bloom, "big")
+
+
+class BloomFilter:
+    """
+    Tests `logsBloom` of block headers or receipts against the registered
+    topic0s and, optionally, the known protocol addresses.
+
+    A bloom never has false negatives, so anything that does not match can be
+    skipped without fetching its receipts.
+    """
+
+    def __init__(self, topics: Iterable[str], addresses: Iterable[str] = ()) -> None:
+        self.topic_masks = [bloom_mask(_hex_to_bytes(t)) for t in topics]
+        self.address_masks = [bloom_mask(_hex_to_bytes(a)) for a in addresses]
+
+    def matches(self, bloom: BloomValue) -> bool:
+        value = _bloom_to_int(bloom)
+        if self.topic_masks and not any(
+            value & mask == mask for mask in self.topic_masks
+        ):
+            return False
+        if self.address_masks and not any(
+            value & mask == mask for mask in self.address_masks
+        ):
+            return False
+        return True
+
+    def filter(self, items: Iterable[T], key: str = "logsBloom") -> List[T]:
+        """
+        Keeps the headers (or receipts) whose bloom may contain a match.
+        """
+        return [item for item in items if self.matches(item[key])]
@@ -0,0 +1,380 @@
+import fcntl
+import hashlib
+import json
+import logging
+import os
+import struct
+import tempfile
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+from typing import (
+    Any,
+    Dict,
+    Hashable,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    TextIO,
+    Tuple,
+)
+
+from multicall import Call
+
+from utils import dump_json_atomic
+
+CacheKey = Tuple[Hashable, ...]
+
+
+def make_call_key(call: Call, block: Optional[int] = None) -> CacheKey:
+    """
+    Builds the cache key of an on-chain read.
+
+    Parameters
+    ----------
+    call : Call
+        The Multicall call.
+    block : Optional[int]
+        The block the call is pinned to, None for immutable state which is
+        the same at every block.
+
+    Returns
+    -------
+    CacheKey
+        (target, call) for immutable state, (target, call, block) otherwise.
+
+    """
+    key = (call.target.lower(), call.function, tuple(call.args or ()))
+    return key if block is None else key + (block,)
+
+
+def _is_snapshotable(key: CacheKey, value: Any) -> bool:
+    # Only immutable entries with JSON scalar arguments and values
+    return (
+        len(key) == 3
+        and isinstance(value, (int, str))
+        and all(isinstance(arg, (int, str)) for arg in key[2])
+    )
+
+
+class CallCache:
+    """
+    Thread-safe LRU cache of on-chain call results.
+
+    With a `path`, immutable entries (token decimals, pool tokens) are loaded
+    from a snapshot at startup and `save` writes them back. An unreadable
+    snapshot is logged and skipped.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 100_000,
+        path: str = None,
+        logger: logging.Logger = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.path = path
+        self.logger = logger
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict[CacheKey, Any] = OrderedDict()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            self._restore(path)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: CacheKey) -> Optional[Any]:
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: CacheKey, value: Any) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def snapshot(self) -> List[Tuple[CacheKey, Any]]:
+        with self._lock:
+            items = list(self._data.items())
+        return [(key, value) for key, value in items if _is_snapshotable(key, value)]
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        entries = [
+            [target, function, list(args), value]
+            for (target, function, args), value in self.snapshot()
+        ]
+        dump_json_atomic(entries, path)
+
+    def load(self, path: str) -> None:
+        with open(path, "r") as f:
+            entries = json.load(f)
+        for target, function, args, value in entries:
+            self.set((target, function, tuple(args)), value)
+
+    def _restore(self, path: str) -> None:
+        try:
+            self.load(path)
+        except (OSError, ValueError, TypeError) as e:
+            # A corrupt snapshot only costs the warm start
+            if self.logger:
+                self.logger.warning(f"Ignoring call cache snapshot {path}: {e}")
+
+
+# magic, number of slots, number of entries
+_HEADER = struct.Struct("<4sIQ")
+# Checksummed addresses are the longest values
+_MAX_VALUE = 42
+# seq, key fingerprint, value type, value length, value
+_SLOT = struct.Struct(f"<I16sBB{_MAX_VALUE}s")
+_SEQ = struct.Struct("<I")
+_MAGIC = b"DFCC"
+_EMPTY, _INT, _STR = 0, 1, 2
+
+
+def _encode(value: Any) -> Optional[Tuple[int, bytes]]:
+    if isinstance(value, bool):
+        return None
+    if isinstance(value, int) and -(2**63) <= value < 2**63:
+        return _INT, value.to_bytes(8, "little", signed=True)
+    if isinstance(value, str):
+        data = value.encode()
+        if len(data) <= _MAX_VALUE:
+            return _STR, data
+    return None
+
+
+def _decode(kind: int, data: bytes) -> Any:
+    if kind == _INT:
+        return int.from_bytes(data[:8], "little", signed=True)
+    return data.decode()
+
+
+class SharedCallCache(CallCache):
+    """
+    CallCache whose immutable entries (token decimals, pool tokens) are shared
+    by every process opening the same `name`.
+
+    The entries live in a fixed-size open addressing table in shared memory.
+    Entries are never overwritten, writers serialize on a file lock and each
+    slot carries a sequence number, odd while it is being written, so reads
+    take no lock and retry on a torn slot. Entries of mutable state, or which
+    do not fit a slot, stay in the per-process LRU.
+    """
+
+    def __init__(
+        self,
+        name: str = "deficodex-calls",
+        slots: int = 1 << 20,
+        max_probes: int = 32,
+        maxsize: int = 100_000,
+        path: str = None,
+        logger: logging.Logger = None,
+    ) -> None:
+        super().__init__(maxsize, logger=logger)
+        self.name = name
+        self.max_probes = max_probes
+        size = _HEADER.size + slots * _SLOT.size
+        self._lock_file = open(
+            os.path.join(tempfile.gettempdir(), f"{name}.lock"), "a+b"
+        )
+        with self._locked():
+            try:
+                self._shm = shared_memory.SharedMemory(name, create=True, size=size)
+                _HEADER.pack_into(self._shm.buf, 0, _MAGIC, slots, 0)
+            except FileExistsError:
+                self._shm = shared_memory.SharedMemory(name)
+        # The table must outlive whichever process happened to create it
+        resource_tracker.unregister(self._shm._name, "shared_memory")
+        magic, self.slots, _ = _HEADER.unpack_from(self._shm.buf, 0)
+        if magic != _MAGIC:
+            raise ValueError(f"Shared memory {name} is not a call cache")
+        # Entries this process put in the table, for its snapshots
+        self._published: Dict[CacheKey, Any] = {}
+        self.path = path
+        if path and os.path.exists(path):
+            self._restore(path)
+
+    def __len__(self) -> int:
+        return _HEADER.unpack_from(self._shm.buf, 0)[2] + len(self._data)
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def _probe(self, fingerprint: bytes) -> Iterable[int]:
+        start = int.from_bytes(fingerprint[:8], "little") % self.slots
+        for i in range(min(self.max_probes, self.slots)):
+            yield _HEADER.size + (start + i) % self.slots * _SLOT.size
+
+    def _read(self, offset: int) -> Tuple[bytes, int, bytes]:
+        buf = self._shm.buf
+        for _ in range(1000):
+            seq = _SEQ.unpack_from(buf, offset)[0]
+            if seq & 1:
+                continue
+            _, fingerprint, kind, length, data = _SLOT.unpack_from(buf, offset)
+            if _SEQ.unpack_from(buf, offset)[0] == seq:
+                return fingerprint, kind, data[:length]
+        # The writer died mid-write, read the slot as empty
+        return b"", _EMPTY, b""
+
+    def _get_shared(self, fingerprint: bytes) -> Optional[Any]:
+        for offset in self._probe(fingerprint):
+            slot_fingerprint, kind, data = self._read(offset)
+            if kind == _EMPTY:
+                return None
+            if slot_fingerprint == fingerprint:
+                return _decode(kind, data)
+        return None
+
+    def _set_shared(self, fingerprint: bytes, kind: int, data: bytes) -> bool:
+        buf = self._shm.buf
+        with self._locked():
+            for offset in self._probe(fingerprint):
+                seq, slot_fingerprint, slot_kind, _, _ = _SLOT.unpack_from(buf, offset)
+                if slot_kind != _EMPTY:
+                    if slot_fingerprint == fingerprint:
+                        return True
+                    continue
+                _SEQ.pack_into(buf, offset, seq + 1)
+                _SLOT.pack_into(
+                    buf, offset, seq + 1, fingerprint, kind, len(data), data
+                )
+                _SEQ.pack_into(buf, offset, seq + 2)
+                magic, slots, count = _HEADER.unpack_from(buf, 0)
+                _HEADER.pack_into(buf, 0, magic, slots, count + 1)
+                return True
+        # Too many collisions, the table is nearly full
+        return False
+
+    @staticmethod
+    def _fingerprint(key: CacheKey) -> bytes:
+        return hashlib.blake2b(repr(key).encode(), digest_size=16).digest()
+
+    def get(self, key: CacheKey) -> Optional[Any]:
+        if len(key) == 3:
+            value = self._get_shared(self._fingerprint(key))
+            if value is not None:
+                self.hits += 1
+                return value
+        return super().get(key)
+
+    def set(self, key: CacheKey, value: Any) -> None:
+        encoded = _encode(value) if len(key) == 3 else None
+        if encoded is None or not self._set_shared(self._fingerprint(key), *encoded):
+            super().set(key, value)
+        elif _is_snapshotable(key, value):
+            with self._lock:
+                self._published[key] = value
+
+    def snapshot(self) -> List[Tuple[CacheKey, Any]]:
+        with self._lock:
+            published = list(self._published.items())
+        return super().snapshot() + published
+
+    def close(self) -> None:
+        self._shm.close()
+        self._lock_file.close()
+
+    def unlink(self) -> None:
+        """
+        Removes the shared table, once every process is done with it.
+        """
+        # unlink() unregisters the segment again
+        resource_tracker.register(self._shm._name, "shared_memory")
+        self._shm.unlink()
+
+
+class Position(NamedTuple):
+    token0: str
+    token1: str
+    fee: int
+
+
+class PositionIndex:
+    """
+    Index of Uniswap V3 position metadata keyed by (position manager, tokenId).
+
+    The tokens and fee of a position never change, so learned entries are
+    appended to a JSON lines file and reloaded on the next run. Lines that do
+    not parse, such as one torn by a crash mid-write, are skipped.
+    """
+
+    def __init__(self, path: str = None, logger: logging.Logger = None) -> None:
+        self.path = path
+        self.logger = logger
+        self._positions: Dict[Tuple[str, int], Position] = {}
+        self._lock = threading.Lock()
+        self._file: Optional[TextIO] = None
+        # Whether the file ends mid-line, the next append starts a new one
+        self._torn = False
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def _load(self, path: str) -> None:
+        skipped = 0
+        with open(path, "r") as f:
+            for line in f:
+                self._torn = not line.endswith("\n")
+                try:
+                    item = json.loads(line)
+                    key = (item["manager"], item["token_id"])
+                    position = Position(item["token0"], item["token1"], item["fee"])
+                except (ValueError, KeyError, TypeError):
+                    skipped += 1
+                    continue
+                self._positions[key] = position
+        if skipped and self.logger:
+            self.logger.warning(f"Skipped {skipped} corrupt lines in {path}")
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    def get(self, manager: str, token_id: int) -> Optional[Position]:
+        return self._positions.get((manager.lower(), token_id))
+
+    def missing(self, keys: Iterable[Tuple[str, int]]) -> List[Tuple[str, int]]:
+        return [
+            (manager, token_id)
+            for manager, token_id in keys
+            if (manager.lower(), token_id) not in self._positions
+        ]
+
+    def add(self, manager: str, token_id: int, position: Position) -> None:
+        manager = manager.lower()
+        with self._lock:
+            if (manager, token_id) in self._positions:
+                return
+            self._positions[(manager, token_id)] = position
+            if self.path:
+                if self._file is None:
+                    self._file = open(self.path, "a")
+                    if self._torn:
+                        self._file.write("\n")
+                item = {"manager": manager, "token_id": token_id}
+                item.update(position._asdict())
+                self._file.write(json.dumps(item) + "\n")
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,185 @@
+import json
+from collections import defaultdict
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Dict,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Tuple,
+    TypedDict,
+)
+
+from eth_abi import decode
+
+from utils import decode_hex_to_utf8
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+InputKind = Literal["empty", "known", "text", "unknown"]
+DecodedInput = TypedDict(
+    "DecodedInput",
+    {
+        "kind": InputKind,
+        "selector": str,
+        "text_sign": str,
+        "params": Dict[str, Any],
+        "message": str,
+    },
+)
+
+
+def abi_type(param: Dict) -> str:
+    """
+    Returns the canonical ABI type of a parameter, expanding tuples.
+
+    Parameters
+    ----------
+    param : Dict
+        The ABI parameter, e.g. {"type": "tuple[]", "components": [...]}.
+
+    Returns
+    -------
+    str
+        The canonical type, e.g. "(address,uint256)[]".
+
+    """
+    typ = param["type"]
+    if typ.startswith("tuple"):
+        components = ",".join(abi_type(c) for c in param.get("components", []))
+        return f"({components}){typ[len('tuple'):]}"
+    return typ
+
+
+def _to_text(value: Any) -> Any:
+    if isinstance(value, (bytes, bytearray)):
+        return "0x" + value.hex()
+    if isinstance(value, (list, tuple)):
+        return tuple(_to_text(v) for v in value)
+    return value
+
+
+class FunctionPlan:
+    """
+    Argument layout of a function, compiled once per selector.
+    """
+
+    __slots__ = ("text_sign", "names", "types")
+
+    def __init__(self, text_sign: str, abi: Dict) -> None:
+        inputs = abi.get("inputs", [])
+        self.text_sign = text_sign
+        self.names = tuple(
+            inp.get("name") or f"__idx_{idx}" for idx, inp in enumerate(inputs)
+        )
+        self.types = tuple(abi_type(inp) for inp in inputs)
+
+    def decode(self, args: bytes) -> Dict[str, Any]:
+        values = decode(self.types, args)
+        return {name: _to_text(value) for name, value in zip(self.names, values)}
+
+
+class CalldataDecoder:
+    """
+    Decodes transaction input with an O(1) selector index over `func_sign.csv`.
+    """
+
+    def __init__(self, evt_df: "pd.DataFrame") -> None:
+        # Function selectors are 4 bytes, event topics are 32 bytes
+        rows = evt_df[evt_df["byte_sign"].str.len() == 10]
+        rows = rows.drop_duplicates("byte_sign")
+        self._selectors: Dict[str, Tuple[str, str]] = dict(
+            zip(rows["byte_sign"], zip(rows["abi"], rows["text_sign"]))
+        )
+        self._plans: Dict[str, Optional[FunctionPlan]] = {}
+
+    def get_plan(self, selector: str) -> Optional[FunctionPlan]:
+        if selector in self._plans:
+            return self._plans[selector]
+        plan = None
+        entry = self._selectors.get(selector)
+        if entry is not None:
+            abi, text_sign = entry
+            try:
+                plan = FunctionPlan(text_sign, json.loads(abi))
+            except (TypeError, ValueError, KeyError):
+                plan = None
+        self._plans[selector] = plan
+        return plan
+
+    def classify(self, input: str) -> InputKind:
+        """
+        Classifies input without decoding it.
+
+        ABI encoded calls are a 4 bytes selector followed by 32 bytes words, so
+        input with a known selector and word aligned is a call. Anything else
+        is only tried as printable UTF-8 text when it holds no NUL byte: the
+        words of a call are zero padded, while text never contains one, so
+        unknown calls are told apart without decoding their whole payload.
+        """
+        if not input or input == "0x":
+            return "empty"
+        known = input[:10].lower() in self._selectors
+        if known and len(input) >= 10 and (len(input) - 10) % 64 == 0:
+            return "known"
+        fallback: InputKind = "known" if known else "unknown"
+        try:
+            data = bytes.fromhex(input[2:] if input.startswith("0x") else input)
+        except ValueError:
+            return fallback
+        if b"\0" in data:
+            return fallback
+        try:
+            text = data.decode("utf-8")
+        except UnicodeDecodeError:
+            return fallback
+        if all(c.isprintable() or c.isspace() for c in text):
+            return "text"
+        return fallback
+
+    def _decode(
+        self, input: str, kind: InputKind, plan: Optional[FunctionPlan]
+    ) -> DecodedInput:
+        result: DecodedInput = {
+            "kind": kind,
+            "selector": input[:10].lower() if kind != "empty" else "",
+            "text_sign": "",
+            "params": {},
+            "message": "",
+        }
+        if kind == "text":
+            result["message"] = decode_hex_to_utf8(input)
+        elif kind == "known" and plan is not None:
+            result["text_sign"] = plan.text_sign
+            try:
+                result["params"] = plan.decode(bytes.fromhex(input[10:]))
+            except Exception:
+                # Selector collision or malformed arguments, keep the name only
+                pass
+        return result
+
+    def decode(self, input: str) -> DecodedInput:
+        kind = self.classify(input)
+        plan = self.get_plan(input[:10].lower()) if kind == "known" else None
+        return self._decode(input, kind, plan)
+
+    def decode_batch(self, inputs: Sequence[str]) -> List[DecodedInput]:
+        """
+        Decodes many inputs, resolving the plan once per shared selector.
+        """
+        groups: Dict[str, List[int]] = defaultdict(list)
+        results: List[Optional[DecodedInput]] = [None] * len(inputs)
+        for idx, input in enumerate(inputs):
+            kind = self.classify(input)
+            if kind == "known":
+                groups[input[:10].lower()].append(idx)
+            else:
+                results[idx] = self._decode(input, kind, None)
+        for selector, indices in groups.items():
+            plan = self.get_plan(selector)
+            for idx in indices:
+                results[idx] = self._decode(inputs[idx], "known", plan)
+        return results
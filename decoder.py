@@ -1,19 +1,77 @@
-from typing import Callable, Dict, TypedDict, List, Tuple, Union
-from model import Log
-from utils import get_addr_entry
-import pandas as pd
-import logging
+import asyncio
+import importlib
 import json
-from multicall import Multicall, Call
 import logging
-from type import LogDict
-from typing import Dict, List, Tuple, Union
-from itertools import chain
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import chain, islice
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    AsyncIterable,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    TypedDict,
+    Union,
+)
+
 from eth_abi import decode
-from concurrent.futures import ThreadPoolExecutor
+from eth_utils import event_signature_to_log_topic
+from multicall import Call, Multicall
+
+from batcher import MulticallBatcher
+from bloom import BloomFilter
+from cache import CallCache, make_call_key
+from calldata import abi_type
+from protocols import PROTOCOLS, TOPICS, load_protocol
+from quarantine import LookupFailed, Quarantine
+from type import LogDict
+from utils import TokenScale, make_token_scale
+
+if TYPE_CHECKING:
+    import pandas as pd
 
 HandleEventFunc = Callable[[Dict], str]
-EventPayload = TypedDict("EventPayload", {"address": str, "params": Dict})
+EventPayload = TypedDict(
+    "EventPayload", {"address": str, "blknum": Optional[int], "params": Dict}
+)
+
+
+def event(event_sig: str) -> Callable[[Callable], Callable]:
+    """
+    Declares a decoder method as the handler of an event.
+
+    The topic0 is computed once, when the decorated class is defined.
+
+    Parameters
+    ----------
+    event_sig : str
+        The canonical event signature, e.g. "Transfer(address,address,uint256)".
+
+    Returns
+    -------
+    Callable[[Callable], Callable]
+        The decorator, which tags the method with `event_sig` and `topic0`.
+
+    """
+    topic0 = "0x" + event_signature_to_log_topic(event_sig).hex()
+
+    def wrap(func: Callable) -> Callable:
+        func.event_sig = event_sig
+        func.topic0 = topic0
+        return func
+
+    return wrap
 
 
 def eth_decode_log(event_abi: Dict, topics: List[str], data: str) -> Tuple[str, Dict]:
@@ -197,665 +255,194 @@ def _convert_bytes_to_hex(parameters: Dict) -> None:
             parameters[key] = tuple(e.hex() for e in val)
 
 
-class BaseDecoder:
-    def __init__(
-        self,
-        mc: Multicall,
-        logger: logging.Logger = None,
-    ):
-        self.mc = mc
-        self.logger = logger
-
-    def _get_token_decimals(self, addrs: Union[List[str], str]) -> List[int]:
-        if isinstance(addrs, str):
-            addrs = [addrs]
-
-        calls = [Call(target=addr, function="decimals()(uint8)") for addr in addrs]
-
-        result = self.mc.agg(calls)
-        return [item["result"] for item in result]
-
-
-class BaseUniswapDecoder(BaseDecoder):
-    def _get_token_pair(self, pool_addr: str) -> Tuple[str, str]:
-        result = self.mc.agg(
-            [
-                Call(
-                    target=pool_addr,
-                    function="token0()(address)",
-                    request_id="token0",
-                ),
-                Call(
-                    target=pool_addr,
-                    function="token1()(address)",
-                    request_id="token1",
-                ),
-            ]
-        )
-        token_map = {item["request_id"]: item["result"] for item in result}
-        return token_map["token0"], token_map["token1"]
-
-
-class UniswapV2Decoder(BaseUniswapDecoder):
-    def __init__(
-        self,
-        mc: Multicall,
-        logger: logging.Logger = None,
-    ) -> None:
-        super().__init__(mc, logger)
-
-    def swap(self) -> Tuple[str, HandleEventFunc]:
-        # Swap(address indexed sender,uint amount0In, uint amount1In, uint amount0Out, uint amount1Out, address indexed to);
-        event_sig = "Swap(address,uint256,uint256,uint256,uint256,address)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Swap {get_amount} {get_token} for {pay_amount} {pay_token}  on UniswapV2"
-            token0_addr, token1_addr = self._get_token_pair(payload["address"])
-            token0_decimals, token1_decimals = self._get_token_decimals(
-                [token0_addr, token1_addr]
-            )
-            params = payload["params"]
-            amount0_diff = int(params["amount0Out"]) - int(params["amount0In"])
-            amount1_diff = int(params["amount1Out"]) - int(params["amount1In"])
-            if amount0_diff > 0:
-                return template.format(
-                    pay_amount=abs(amount0_diff / 10**token0_decimals),
-                    pay_token=get_addr_entry(token0_addr),
-                    get_amount=abs(amount1_diff / 10**token1_decimals),
-                    get_token=get_addr_entry(token1_addr),
-                )
-            else:
-                return template.format(
-                    pay_amount=abs(amount1_diff / 10**token1_decimals),
-                    pay_token=get_addr_entry(token1_addr),
-                    get_amount=abs(amount0_diff / 10**token0_decimals),
-                    get_token=get_addr_entry(token0_addr),
-                )
-
-        return event_sig, decoder
-
-    def pair_created(self) -> tuple[str, HandleEventFunc]:
-        # PairCreated(address indexed token0, address indexed token1, address pair, uint);
-        event_sig = "PairCreated(address,address,address,uint256)"
-
-        def decoder(payload: EventPayload) -> str:
-            token0 = get_addr_entry(payload["params"]["token0"])
-            token1 = get_addr_entry(payload["params"]["token1"])
-            return f"Created {token0}/{token1} pair"
-
-        return event_sig, decoder
-
-    def mint(self) -> tuple[str, HandleEventFunc]:
-        # Mint(address indexed sender, uint amount0, uint amount1);
-        event_sig = "Mint(address,uint256,uint256)"
-
-        def decoder(payload: EventPayload) -> str:
-            token0_addr, token1_addr = self._get_token_pair(payload["address"])
-            token0_decimals, token1_decimals = self._get_token_decimals(
-                [token0_addr, token1_addr]
-            )
-            params = payload["params"]
-            return ""
-
-        return event_sig, decoder
-
-    def burn(self) -> tuple[str, HandleEventFunc]:
-        # Burn(address indexed sender, uint amount0, uint amount1, address indexed to);
-        event_sig = "Burn(address,uint256,uint256,address)"
-
-        def decoder(payload: EventPayload) -> str:
-            token0_addr, token1_addr = self._get_token_pair(payload["address"])
-            token0_decimals, token1_decimals = self._get_token_decimals(
-                [token0_addr, token1_addr]
-            )
-            params = payload["params"]
-            return ""
-
-        return event_sig, decoder
-
-
-class UniswapV3Decoder(BaseUniswapDecoder):
+class EventPlan:
     """
-    https://docs.uniswap.org/contracts/v3/reference/core/interfaces/pool/IUniswapV3PoolEvents
+    Decoding layout of one event ABI variant, compiled once.
     """
 
-    def __init__(self, mc: Multicall, logger: logging.Logger = None):
-        super().__init__(mc, logger)
-
-    def _get_tokens_by_position(self, pool_addr: str, pos_id: int) -> Tuple[str, str]:
-        result = self.mc.agg(
-            [
-                Call(
-                    target=pool_addr,
-                    function="positions(uint256)(uint96,address,address,address,uint24,int24,int24,uint128,uint256,uint256,uint128,uint128)",
-                    args=[pos_id],
-                    request_id="positions",
-                ),
-            ]
-        )
-        if len(result) != 1:
-            raise ValueError(f"Cannot find position {pos_id} in {pool_addr}")
-        result = result[0]["result"]
-        token0_addr, token1_addr = result[2], result[3]
-        return token0_addr, token1_addr
-
-    def pool_created(self) -> tuple[str, HandleEventFunc]:
-        # PoolCreated(address token0,address token1,uint24 fee,int24 tickSpacing,address pool)
-        event_sig = "PoolCreated(address,address,uint24,int24,address)"
-
-        def decoder(payload: EventPayload) -> str:
-            token0 = get_addr_entry(payload["params"]["token0"])
-            token1 = get_addr_entry(payload["params"]["token1"])
-            return f"Created {token0}/{token1} pool with {payload['params']['fee']/ 100}% fee"
-
-        return event_sig, decoder
-
-    def increase_liquidity(self) -> tuple[str, HandleEventFunc]:
-        # IncreaseLiquidity(uint256 indexed tokenId, uint128 liquidity, uint256 amount0, uint256 amount1);
-        event_sig = "IncreaseLiquidity(uint256,uint128,uint256,uint256)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = (
-                "Add {amount0} {token0} and {amount1} {token1} liquidity to {pool}"
-            )
-            params = payload["params"]
-            token0_addr, token1_addr = self._get_tokens_by_position(
-                payload["address"], params["tokenId"]
-            )
-            token0_decimals, token1_decimals = self._get_token_decimals(
-                [token0_addr, token1_addr]
-            )
-            return template.format(
-                amount0=abs(int(params["amount0"]) / 10**token0_decimals),
-                token0=get_addr_entry(token0_addr),
-                amount1=abs(int(params["amount1"]) / 10**token1_decimals),
-                token1=get_addr_entry(token1_addr),
-                pool=get_addr_entry(payload["address"]),
-            )
-
-        return event_sig, decoder
-
-    def decrease_liquidity(self) -> tuple[str, HandleEventFunc]:
-        # DecreaseLiquidity(uint256 indexed tokenId, uint128 liquidity, uint256 amount0, uint256 amount1);
-        event_sig = "DecreaseLiquidity(uint256,uint128,uint256,uint256)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = (
-                "Remove {amount0} {token0} and {amount1} {token1} liquidity from {pool}"
-            )
-            token0_addr, token1_addr = self._get_tokens_by_position(payload["address"])
-            token0_decimals, token1_decimals = self._get_token_decimals(
-                [token0_addr, token1_addr]
-            )
-            params = payload["params"]
-            return template.format(
-                amount0=abs(int(params["amount0"]) / 10**token0_decimals),
-                token0=get_addr_entry(token0_addr),
-                amount1=abs(int(params["amount1"]) / 10**token1_decimals),
-                token1=get_addr_entry(token1_addr),
-                pool=get_addr_entry(payload["address"]),
-            )
-
-        return event_sig, decoder
-
-    def swap(self) -> tuple[str, HandleEventFunc]:
-        # Swap(address sender,address recipient,int256 amount0,int256 amount1,uint160 sqrtPriceX96,uint128 liquidity,int24 tick)
-        event_sig = "Swap(address,address,int256,int256,uint160,uint128,int24)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Swap {pay_amount} {pay_token} for {get_amount} {get_token} on UniswapV3"
-            token0_addr, token1_addr = self._get_token_pair(payload["address"])
-            token0, token1 = get_addr_entry(token0_addr), get_addr_entry(token1_addr)
-            amount0, amount1 = (
-                payload["params"]["amount0"],
-                payload["params"]["amount1"],
-            )
-            token0_decimals, token1_decimals = self._get_token_decimals(
-                [token0_addr, token1_addr]
-            )
-            if int(amount0) > 0:
-                return template.format(
-                    pay_amount=abs(int(amount0) / 10**token0_decimals),
-                    pay_token=token0,
-                    get_amount=abs(int(amount1) / 10**token1_decimals),
-                    get_token=token1,
-                )
-            else:
-                return template.format(
-                    pay_amount=abs(int(amount1) / 10**token1_decimals),
-                    pay_token=token1,
-                    get_amount=abs(int(amount0) / 10**token0_decimals),
-                    get_token=token0,
-                )
-
-        return event_sig, decoder
-
-    def flash(self) -> tuple[str, HandleEventFunc]:
-        # Flash(address sender, address recipient, uint256 amount0, uint256 amount1 ,uint256 paid0, uint256 paid1)
-        event_sig = "Flash(address,address,uint256,uint256,uint256,uint256)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Flashloan {flash_stmt} then repay {repay_stmt}"
-            token0_addr, token1_addr = self._get_token_pair(payload["address"])
-            token0, token1 = get_addr_entry(token0_addr), get_addr_entry(token1_addr)
-            token0_decimals, token1_decimals = self._get_token_decimals(
-                [token0_addr, token1_addr]
-            )
-            amount0, amount1, paid0, paid1 = (
-                payload["params"]["amount0"] / 10**token0_decimals,
-                payload["params"]["amount1"] / 10**token1_decimals,
-                payload["params"]["paid0"] / 10**token0_decimals,
-                payload["params"]["paid1"] / 10**token1_decimals,
-            )
-            flash_stmt = []
-            if amount0 > 0:
-                flash_stmt.append(f"{amount0} {token0}")
-            if amount1 > 0:
-                flash_stmt.append(f"{amount1} {token1}")
-
-            repay_stmt = []
-            if paid0 > 0:
-                repay_stmt.append(f"{paid0} {token0}")
-            if paid1 > 0:
-                repay_stmt.append(f"{paid1} {token1}")
-
-            return template.format(
-                flash_stmt=" and ".join(flash_stmt),
-                repay_stmt=" and ".join(repay_stmt),
-            )
-
-        return event_sig, decoder
-
-    def collect(self) -> tuple[str, HandleEventFunc]:
-        # Collect(address owner,int24 tickLower,int24 tickUpper,uint128 amount0,uint128 amount1)
-        event_sig = "Collect(address,int24,int24,uint128,uint128)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = (
-                "Collect {amount0} {token0} and {amount1} {token1} fees from {pool}"
-            )
-            token0_addr, token1_addr = self._get_token_pair(payload["address"])
-            token0_decimals, token1_decimals = self._get_token_decimals(
-                [token0_addr, token1_addr]
-            )
-            params = payload["params"]
-            return template.format(
-                amount0=abs(int(params["amount0"]) / 10**token0_decimals),
-                token0=get_addr_entry(token0_addr),
-                amount1=abs(int(params["amount1"]) / 10**token1_decimals),
-                token1=get_addr_entry(token1_addr),
-                pool=get_addr_entry(payload["address"]),
-            )
-
-        return event_sig, decoder
-
-    def owner_changed(self) -> tuple[str, HandleEventFunc]:
-        # OwnerChanged(address oldOwner, address newOwner)
-        event_sig = "OwnerChanged(address,address)"
-
-        def decoder(payload: EventPayload) -> str:
-            return f"Change owner of {payload['address']} from {payload['params']['oldOwner']} to {payload['params']['newOwner']}"
-
-        return event_sig, decoder
-
-
-class AAVEV2Decoder(BaseDecoder):
-    def __init__(self, mc: Multicall, logger: logging.Logger = None):
-        super().__init__(mc, logger)
-
-    def deposit(self) -> Tuple[str, HandleEventFunc]:
-        # Deposit (index_topic_1 address reserve, address user, index_topic_2 address onBehalfOf, uint256 amount, index_topic_3 uint16 referral)
-        event_sig = "Deposit(address,address,address,uint256,uint16)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Deposit {amount} {token} to {protocol}"
-            token_addr = payload["params"]["reserve"]
-            (token_decimals,) = self._get_token_decimals(token_addr)
-            amount = payload["params"]["amount"] / 10**token_decimals
-            return template.format(
-                amount=amount,
-                token=get_addr_entry(token_addr),
-                protocol=get_addr_entry(payload["address"]),
-            )
-
-        return event_sig, decoder
-
-    def borrow(self) -> Tuple[str, HandleEventFunc]:
-        # Borrow (index_topic_1 address reserve, address user, index_topic_2 address onBehalfOf, uint256 amount, uint256 borrowRateMode, uint256 borrowRate, index_topic_3 uint16 referral)
-        event_sig = "Borrow(address,address,address,uint256,uint256,uint256,uint16)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Borrow {amount} {token} from {protocol}"
-            token_addr = payload["params"]["reserve"]
-            (token_decimals,) = self._get_token_decimals(token_addr)
-            amount = payload["params"]["amount"] / 10**token_decimals
-            return template.format(
-                amount=amount,
-                token=get_addr_entry(token_addr),
-                protocol=get_addr_entry(payload["address"]),
-            )
-
-        return event_sig, decoder
-
-    def withdraw(self) -> Tuple[str, HandleEventFunc]:
-        # Withdraw (index_topic_1 address reserve, index_topic_2 address user, index_topic_3 address to, uint256 amount)
-        event_sig = "Withdraw(address,address,address,uint256)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Withdraw {amount} {token} from {protocol}"
-            token_addr = payload["params"]["reserve"]
-            (token_decimals,) = self._get_token_decimals(token_addr)
-            amount = payload["params"]["amount"] / 10**token_decimals
-            return template.format(
-                amount=amount,
-                token=get_addr_entry(token_addr),
-                protocol=get_addr_entry(payload["address"]),
-            )
-
-        return event_sig, decoder
-
-    def repay(self) -> Tuple[str, HandleEventFunc]:
-        # Repay (index_topic_1 address reserve, index_topic_2 address user, index_topic_3 address repayer, uint256 amount)
-        event_sig = "Repay(address,address,address,uint256)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Repay {amount} {token} to {protocol}"
-            token_addr = payload["params"]["reserve"]
-            (token_decimals,) = self._get_token_decimals(token_addr)
-            amount = payload["params"]["amount"] / 10**token_decimals
-            return template.format(
-                amount=amount,
-                token=get_addr_entry(token_addr),
-                protocol=get_addr_entry(payload["address"]),
-            )
-
-        return event_sig, decoder
-
-    def flashloan(self) -> Tuple[str, HandleEventFunc]:
-        # FlashLoan (index_topic_1 address target, index_topic_2 address initiator, index_topic_3 address asset, uint256 amount, uint256 premium, uint16 referralCode)
-        event_sig = "FlashLoan(address,address,address,uint256,uint256,uint16)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Flashloan {amount} {token} from {protocol}"
-            token_addr = payload["params"]["asset"]
-            (token_decimals,) = self._get_token_decimals(token_addr)
-            amount = payload["params"]["amount"] / 10**token_decimals
-
-            return template.format(
-                amount=amount,
-                token=get_addr_entry(token_addr),
-                protocol=get_addr_entry(payload["address"]),
-            )
-
-        return event_sig, decoder
-
-
-class AAVEV3Decoder(BaseDecoder):
+    __slots__ = ("text_sign", "n_topics", "topic_inputs", "data_names", "data_types")
+
+    def __init__(self, text_sign: str, abi: Dict) -> None:
+        indexed_inputs, non_indexed_inputs = _partition_inputs(abi.get("inputs", []))
+        self.text_sign = text_sign
+        self.n_topics = len(indexed_inputs) + 1
+        self.topic_inputs = [(inp["name"], [abi_type(inp)]) for inp in indexed_inputs]
+        self.data_names = [inp["name"] for inp in non_indexed_inputs]
+        self.data_types = [abi_type(inp) for inp in non_indexed_inputs]
+
+    def decode(self, topics: List[str], data: str) -> Dict:
+        indexed_values = {
+            name: decode(types, bytes.fromhex(topic[2:]))[0]
+            for (name, types), topic in zip(self.topic_inputs, topics[1:])
+        }
+        values = decode(self.data_types, bytes.fromhex(data[2:]))
+        non_indexed_values = dict(zip(self.data_names, values))
+        parameters = _merge_parameters(indexed_values, non_indexed_values)
+        _convert_bytes_to_hex(parameters)
+        return parameters
+
+
+class EventSignatureIndex:
     """
-    Refs:
-    https://etherscan.io/address/0x87870bca3f3fd6335c3f4ce8392d69350b4fa4e2
-    """
-
-    def __init__(self, mc: Multicall, logger: logging.Logger = None):
-        super().__init__(mc, logger)
-
-    def supply(self) -> Tuple[str, HandleEventFunc]:
-        # Supply (index_topic_1 address reserve, address user, index_topic_2 address onBehalfOf, uint256 amount, index_topic_3 uint16 referralCode)
-        event_sig = "Supply(address,address,address,uint256,uint16)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Supply {amount} {token} to {protocol}"
-            token_addr = payload["params"]["reserve"]
-            (token_decimals,) = self._get_token_decimals(token_addr)
-            amount = payload["params"]["amount"] / 10**token_decimals
-            return template.format(
-                amount=amount,
-                token=get_addr_entry(token_addr),
-                protocol=get_addr_entry(payload["address"]),
-            )
-
-        return event_sig, decoder
-
-    def borrow(self) -> Tuple[str, HandleEventFunc]:
-        # Borrow (index_topic_1 address reserve, address user, index_topic_2 address onBehalfOf, uint256 amount, uint8 interestRateMode, uint256 borrowRate, index_topic_3 uint16 referralCode)
-        event_sig = "Borrow(address,address,address,uint256,uint8,uint256,uint16)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Borrow {amount} {token} from {protocol}"
-            token_addr = payload["params"]["reserve"]
-            (token_decimals,) = self._get_token_decimals(token_addr)
-            amount = payload["params"]["amount"] / 10**token_decimals
-            return template.format(
-                amount=amount,
-                token=get_addr_entry(token_addr),
-                protocol=get_addr_entry(payload["address"]),
-            )
-
-        return event_sig, decoder
-
-    def withdraw(self) -> Tuple[str, HandleEventFunc]:
-        # Withdraw (index_topic_1 address reserve, index_topic_2 address user, index_topic_3 address to, uint256 amount)
-        event_sig = "Withdraw(address,address,address,uint256)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Withdraw {amount} {token} from {protocol}"
-            token_addr = payload["params"]["reserve"]
-            (token_decimals,) = self._get_token_decimals(token_addr)
-            amount = payload["params"]["amount"] / 10**token_decimals
-            return template.format(
-                amount=amount,
-                token=get_addr_entry(token_addr),
-                protocol=get_addr_entry(payload["address"]),
-            )
-
-        return event_sig, decoder
-
-    def flashloan(self) -> Tuple[str, HandleEventFunc]:
-        # FlashLoan(address indexed target, address initiator, address indexed asset, uint256 amount, DataTypes.InterestRateMode interestRateMode, uint256 premium, uint16 indexed referralCode);
-        # Custon Type DataTypes.InterestRateMode is an enum, so we use uint8 to represent it
-        event_sig = "FlashLoan(address,address,address,uint256,uint8,uint256,uint16)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Flashloan {amount} {token} from {protocol}"
-            token_addr = payload["params"]["asset"]
-            (token_decimals,) = self._get_token_decimals(token_addr)
-            amount = payload["params"]["amount"] / 10**token_decimals
-            return template.format(
-                amount=amount,
-                token=get_addr_entry(token_addr),
-                protocol=get_addr_entry(payload["address"]),
-            )
-
-        return event_sig, decoder
-
-    def repay(self) -> Tuple[str, HandleEventFunc]:
-        # event Repay(address indexed reserve, address indexed user, address indexed repayer, uint256 amount, bool useATokens);
-        event_sig = "Repay(address,address,address,uint256,bool)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Repay {amount} {token} to {protocol}"
-            token_addr = payload["params"]["reserve"]
-            (token_decimals,) = self._get_token_decimals(token_addr)
-            amount = payload["params"]["amount"] / 10**token_decimals
-            return template.format(
-                amount=amount,
-                token=get_addr_entry(token_addr),
-                protocol=get_addr_entry(payload["address"]),
-            )
-
-        return event_sig, decoder
-
-    def reserve_used_as_collateral_enabled(self) -> Tuple[str, HandleEventFunc]:
-        # ReserveUsedAsCollateralEnabled (index_topic_1 address reserve, index_topic_2 address user)
-        event_sig = "ReserveUsedAsCollateralEnabled(address,address)"
-
-        def decoder(payload: EventPayload) -> str:
-            asset = get_addr_entry(payload["params"]["reserve"])
-            addr = get_addr_entry(payload["address"])
-            return f"Enable {asset} as collateral on {addr}"
-
-        return event_sig, decoder
-
-    def reserve_used_as_collateral_disabled(self) -> Tuple[str, HandleEventFunc]:
-        # ReserveUsedAsCollateralDisabled (index_topic_1 address reserve, index_topic_2 address user)
-        event_sig = "ReserveUsedAsCollateralDisabled(address,address)"
-
-        def decoder(payload: EventPayload) -> str:
-            asset = get_addr_entry(payload["params"]["reserve"])
-            addr = get_addr_entry(payload["address"])
-            return f"Disable {asset} as collateral on {addr}"
-
-        return event_sig, decoder
-
-
-class CompoundV3Decoder(BaseDecoder):
-    def __init__(self, mc: Multicall, logger: logging.Logger = None):
-        super().__init__(mc, logger)
-
-    def supply_collateral(self) -> Tuple[str, HandleEventFunc]:
-        # SupplyCollateral (index_topic_1 address from, index_topic_2 address dst, index_topic_3 address asset, uint256 amount)
-        event_sig = "SupplyCollateral(address,address,address,uint256)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Supply {amount} {token} as collateral to {protocol}"
-            token_addr = payload["params"]["asset"]
-            (token_decimals,) = self._get_token_decimals(token_addr)
-            amount = payload["params"]["amount"] / 10**token_decimals
+    Event ABIs of `func_sign.csv` indexed by (topic0, number of topics).
 
-            return template.format(
-                amount=amount,
-                token=get_addr_entry(token_addr),
-                protocol=get_addr_entry(payload["address"]),
-            )
-
-        return event_sig, decoder
-
-    def withdraw(self) -> Tuple[str, HandleEventFunc]:
-        # Withdraw (index_topic_1 address src, index_topic_2 address to, uint256 amount)
-        event_sig = "Withdraw(address,address,uint256)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Withdraw {amount} {token} to {reciver} on Compound"
-            token_addr = payload["address"]
-            (token_decimals,) = self._get_token_decimals(token_addr)
-            params = payload["params"]
-            amount = params["__idx_2"] / 10**token_decimals
-            recieiver = params["__idx_1"]
-            return template.format(
-                amount=amount,
-                token=get_addr_entry(token_addr),
-                reciver=get_addr_entry(recieiver),
-            )
-
-        return event_sig, decoder
-
-    def supply(self) -> Tuple[str, HandleEventFunc]:
-        # Supply (index_topic_1 address from, index_topic_2 address dst, uint256 amount)
-        event_sig = "Supply(address,address,uint256)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Supply {amount} {token} to {dst} on Compound"
-            token_addr = payload["address"]
-            (token_decimals,) = self._get_token_decimals(token_addr)
-            params = payload["params"]
-            amount = params["__idx_2"] / 10**token_decimals
-            dst = params["__idx_1"]
-            return template.format(
-                amount=amount,
-                token=get_addr_entry(token_addr),
-                dst=get_addr_entry(dst),
-            )
-
-        return event_sig, decoder
-
-
-class BancorV3Decoder(BaseDecoder):
-    def __init__(self, mc: Multicall, logger: logging.Logger = None):
-        super().__init__(mc, logger)
-
-    def tokens_traded(self) -> Tuple[str, HandleEventFunc]:
-        # TokensTraded (index_topic_1 bytes32 contextId, index_topic_2 address sourceToken, index_topic_3 address targetToken, uint256 sourceAmount, uint256 targetAmount, uint256 bntAmount, uint256 targetFeeAmount, uint256 bntFeeAmount, address trader)
-        event_sig = "TokensTraded(bytes32,address,address,uint256,uint256,uint256,uint256,uint256,address)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Trade {amount} {token} for {get_amount} {get_token} on Bancor"
-            token_addr = payload["params"]["sourceToken"]
-            get_token_addr = payload["params"]["targetToken"]
-            (token_decimals, get_token_decimals) = self._get_token_decimals(
-                [token_addr, get_token_addr]
-            )
-            params = payload["params"]
-            amount = params["sourceAmount"] / 10**token_decimals
-            get_amount = params["targetAmount"] / 10**get_token_decimals
-            return template.format(
-                amount=amount,
-                token=get_addr_entry(token_addr),
-                get_amount=get_amount,
-                get_token=get_addr_entry(get_token_addr),
-            )
+    Variants sharing a topic0 only differ in which inputs are indexed (e.g.
+    ERC-20 and ERC-721 `Transfer`), so the topic count picks the right one.
+    All variants of a topic0 are compiled the first time it is seen.
+    """
 
-        return event_sig, decoder
-
-    def funds_withdrawn(self) -> Tuple[str, HandleEventFunc]:
-        # FundsWithdrawn (index_topic_1 address token, index_topic_2 address caller, index_topic_3 address target, uint256 amount)
-        event_sig = "FundsWithdrawn(address,address,address,uint256)"
-
-        def decoder(payload: EventPayload) -> str:
-            template = "Withdraw {amount} {token} from {protocol}"
-            token_addr = payload["params"]["token"]
-            (token_decimals,) = self._get_token_decimals(token_addr)
-            params = payload["params"]
-            amount = params["amount"] / 10**token_decimals
-            return template.format(
-                amount=amount,
-                token=get_addr_entry(token_addr),
-                protocol=get_addr_entry(payload["address"]),
-            )
+    def __init__(self, evt_df: "pd.DataFrame") -> None:
+        # Event topics are 32 bytes, function selectors are 4 bytes
+        rows = evt_df[evt_df["byte_sign"].str.len() == 66]
+        self._abis = rows["abi"].values
+        self._text_signs = rows["text_sign"].values
+        self._rows = rows.groupby("byte_sign", sort=False).indices
+        self._plans: Dict[Tuple[str, int], EventPlan] = {}
+        self._compiled = set()
+
+    def _compile(self, topic0: str) -> None:
+        for row in self._rows.get(topic0, []):
+            try:
+                abi = json.loads(self._abis[row])
+            except (TypeError, ValueError):
+                continue
+            if abi.get("type") != "event" or abi.get("anonymous"):
+                continue
+            plan = EventPlan(self._text_signs[row], abi)
+            # Keep the first variant of each layout, like the csv order
+            self._plans.setdefault((topic0, plan.n_topics), plan)
+        self._compiled.add(topic0)
 
-        return event_sig, decoder
+    def get(self, topic0: str, n_topics: int) -> Optional[EventPlan]:
+        if topic0 not in self._compiled:
+            self._compile(topic0)
+        return self._plans.get((topic0, n_topics))
 
 
-class CurveV2Decoder(BaseDecoder):
-    def __init__(self, mc: Multicall, logger: logging.Logger = None):
-        super().__init__(mc, logger)
+class BaseDecoder:
+    # topic0 -> (event signature, handler method name), built per subclass
+    EVENTS: Dict[str, Tuple[str, str]] = {}
+
+    def __init_subclass__(cls, **kwargs) -> None:
+        super().__init_subclass__(**kwargs)
+        events = {}
+        for klass in reversed(cls.__mro__):
+            for name, attr in vars(klass).items():
+                topic0 = getattr(attr, "topic0", None)
+                if topic0 is not None:
+                    events[topic0] = (attr.event_sig, name)
+        cls.EVENTS = events
 
-    def token_exchange(self) -> Tuple[str, HandleEventFunc]:
-        # TokenExchange (index_topic_1 address buyer, index_topic_2 address receiver, index_topic_3 address pool, address token_sold, address token_bought, uint256 amount_sold, uint256 amount_bought)
-        event_sig = (
-            "TokenExchange(address,address,address,address,address,uint256,uint256)"
-        )
+    def __init__(
+        self,
+        mc: Union[Multicall, MulticallBatcher],
+        logger: logging.Logger = None,
+        cache: CallCache = None,
+    ):
+        if not isinstance(mc, MulticallBatcher):
+            mc = MulticallBatcher(mc, logger=logger)
+        self.mc = mc
+        self.logger = logger
+        self.cache = cache if cache is not None else CallCache()
+
+    def _lookup(
+        self, calls: List[Call], block: Optional[int] = None, immutable: bool = True
+    ) -> List[Optional[Any]]:
+        """
+        Executes the calls at the given block, serving repeated reads from cache.
+
+        Parameters
+        ----------
+        calls : List[Call]
+            The calls to execute.
+        block : Optional[int]
+            The block number of the transaction being decoded, None for latest.
+        immutable : bool
+            Whether the calls read state that never changes once set (token
+            decimals, pool tokens). Immutable results are cached regardless of
+            the block, mutable ones per block and only when a block is given.
+
+        Returns
+        -------
+        List[Optional[Any]]
+            The result of each call, or None if the call failed.
+
+        """
+        if immutable:
+            keys = [make_call_key(call) for call in calls]
+        elif block is not None:
+            keys = [make_call_key(call, block) for call in calls]
+        else:
+            return self.mc.fetch(calls)
+
+        results = [self.cache.get(key) for key in keys]
+        missing = [idx for idx, result in enumerate(results) if result is None]
+        if missing:
+            fetched = self.mc.fetch([calls[idx] for idx in missing], block)
+            for idx, result in zip(missing, fetched):
+                if result is not None:
+                    self.cache.set(keys[idx], result)
+                results[idx] = result
+        return results
+
+    def handlers(self) -> Iterator[Tuple[str, str, HandleEventFunc]]:
+        """
+        Yields the (topic0, event signature, bound handler) of every @event.
+        """
+        for topic0, (event_sig, name) in self.EVENTS.items():
+            yield topic0, event_sig, getattr(self, name)
+
+    def prefetch(self, logs: List[LogDict]) -> None:
+        """
+        Resolves the lookups needed by a batch of logs ahead of decoding them.
+        """
+        pass
+
+    def _get_token_scales(
+        self, addrs: Union[List[str], str], block: Optional[int] = None
+    ) -> List[TokenScale]:
+        return [make_token_scale(d) for d in self._get_token_decimals(addrs, block)]
+
+    def _get_token_decimals(
+        self, addrs: Union[List[str], str], block: Optional[int] = None
+    ) -> List[int]:
+        if isinstance(addrs, str):
+            addrs = [addrs]
 
-        def decoder(payload: EventPayload) -> str:
-            template = "Exchange {amount} {token} for {get_amount} {get_token} on Curve"
-            token_addr = payload["params"]["token_sold"]
-            get_token_addr = payload["params"]["token_bought"]
-            (token_decimals, get_token_decimals) = self._get_token_decimals(
-                [token_addr, get_token_addr]
-            )
-            params = payload["params"]
-            amount = params["amount_sold"] / 10**token_decimals
-            get_amount = params["amount_bought"] / 10**get_token_decimals
-            return template.format(
-                amount=amount,
-                token=get_addr_entry(token_addr),
-                get_amount=get_amount,
-                get_token=get_addr_entry(get_token_addr),
-            )
+        calls = [Call(target=addr, function="decimals()(uint8)") for addr in addrs]
 
-        return event_sig, decoder
+        result = self._lookup(calls, block)
+        for addr, decimals in zip(addrs, result):
+            if decimals is None:
+                raise LookupFailed(f"Cannot fetch decimals of {addr}")
+        return result
 
 
 class EventLogsDecoder:
     def __init__(
         self,
-        evt_df: pd.DataFrame,
+        evt_df: "pd.DataFrame",
         verbose: bool = False,
         logger: logging.Logger = None,
+        quarantine: Quarantine = None,
+        workers: int = 10,
         *args,
         **kwargs,
     ) -> None:
+        # topic0 -> handler
         self.hdlrs: Dict[str, HandleEventFunc] = {}
+        self.decoders: List[BaseDecoder] = []
+        # topic0 -> protocols registered by name and not imported yet
+        self._pending: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}
+        self._loaded: Set[str] = set()
+        self._load_lock = threading.Lock()
         self.evt_df = evt_df
+        self.signatures = EventSignatureIndex(evt_df)
+        self.quarantine = quarantine if quarantine is not None else Quarantine()
+        # Shared by every decode call, threads are only started when needed
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="decode"
+        )
 
         self.logger = logger
         if logger is None and verbose:
@@ -869,27 +456,54 @@ class EventLogsDecoder:
 
         self.verbose = verbose
 
-    def register(self, byte_sign: str, handle_func: HandleEventFunc) -> None:
+    def register(self, event_sig: str, handle_func: HandleEventFunc) -> None:
+        topic0 = "0x" + event_signature_to_log_topic(event_sig).hex()
+        self._register(topic0, event_sig, handle_func)
+
+    def _register(
+        self, topic0: str, event_sig: str, handle_func: HandleEventFunc
+    ) -> None:
         if self.verbose:
-            self.logger.info(f"Registering event {byte_sign}")
-        self.hdlrs[byte_sign] = handle_func
+            self.logger.info(f"Registering event {event_sig}")
+        self.hdlrs[topic0] = handle_func
 
     def register_class(self, cls: BaseDecoder) -> None:
-        for attr in dir(cls):
-            if attr.startswith("_"):
-                continue
-            handle_func = getattr(cls, attr)
-            if not callable(handle_func):
-                continue
-            event_sig, decoder = handle_func()
-            self.register(event_sig, decoder)
-
-    def _get_abi_text_sign(self, byte_sign: str) -> Tuple[str, str]:
-        filtered = self.evt_df["byte_sign"] == byte_sign
-        candidate = self.evt_df[filtered][["abi", "text_sign"]].values
-        if len(candidate) == 0:
-            return "", ""
-        return candidate[0]
+        self.decoders.append(cls)
+        for topic0, event_sig, handle_func in cls.handlers():
+            self._register(topic0, event_sig, handle_func)
+
+    def register_protocol(self, name: str, **kwargs) -> None:
+        """
+        Registers a protocol of the `protocols` package without importing it.
+
+        Its module is imported and its decoder built with `kwargs` the first
+        time one of its topics is decoded or prefetched.
+
+        Parameters
+        ----------
+        name : str
+            The protocol name, e.g. "uniswap_v3".
+        **kwargs
+            The decoder arguments, e.g. mc, logger and cache.
+
+        """
+        if name not in PROTOCOLS:
+            raise ValueError(f"Unknown protocol: {name}")
+        for topic0 in TOPICS[name]:
+            self._pending.setdefault(topic0, []).append((name, kwargs))
+
+    def _load(self, topic0: str) -> None:
+        with self._load_lock:
+            for name, kwargs in self._pending.get(topic0, []):
+                if name in self._loaded:
+                    continue
+                if self.verbose:
+                    self.logger.info(f"Loading protocol {name}")
+                self.register_class(load_protocol(name)(**kwargs))
+                self._loaded.add(name)
+            # Only dropped once its handlers are registered, until then other
+            # threads decoding the topic wait on the lock
+            self._pending.pop(topic0, None)
 
     def decode(self, log: LogDict) -> str:
         topics = log.get("topics", [])
@@ -897,25 +511,188 @@ class EventLogsDecoder:
         if len(topics) == 0:
             raise ValueError("Log topics is empty")
 
-        abi, text_sign = self._get_abi_text_sign(topics[0])
-
-        handler = self.hdlrs.get(text_sign, None)
+        if topics[0] in self._pending:
+            self._load(topics[0])
+        handler = self.hdlrs.get(topics[0], None)
         if handler is None:
             return ""
 
-        abi = json.loads(abi)
+        if self.quarantine.is_quarantined(topics[0], log["address"]):
+            return ""
+
+        plan = self.signatures.get(topics[0], len(topics))
+        if plan is None:
+            return ""
+
+        text_sign = plan.text_sign
+
+        params = {}
         try:
-            _, params = eth_decode_log(abi, topics, log.get("data", "0x"))
-            result = handler({"address": log["address"], "params": params})
-            return result
+            params = plan.decode(topics, log.get("data", "0x"))
+            result = handler(
+                {
+                    "address": log["address"],
+                    "blknum": log.get("blknum"),
+                    "params": params,
+                }
+            )
         except Exception as e:
+            self.quarantine.record_failure(topics[0], log["address"], e)
             if self.verbose:
                 self.logger.error(
                     f"Failed to decode event {text_sign} with params {params}"
                 )
                 self.logger.exception(e)
             return ""
-
-    def decode_all(self, logs: List[LogDict], workers: int = 10) -> List[str]:
-        with ThreadPoolExecutor(max_workers=workers) as executor:
-            return list(executor.map(self.decode, logs))
+        self.quarantine.record_success(topics[0], log["address"])
+        return result
+
+    def topics(self) -> List[str]:
+        """
+        Returns the topic0 of every registered event handler.
+        """
+        return list(self.hdlrs) + [t for t in self._pending if t not in self.hdlrs]
+
+    def bloom_filter(self, addresses: Iterable[str] = ()) -> BloomFilter:
+        """
+        Builds the `logsBloom` pre-filter of the registered events.
+
+        Parameters
+        ----------
+        addresses : Iterable[str]
+            If given, blocks must also possibly hold a log of one of these
+            contracts. Protocols decode any pool, so none are implied.
+
+        Returns
+        -------
+        BloomFilter
+            The filter of `topics()`, protocols not loaded yet included.
+
+        """
+        return BloomFilter(self.topics(), addresses)
+
+    def prefetch(self, logs: List[LogDict]) -> None:
+        for log in logs:
+            topics = log.get("topics")
+            if topics and topics[0] in self._pending:
+                self._load(topics[0])
+        for decoder in self.decoders:
+            try:
+                decoder.prefetch(logs)
+            except Exception as e:
+                # Lookups are retried one by one while decoding
+                if self.verbose:
+                    self.logger.warning(
+                        f"{decoder.__class__.__name__} failed to prefetch: {e}"
+                    )
+
+    def iter_decode(
+        self, logs: Iterable[LogDict], window: int = 1024, chunk_size: int = 256
+    ) -> Iterator[str]:
+        """
+        Decodes a stream of logs, yielding the results in input order.
+
+        Logs are read and prefetched `chunk_size` at a time, and at most
+        `window` of them are in flight on the worker pool, so memory stays
+        bounded whatever the input size.
+
+        Parameters
+        ----------
+        logs : Iterable[LogDict]
+            The logs, e.g. a generator over a block range.
+        window : int
+            The maximum number of logs submitted and not yet yielded.
+        chunk_size : int
+            The number of logs prefetched together.
+
+        Returns
+        -------
+        Iterator[str]
+            The decoded action of each log, "" when it has none.
+
+        """
+        pending: Deque[Future] = deque()
+        logs = iter(logs)
+        while True:
+            chunk = list(islice(logs, chunk_size))
+            if not chunk:
+                break
+            self.prefetch(chunk)
+            for log in chunk:
+                if len(pending) >= window:
+                    yield pending.popleft().result()
+                pending.append(self._executor.submit(self.decode, log))
+        while pending:
+            yield pending.popleft().result()
+
+    async def aiter_decode(
+        self,
+        logs: Union[Iterable[LogDict], AsyncIterable[LogDict]],
+        window: int = 1024,
+        chunk_size: int = 256,
+    ) -> AsyncIterator[str]:
+        """
+        Async variant of `iter_decode`, the decoding runs on the worker pool.
+        """
+        loop = asyncio.get_running_loop()
+        pending: Deque[Awaitable[str]] = deque()
+        async for chunk in _achunks(logs, chunk_size):
+            await loop.run_in_executor(self._executor, self.prefetch, chunk)
+            for log in chunk:
+                if len(pending) >= window:
+                    yield await pending.popleft()
+                pending.append(loop.run_in_executor(self._executor, self.decode, log))
+        while pending:
+            yield await pending.popleft()
+
+    def decode_all(self, logs: List[LogDict], workers: int = None) -> List[str]:
+        """
+        Decodes a list of logs, returning the results in input order.
+
+        Parameters
+        ----------
+        logs : List[LogDict]
+            The logs, prefetched together since they are in memory anyway.
+        workers : int
+            The maximum number of logs decoded concurrently, capped by the
+            size of the shared pool. Defaults to the whole pool.
+
+        Returns
+        -------
+        List[str]
+            The decoded action of each log, "" when it has none.
+
+        """
+        size = max(len(logs), 1)
+        return list(self.iter_decode(logs, window=workers or size, chunk_size=size))
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+
+async def _achunks(
+    items: Union[Iterable[LogDict], AsyncIterable[LogDict]], size: int
+) -> AsyncIterator[List[LogDict]]:
+    if not hasattr(items, "__aiter__"):
+        items = iter(items)
+        while True:
+            chunk = list(islice(items, size))
+            if not chunk:
+                return
+            yield chunk
+    chunk = []
+    async for item in items:
+        chunk.append(item)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def __getattr__(name: str) -> Any:
+    # Protocol decoders moved to the lazily imported `protocols` package
+    for module, class_name in PROTOCOLS.values():
+        if class_name == name:
+            return getattr(importlib.import_module(module), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
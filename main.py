@@ -1,23 +1,42 @@
+import argparse
+import atexit
+import json
 import logging
+import sys
+import threading
+import time
 import warnings
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from itertools import islice
 from os import getenv
-
-import pandas as pd
-from ens import ENS
-from multicall import Multicall
-from web3 import Web3
-
-from decoder import (
-    AAVEV2Decoder,
-    AAVEV3Decoder,
-    BancorV3Decoder,
-    CompoundV3Decoder,
-    CurveV2Decoder,
-    EventLogsDecoder,
-    UniswapV2Decoder,
-    UniswapV3Decoder,
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Deque,
+    Dict,
+    Iterable,
+    List,
+    TextIO,
+    Tuple,
+    TypeVar,
 )
-from provider import get_provider
+
+from batcher import MulticallBatcher
+from bloom import BloomFilter
+from cache import CallCache, PositionIndex, SharedCallCache
+from calldata import CalldataDecoder
+from decoder import EventLogsDecoder
+from pipeline import BatchDecoder
+from prefetch import prefetch_hot
+from profiling import Profiler
+from provider import RawRPCProvider, get_provider
+from quarantine import Quarantine
+from ratelimit import BACKFILL, RateLimiter
+from resolver import ReverseResolver
+from rpc import PooledHTTPProvider, PooledMulticall, RawJSONRPC, RPCPool
+from rpccache import ResponseCache
 from utils import (
     format_timestamp,
     get_addr_entry,
@@ -28,8 +47,14 @@ from utils import (
     get_value_entry,
 )
 
+if TYPE_CHECKING:
+    import pandas as pd
+    from web3 import Web3
+
 warnings.filterwarnings("ignore")
 
+T = TypeVar("T")
+
 
 logger = logging.getLogger("EventDecoder[Test]")
 handler = logging.StreamHandler()
@@ -38,31 +63,396 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 
 
-provider_url = getenv("WEB3_PROVIDER_URL")
-w3 = Web3(Web3.HTTPProvider(provider_url))
-ns = ENS.fromWeb3(w3)
+def build_rpc_pool() -> RPCPool:
+    """
+    Builds the pool of the WEB3_PROVIDER_URL endpoints, throttled below
+    RPC_RATE_LIMIT when set.
+    """
+    # Comma separated list of RPC endpoints
+    provider_urls = [
+        url.strip() for url in getenv("WEB3_PROVIDER_URL", "").split(",") if url.strip()
+    ]
+    if not provider_urls:
+        raise ValueError(
+            "WEB3_PROVIDER_URL is not set, expected a comma separated list of RPC "
+            "endpoints (see .env.example)"
+        )
+    # Compute units per second of the RPC plan, unlimited when unset
+    rate_limit = getenv("RPC_RATE_LIMIT")
+    limiter = RateLimiter(float(rate_limit), logger=logger) if rate_limit else None
+    return RPCPool(provider_urls, limiter=limiter, logger=logger)
+
+
+def build_web3(rpc_pool: RPCPool) -> "Web3":
+    from web3 import Web3
+
+    w3 = Web3(PooledHTTPProvider(rpc_pool))
+    # Finalized transactions, receipts and blocks are served from disk
+    response_cache = ResponseCache("rpc_cache.sqlite")
+    w3.middleware_onion.inject(response_cache, layer=0)
+    atexit.register(
+        lambda: logger.info("RPC response cache: %s", response_cache.stats())
+    )
+    return w3
+
+
+def save_periodically(save: Callable[[], None], interval: float) -> None:
+    def loop() -> None:
+        while True:
+            time.sleep(interval)
+            try:
+                save()
+            except OSError as e:
+                logger.warning(f"Snapshot failed: {e}")
+
+    threading.Thread(target=loop, name="snapshot", daemon=True).start()
+
+
+def build_call_cache() -> CallCache:
+    """
+    Builds the call cache, restored from and snapshotted to CALL_CACHE_PATH
+    every CALL_CACHE_SNAPSHOT_INTERVAL seconds and at exit.
+    """
+    path = getenv("CALL_CACHE_PATH", "call_cache.json")
+    # Also shared by every process opening the same SHARED_CACHE_NAME
+    shared_cache_name = getenv("SHARED_CACHE_NAME")
+    if shared_cache_name:
+        cache: CallCache = SharedCallCache(
+            shared_cache_name, path=path, logger=logger
+        )
+    else:
+        cache = CallCache(path=path, logger=logger)
+    atexit.register(cache.save)
+    save_periodically(
+        cache.save, float(getenv("CALL_CACHE_SNAPSHOT_INTERVAL", "300"))
+    )
+    return cache
+
+
+def build_evt_decoder(
+    df: "pd.DataFrame", mc: MulticallBatcher, cache: CallCache = None
+) -> EventLogsDecoder:
+    """
+    Builds the event decoder with every protocol registered.
+    """
+    # Shared by all decoders so token metadata is only fetched once
+    if cache is None:
+        cache = build_call_cache()
+
+    # Logs failing to decode are skipped for a day, also across restarts
+    quarantine = Quarantine(path="quarantine.json", logger=logger)
+    atexit.register(quarantine.save)
+
+    # Uniswap V3 position metadata learned from previous runs
+    positions = PositionIndex(path="uniswap_v3_positions.jsonl", logger=logger)
+    atexit.register(positions.close)
+
+    evt_decoder = EventLogsDecoder(
+        evt_df=df, verbose=False, logger=logger, quarantine=quarantine
+    )
+    # Protocol modules are only imported once one of their events shows up
+    evt_decoder.register_protocol("uniswap_v2", mc=mc, logger=logger, cache=cache)
+    evt_decoder.register_protocol(
+        "uniswap_v3",
+        mc=mc,
+        logger=logger,
+        cache=cache,
+        positions=positions,
+    )
+    evt_decoder.register_protocol("aave_v2", mc=mc, logger=logger, cache=cache)
+    evt_decoder.register_protocol("aave_v3", mc=mc, logger=logger, cache=cache)
+    evt_decoder.register_protocol("compound_v3", mc=mc, logger=logger, cache=cache)
+    evt_decoder.register_protocol("bancor_v3", mc=mc, logger=logger, cache=cache)
+    evt_decoder.register_protocol("curve_v2", mc=mc, logger=logger, cache=cache)
+    return evt_decoder
+
+
+def parse_record(line: str) -> Dict[str, Any]:
+    """
+    Parses an input line: a bare tx hash, a JSON string, or a JSON object with
+    a "txhash", a list of "logs" or a single log record.
+    """
+    line = line.strip()
+    if not line.startswith(("{", '"')):
+        return {"txhash": line}
+    record = json.loads(line)
+    if isinstance(record, str):
+        return {"txhash": record}
+    if "topics" in record:
+        return {"logs": [record]}
+    if "logs" in record:
+        return {"logs": record["logs"]}
+    if "txhash" in record:
+        return {"txhash": record["txhash"]}
+    raise ValueError(f"Expected a txhash or log records, got {line[:80]}")
+
+
+def _decode_each(fn: Callable[[List[T]], List[Any]], items: List[T]) -> List[Any]:
+    # One call per item, so a bad record only fails its own output line
+    results = []
+    for item in items:
+        try:
+            (result,) = fn([item])
+        except Exception as e:
+            result = e
+        results.append(result)
+    return results
+
+
+def _decode_batch(decoder: BatchDecoder, lines: List[str]) -> List[Dict[str, Any]]:
+    results: List[Dict[str, Any]] = []
+    records = []
+    for line in lines:
+        try:
+            records.append(parse_record(line))
+            results.append({})
+        except ValueError as e:
+            records.append(None)
+            results.append({"error": str(e)})
+    txs = [(idx, r["txhash"]) for idx, r in enumerate(records) if r and "txhash" in r]
+    logs = [(idx, r["logs"]) for idx, r in enumerate(records) if r and "logs" in r]
+    if txs:
+        txhashes = [txhash for _, txhash in txs]
+        try:
+            decoded = decoder.decode_txs(txhashes)
+        except Exception as e:
+            logger.warning(f"Batch of {len(txs)} txs failed, retrying each: {e}")
+            decoded = _decode_each(decoder.decode_txs, txhashes)
+        for (idx, txhash), tx in zip(txs, decoded):
+            if isinstance(tx, Exception):
+                tx = {"txhash": txhash, "error": str(tx)}
+            results[idx] = tx
+    if logs:
+        log_batches = [log_batch for _, log_batch in logs]
+        try:
+            decoded = decoder.decode_logs(log_batches)
+        except Exception as e:
+            logger.warning(
+                f"Batch of {len(logs)} log records failed, retrying each: {e}"
+            )
+            decoded = _decode_each(decoder.decode_logs, log_batches)
+        for (idx, _), actions in zip(logs, decoded):
+            if isinstance(actions, Exception):
+                results[idx] = {"error": str(actions)}
+            else:
+                results[idx] = {"actions": actions}
+    return results
+
+
+def run_batch(
+    decoder: BatchDecoder,
+    src: TextIO,
+    dst: TextIO,
+    batch_size: int = 64,
+    workers: int = 4,
+) -> None:
+    """
+    Decodes a JSONL stream into JSONL, one output line per input line in order.
+
+    Batches of `batch_size` lines are decoded by up to `workers` threads; at
+    most twice that many batches are in flight, so memory stays bounded
+    whatever the input size. A batch which fails is retried record by record,
+    and each record which still fails gets an {"error": ...} line.
+    """
+    start = time.monotonic()
+    n_records = n_errors = 0
+    lines: Iterable[str] = (line for line in src if line.strip())
+    in_flight: Deque[Future] = deque()
+
+    def drain(future: Future) -> None:
+        nonlocal n_records, n_errors
+        for result in future.result():
+            n_records += 1
+            n_errors += "error" in result
+            dst.write(json.dumps(result, default=str) + "\n")
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while True:
+            batch = list(islice(lines, batch_size))
+            if not batch:
+                break
+            in_flight.append(executor.submit(_decode_batch, decoder, batch))
+            if len(in_flight) >= 2 * workers:
+                drain(in_flight.popleft())
+        while in_flight:
+            drain(in_flight.popleft())
+    dst.flush()
+
+    elapsed = time.monotonic() - start
+    print(
+        f"Decoded {n_records} records ({n_errors} errors) in {elapsed:.2f}s, "
+        f"{n_records / elapsed if elapsed else 0:.1f} records/s",
+        file=sys.stderr,
+    )
+
+
+def run_profile(
+    provider: RawRPCProvider,
+    evt_decoder: EventLogsDecoder,
+    mc: MulticallBatcher,
+    start: int,
+    end: int,
+    dst: TextIO,
+    profiler: Profiler,
+    bloom: BloomFilter = None,
+) -> None:
+    """
+    Decodes the logs of blocks [start, end] into JSONL under `profiler`, one
+    output line per transaction. With `bloom`, blocks and transactions whose
+    `logsBloom` cannot match are skipped before their receipts are decoded.
+    """
+    profiler.instrument(evt_decoder, mc)
+    profiler.start()
+    try:
+        blocks = (
+            provider.get_txs_by_block(blknum, bloom)
+            for blknum in range(start, end + 1)
+        )
+        for txs in profiler.timed_iter(blocks, "provider_fetch"):
+            logs = [log for tx in txs for log in tx["logs"]]
+            actions = iter(evt_decoder.decode_all(logs))
+            with profiler.stage("formatting"):
+                for tx in txs:
+                    tx_actions = [next(actions) for _ in tx["logs"]]
+                    record = {
+                        "txhash": tx["txhash"],
+                        "blknum": tx["blknum"],
+                        "actions": [
+                            {"logpos": log["logpos"], "action": action}
+                            for log, action in zip(tx["logs"], tx_actions)
+                            if action
+                        ],
+                    }
+                    dst.write(json.dumps(record) + "\n")
+    finally:
+        profiler.stop()
+
+
+def parse_block_range(value: str) -> Tuple[int, int]:
+    start, sep, end = value.partition(":")
+    if not sep or not start.isdigit() or not end.isdigit() or int(start) > int(end):
+        raise argparse.ArgumentTypeError(f"Expected START:END, got {value}")
+    return int(start), int(end)
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Decode Ethereum transactions")
+    parser.add_argument(
+        "--batch",
+        metavar="FILE",
+        nargs="?",
+        const="-",
+        help="decode the tx hashes or log records of a JSONL file (- for stdin) "
+        "instead of prompting",
+    )
+    parser.add_argument(
+        "-o", "--output", default="-", help="JSONL output file, - for stdout"
+    )
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument(
+        "--prefetch",
+        metavar="N",
+        type=int,
+        default=0,
+        help="resolve the N most active tokens and pools of the database first",
+    )
+    parser.add_argument(
+        "--profile",
+        metavar="START:END",
+        type=parse_block_range,
+        help="decode blocks START to END under the profilers and report the cost "
+        "of each stage and protocol",
+    )
+    parser.add_argument(
+        "--profilers",
+        default="cprofile,sample,tracemalloc",
+        help="comma separated profilers to enable",
+    )
+    parser.add_argument(
+        "--profile-dir", default="profile", help="directory of the profile reports"
+    )
+    parser.add_argument(
+        "--profile-top", type=int, default=25, help="entries per profile report"
+    )
+    parser.add_argument(
+        "--no-bloom",
+        action="store_true",
+        help="fetch every block of the range instead of skipping those whose "
+        "logsBloom cannot match a registered event",
+    )
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
+    args = parse_args()
+
+    # Deferred so that worker processes importing this module skip pandas
+    import pandas as pd
+
     df = pd.read_csv("func_sign.csv")
-    mc = Multicall(provider_url)
-    uniswap_v2 = UniswapV2Decoder(mc=mc, logger=logger)
-    uniswap_v3 = UniswapV3Decoder(mc=mc, logger=logger)
-    aave_v2 = AAVEV2Decoder(mc=mc, logger=logger)
-    aave_v3 = AAVEV3Decoder(mc=mc, logger=logger)
-    compound_v3 = CompoundV3Decoder(mc=mc, logger=logger)
-    bancor_v3 = BancorV3Decoder(mc=mc, logger=logger)
-    curve_v2 = CurveV2Decoder(mc=mc, logger=logger)
-
-    evt_decoder = EventLogsDecoder(evt_df=df, verbose=False, logger=logger)
-    evt_decoder.register_class(uniswap_v2)
-    evt_decoder.register_class(uniswap_v3)
-    evt_decoder.register_class(aave_v2)
-    evt_decoder.register_class(aave_v3)
-    evt_decoder.register_class(compound_v3)
-    evt_decoder.register_class(bancor_v3)
-    evt_decoder.register_class(curve_v2)
-
-    p = get_provider("web3", w3=w3)
+    calldata_decoder = CalldataDecoder(df)
+    rpc_pool = build_rpc_pool()
+
+    if args.profile:
+        mc = MulticallBatcher(
+            PooledMulticall(rpc_pool, priority=BACKFILL), logger=logger
+        )
+        evt_decoder = build_evt_decoder(df, mc)
+        profiler = Profiler(args.profilers.split(","), top=args.profile_top)
+        dst = sys.stdout if args.output == "-" else open(args.output, "w")
+        with dst:
+            run_profile(
+                RawRPCProvider(RawJSONRPC(rpc_pool, priority=BACKFILL)),
+                evt_decoder,
+                mc,
+                *args.profile,
+                dst,
+                profiler,
+                None if args.no_bloom else evt_decoder.bloom_filter(),
+            )
+        print(profiler.summary(), file=sys.stderr)
+        for path in profiler.write(args.profile_dir):
+            print(f"Wrote {path}", file=sys.stderr)
+        sys.exit(0)
+
+    if args.batch:
+        # Bulk jobs yield the RPC quota to interactive lookups
+        mc = MulticallBatcher(
+            PooledMulticall(rpc_pool, priority=BACKFILL), logger=logger
+        )
+        cache = build_call_cache()
+        if args.prefetch:
+            prefetch_hot(
+                get_provider("sql"),
+                mc,
+                cache,
+                args.prefetch,
+                args.prefetch,
+                logger=logger,
+            )
+        batch_decoder = BatchDecoder(
+            provider=RawRPCProvider(RawJSONRPC(rpc_pool, priority=BACKFILL)),
+            evt_decoder=build_evt_decoder(df, mc, cache),
+            calldata_decoder=calldata_decoder,
+            resolver=ReverseResolver(mc),
+        )
+        src = sys.stdin if args.batch == "-" else open(args.batch, "r")
+        dst = sys.stdout if args.output == "-" else open(args.output, "w")
+        with src, dst:
+            run_batch(batch_decoder, src, dst, args.batch_size, args.workers)
+        sys.exit(0)
+
+    mc = MulticallBatcher(PooledMulticall(rpc_pool), logger=logger)
+    ens_resolver = ReverseResolver(mc)
+    cache = build_call_cache()
+    if args.prefetch:
+        prefetch_hot(
+            get_provider("sql"), mc, cache, args.prefetch, args.prefetch, logger=logger
+        )
+    evt_decoder = build_evt_decoder(df, mc, cache)
+
+    p = get_provider("web3", w3=build_web3(rpc_pool))
 
     while True:
         txhash = input("Please enter txhash: ")
@@ -71,13 +461,13 @@ if __name__ == "__main__":
         print("Transaction: ")
         print("Txhash: ", tx["txhash"])
         print("Timestamp: ", format_timestamp(tx["block_timestamp"]))
-        print("From: ", ns.name(tx["from"]) or get_addr_entry(tx["from"]))
+        print("From: ", ens_resolver.name(tx["from"]) or get_addr_entry(tx["from"]))
         print("To: ", get_addr_entry(tx["to"]))
         print("Value: ", get_value_entry(tx["value"]))
         print("Status: ", get_status_entry(tx["status"]))
         print("Gas Used: ", get_gas_entry(tx["gas_used"]))
         print("Gas Price: ", get_gas_price_entry(tx["gas_price"]))
-        print("Input Data:\n- ", get_input_entry(tx["input"], evt_df=df))
+        print("Input Data:\n- ", get_input_entry(tx["input"], calldata_decoder))
         print("Transaction Action:")
         results = evt_decoder.decode_all(tx["logs"])
         for result in results:
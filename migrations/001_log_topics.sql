@@ -0,0 +1,29 @@
+-- Pre-split the comma separated topics of ethereum.logs into binary columns,
+-- so SQLProvider(topic_columns=True) builds logs without parsing any text.
+-- Refresh it after loading new blocks:
+--   REFRESH MATERIALIZED VIEW CONCURRENTLY ethereum.log_topics;
+
+CREATE MATERIALIZED VIEW IF NOT EXISTS ethereum.log_topics AS
+SELECT
+    id,
+    _st,
+    _st_day,
+    blknum,
+    txhash,
+    logpos,
+    address,
+    data,
+    decode(substr(NULLIF(split_part(topics, ',', 1), ''), 3), 'hex') AS topic0,
+    decode(substr(NULLIF(split_part(topics, ',', 2), ''), 3), 'hex') AS topic1,
+    decode(substr(NULLIF(split_part(topics, ',', 3), ''), 3), 'hex') AS topic2,
+    decode(substr(NULLIF(split_part(topics, ',', 4), ''), 3), 'hex') AS topic3
+FROM ethereum.logs;
+
+-- Required by REFRESH ... CONCURRENTLY
+CREATE UNIQUE INDEX IF NOT EXISTS log_topics_id ON ethereum.log_topics (id);
+CREATE INDEX IF NOT EXISTS log_topics_txhash ON ethereum.log_topics (txhash, logpos);
+CREATE INDEX IF NOT EXISTS log_topics_topic0 ON ethereum.log_topics (topic0, blknum);
+
+-- Range and per-transaction reads filter on (_st_day, blknum) and sort by logpos
+CREATE INDEX IF NOT EXISTS log_topics_day_blknum
+    ON ethereum.log_topics (_st_day, blknum, logpos);
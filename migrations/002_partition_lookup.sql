@@ -0,0 +1,19 @@
+-- Lookups from which SQLProvider derives the _st_day partition of a query.
+-- Refresh them after loading new blocks:
+--   REFRESH MATERIALIZED VIEW CONCURRENTLY ethereum.tx_index;
+--   REFRESH MATERIALIZED VIEW CONCURRENTLY ethereum.block_days;
+
+-- txhash -> (blknum, _st_day)
+CREATE MATERIALIZED VIEW IF NOT EXISTS ethereum.tx_index AS
+SELECT txhash, blknum, _st_day
+FROM ethereum.txs;
+
+CREATE UNIQUE INDEX IF NOT EXISTS tx_index_txhash ON ethereum.tx_index (txhash);
+
+-- _st_day -> [start_blknum, end_blknum], a few thousand rows kept in memory
+CREATE MATERIALIZED VIEW IF NOT EXISTS ethereum.block_days AS
+SELECT _st_day, min(blknum) AS start_blknum, max(blknum) AS end_blknum
+FROM ethereum.txs
+GROUP BY _st_day;
+
+CREATE UNIQUE INDEX IF NOT EXISTS block_days_st_day ON ethereum.block_days (_st_day);
@@ -8,6 +8,7 @@ from sqlalchemy import (
     Date,
     DateTime,
     Integer,
+    LargeBinary,
     Numeric,
     UniqueConstraint,
     String,
@@ -42,6 +43,52 @@ class Log(Base):
     updated_at = Column(DateTime, server_default=text("CURRENT_TIMESTAMP"))
 
 
+class LogTopics(Base):
+    """
+    Materialized view of `ethereum.logs` with the comma separated `topics`
+    pre-split into binary columns, see migrations/001_log_topics.sql.
+    """
+
+    __tablename__ = "log_topics"
+    __table_args__ = {"schema": "ethereum"}
+    id = Column(BigInteger, primary_key=True)
+    _st = Column(Integer)
+    _st_day = Column(Date)
+    blknum = Column(BigInteger)
+    txhash = Column(String(66))
+    logpos = Column(Integer)
+    address = Column(String(42))
+    data = Column(Text)
+    topic0 = Column(LargeBinary)
+    topic1 = Column(LargeBinary)
+    topic2 = Column(LargeBinary)
+    topic3 = Column(LargeBinary)
+
+
+class TxIndex(Base):
+    """
+    Partition of each transaction, see migrations/002_partition_lookup.sql.
+    """
+
+    __tablename__ = "tx_index"
+    __table_args__ = {"schema": "ethereum"}
+    txhash = Column(String(66), primary_key=True)
+    blknum = Column(BigInteger)
+    _st_day = Column(Date)
+
+
+class BlockDay(Base):
+    """
+    Block range of each `_st_day`, see migrations/002_partition_lookup.sql.
+    """
+
+    __tablename__ = "block_days"
+    __table_args__ = {"schema": "ethereum"}
+    _st_day = Column(Date, primary_key=True)
+    start_blknum = Column(BigInteger)
+    end_blknum = Column(BigInteger)
+
+
 class Transaction(Base):
     __tablename__ = "txs"
     __table_args__ = {"schema": "ethereum"}
@@ -0,0 +1,85 @@
+from typing import Any, Dict, List, Sequence, Union
+
+from calldata import CalldataDecoder
+from decoder import EventLogsDecoder
+from provider import RawRPCProvider
+from resolver import ReverseResolver
+from type import LogDict
+
+
+class BatchDecoder:
+    """
+    Decodes batches of transactions or log records into JSON-ready dicts.
+
+    A batch of transactions costs one JSON-RPC batch for the transactions and
+    receipts, one for their blocks and one ENS lookup for the senders. Their
+    logs go through a single `decode_all`, thus a single prefetch.
+    """
+
+    def __init__(
+        self,
+        provider: RawRPCProvider,
+        evt_decoder: EventLogsDecoder,
+        calldata_decoder: CalldataDecoder,
+        resolver: ReverseResolver,
+    ) -> None:
+        self.provider = provider
+        self.evt_decoder = evt_decoder
+        self.calldata_decoder = calldata_decoder
+        self.resolver = resolver
+
+    def decode_logs(self, batch: Sequence[List[LogDict]]) -> List[List[str]]:
+        actions = self.evt_decoder.decode_all([log for logs in batch for log in logs])
+        results, start = [], 0
+        for logs in batch:
+            results.append(actions[start : start + len(logs)])
+            start += len(logs)
+        return results
+
+    def decode_txs(self, txhashes: Sequence[str]) -> List[Union[Dict, Exception]]:
+        """
+        Fetches and decodes transactions.
+
+        Parameters
+        ----------
+        txhashes : Sequence[str]
+            The transaction hashes.
+
+        Returns
+        -------
+        List[Union[Dict, Exception]]
+            The decoded transaction of each hash, or a LookupError if unknown.
+
+        """
+        txs = self.provider.get_txs_by_hashes(txhashes)
+        found = [tx for tx in txs if tx is not None]
+        names = self.resolver.names([tx["from"] for tx in found])
+        actions = iter(self.decode_logs([tx["logs"] for tx in found]))
+        results: List[Any] = []
+        for txhash, tx in zip(txhashes, txs):
+            if tx is None:
+                results.append(LookupError(f"Transaction {txhash} not found"))
+                continue
+            tx_actions = next(actions)
+            results.append(
+                {
+                    "txhash": tx["txhash"],
+                    "blknum": tx["blknum"],
+                    "block_timestamp": tx["block_timestamp"],
+                    "from": tx["from"],
+                    "from_name": names.get(tx["from"].lower()),
+                    "to": tx["to"],
+                    # Wei amounts do not fit in JSON doubles
+                    "value": str(tx["value"]),
+                    "status": tx["status"],
+                    "gas_used": tx["gas_used"],
+                    "gas_price": tx["gas_price"],
+                    "input": self.calldata_decoder.decode(tx["input"]),
+                    "actions": [
+                        {"logpos": log["logpos"], "action": action}
+                        for log, action in zip(tx["logs"], tx_actions)
+                        if action
+                    ],
+                }
+            )
+        return results
@@ -0,0 +1,119 @@
+import logging
+from datetime import date, timedelta
+from typing import List, Sequence, Tuple
+
+from multicall import Call
+from sqlalchemy import desc, func, select
+from sqlalchemy.orm import Session
+
+from batcher import MulticallBatcher
+from cache import CallCache, make_call_key
+from model import Log, Token
+from provider import SQLProvider
+
+# Transfer(address,address,uint256)
+TRANSFER_TOPIC = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+POOL_TOPICS = (
+    # Uniswap V2 Swap(address,uint256,uint256,uint256,uint256,address)
+    "0xd78ad95fa46c994b6551d0da85fc275fe613ce37657fb8d5e3d130840159d822",
+    # Uniswap V3 Swap(address,address,int256,int256,uint160,uint128,int24)
+    "0xc42079f94a6350d7e6235f29174924f928cc2ac818eb64fed8004e115fbcca67",
+)
+DECIMALS_FUNC = "decimals()(uint8)"
+TOKEN0_FUNC = "token0()(address)"
+TOKEN1_FUNC = "token1()(address)"
+
+
+def _most_active(
+    sess: Session, topics: Sequence[str], since: date, limit: int
+) -> List[str]:
+    n_logs = func.count().label("n_logs")
+    stmt = (
+        select(Log.address, n_logs)
+        .where(Log._st_day >= since, Log.topics_0.in_(topics))
+        .group_by(Log.address)
+        .order_by(desc(n_logs))
+        .limit(limit)
+    )
+    return [address.lower() for address, _ in sess.execute(stmt)]
+
+
+def _known_decimals(sess: Session, addrs: Sequence[str]) -> List[Tuple[str, int]]:
+    stmt = select(Token.address, Token.decimals).where(
+        Token.address.in_(addrs), Token.decimals.is_not(None)
+    )
+    return sess.execute(stmt).all()
+
+
+def _fetch(mc: MulticallBatcher, cache: CallCache, calls: List[Call]) -> None:
+    calls = [call for call in calls if cache.get(make_call_key(call)) is None]
+    for call, result in zip(calls, mc.fetch(calls)):
+        if result is not None:
+            cache.set(make_call_key(call), result)
+
+
+def prefetch_hot(
+    sql: SQLProvider,
+    mc: MulticallBatcher,
+    cache: CallCache,
+    top_tokens: int = 1000,
+    top_pools: int = 1000,
+    days: int = 7,
+    logger: logging.Logger = None,
+) -> None:
+    """
+    Warms the call cache with the tokens and pools seen most in recent logs.
+
+    Parameters
+    ----------
+    sql : SQLProvider
+        The database to rank the addresses from, read on its replicas.
+    mc : MulticallBatcher
+        Resolves what the database does not know, in bulk Multicall batches.
+    cache : CallCache
+        The cache shared by the decoders.
+    top_tokens : int
+        The number of tokens ranked by Transfer count.
+    top_pools : int
+        The number of Uniswap V2/V3 pools ranked by Swap count.
+    days : int
+        The number of recent `_st_day` partitions to rank from.
+    logger : logging.Logger
+        Reports the number of prefetched entries.
+
+    """
+    since = date.today() - timedelta(days=days)
+    tokens = sql.db.run(
+        lambda sess: _most_active(sess, [TRANSFER_TOPIC], since, top_tokens)
+    )
+    pools = sql.db.run(lambda sess: _most_active(sess, POOL_TOPICS, since, top_pools))
+
+    pair_calls = [
+        Call(target=pool, function=function)
+        for pool in pools
+        for function in (TOKEN0_FUNC, TOKEN1_FUNC)
+    ]
+    _fetch(mc, cache, pair_calls)
+    for pool in pools:
+        for function in (TOKEN0_FUNC, TOKEN1_FUNC):
+            token = cache.get(make_call_key(Call(target=pool, function=function)))
+            if token is not None:
+                tokens.append(token.lower())
+
+    # model.Token already holds the decimals of most tokens
+    tokens = list(dict.fromkeys(tokens))
+    known = sql.db.run(lambda sess: _known_decimals(sess, tokens))
+    for address, decimals in known:
+        cache.set(make_call_key(Call(target=address, function=DECIMALS_FUNC)), decimals)
+    known_addrs = {address.lower() for address, _ in known}
+    _fetch(
+        mc,
+        cache,
+        [
+            Call(target=token, function=DECIMALS_FUNC)
+            for token in tokens
+            if token not in known_addrs
+        ],
+    )
+    if logger:
+        logger.info(f"Prefetched {len(tokens)} tokens and {len(pools)} pools")
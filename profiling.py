@@ -0,0 +1,325 @@
+import contextlib
+import cProfile
+import functools
+import io
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from batcher import MulticallBatcher
+from decoder import BaseDecoder, EventLogsDecoder, EventPlan
+
+# Pipeline stages, in the order a log goes through them
+STAGES = (
+    "provider_fetch",
+    "signature_lookup",
+    "eth_decode_log",
+    "prefetch",
+    "handler",
+    "multicall",
+    "formatting",
+)
+
+# (stage, protocol)
+Label = Tuple[str, Optional[str]]
+
+_HIDDEN_FILES = (__file__, contextlib.__file__, tracemalloc.__file__)
+
+
+class _Frame:
+    __slots__ = ("label", "start", "children")
+
+    def __init__(self, label: Label, start: float) -> None:
+        self.label = label
+        self.start = start
+        self.children = 0.0
+
+
+class Profiler:
+    """
+    Profiles a decoding run, attributing its cost to pipeline stages and
+    protocols.
+
+    `instrument` wraps the stages of a decoder so that each thread keeps a
+    stack of the (stage, protocol) it is in. On top of the exclusive wall
+    time of every stage, the enabled profilers are:
+
+    - cprofile: one deterministic profiler per decoding thread, merged
+    - sample: a sampling profiler reading every thread's stack each
+      `interval` seconds, prefixed with its stage and protocol
+    - tracemalloc: the top allocation sites of the run
+
+    `write` saves collapsed-stack files (one "frame;frame;... count" line per
+    stack, as read by flamegraph.pl or speedscope) and text reports.
+    """
+
+    def __init__(
+        self,
+        profilers: Iterable[str] = ("cprofile", "sample", "tracemalloc"),
+        interval: float = 0.005,
+        top: int = 25,
+    ) -> None:
+        self.profilers = set(profilers)
+        unknown = self.profilers - {"cprofile", "sample", "tracemalloc"}
+        if unknown:
+            raise ValueError(f"Unknown profilers: {', '.join(sorted(unknown))}")
+        self.interval = interval
+        self.top = top
+        self.stage_times: Dict[Label, float] = defaultdict(float)
+        self.stage_calls: Counter = Counter()
+        self.samples: Counter = Counter()
+        self.elapsed = 0.0
+        # thread id -> stack of stages
+        self._stacks: Dict[int, List[_Frame]] = {}
+        self._cprofiles: Dict[int, cProfile.Profile] = {}
+        self._patches: List[Tuple[Any, str, Any, bool]] = []
+        self._lock = threading.Lock()
+        self._running = False
+        self._started = 0.0
+        self._evt_decoders: List[EventLogsDecoder] = []
+        self._sampler: Optional[threading.Thread] = None
+        self._snapshot: Optional[tracemalloc.Snapshot] = None
+
+    @contextmanager
+    def stage(self, stage: str, protocol: Optional[str] = None) -> Iterator[None]:
+        tid = threading.get_ident()
+        stack = self._stacks.setdefault(tid, [])
+        if protocol is None and stack:
+            # Nested stages (Multicall in a handler) keep the caller's protocol
+            protocol = stack[-1].label[1]
+        if not stack and "cprofile" in self.profilers and self._running:
+            profile = self._cprofiles.setdefault(tid, cProfile.Profile())
+            try:
+                profile.enable()
+            except ValueError:
+                # Python 3.12+ only allows one active profiler at a time
+                del self._cprofiles[tid]
+        frame = _Frame((stage, protocol), time.perf_counter())
+        stack.append(frame)
+        try:
+            yield
+        finally:
+            stack.pop()
+            elapsed = time.perf_counter() - frame.start
+            with self._lock:
+                self.stage_times[frame.label] += elapsed - frame.children
+                self.stage_calls[frame.label] += 1
+            if stack:
+                stack[-1].children += elapsed
+            elif tid in self._cprofiles:
+                self._cprofiles[tid].disable()
+
+    def wrap(
+        self, fn: Callable, stage: str, protocol: Optional[str] = None
+    ) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with self.stage(stage, protocol):
+                return fn(*args, **kwargs)
+
+        wrapper._profiled = fn
+        return wrapper
+
+    def timed_iter(self, items: Iterable, stage: str) -> Iterator:
+        """
+        Yields from `items`, charging the time spent producing them to `stage`.
+        """
+        items = iter(items)
+        while True:
+            with self.stage(stage):
+                try:
+                    item = next(items)
+                except StopIteration:
+                    return
+            yield item
+
+    def _patch(self, obj: Any, name: str, value: Any) -> None:
+        own = name in vars(obj)
+        self._patches.append((obj, name, getattr(obj, name), own))
+        setattr(obj, name, value)
+
+    def _instrument_decoder(self, decoder: BaseDecoder) -> None:
+        protocol = decoder.__class__.__name__
+        self._patch(
+            decoder, "prefetch", self.wrap(decoder.prefetch, "prefetch", protocol)
+        )
+
+    def _instrument_handler(self, handle_func: Callable) -> Callable:
+        owner = getattr(handle_func, "__self__", None)
+        protocol = owner.__class__.__name__ if owner is not None else None
+        return self.wrap(handle_func, "handler", protocol)
+
+    def instrument(self, evt_decoder: EventLogsDecoder, mc: MulticallBatcher) -> None:
+        """
+        Wraps the stages of `evt_decoder`, including the protocols it loads
+        later on, until `stop`.
+        """
+        self._evt_decoders.append(evt_decoder)
+        self._patch(
+            evt_decoder.signatures,
+            "get",
+            self.wrap(evt_decoder.signatures.get, "signature_lookup"),
+        )
+        self._patch(EventPlan, "decode", self.wrap(EventPlan.decode, "eth_decode_log"))
+        self._patch(mc, "fetch", self.wrap(mc.fetch, "multicall"))
+
+        for decoder in evt_decoder.decoders:
+            self._instrument_decoder(decoder)
+        for topic0, handle_func in list(evt_decoder.hdlrs.items()):
+            evt_decoder.hdlrs[topic0] = self._instrument_handler(handle_func)
+
+        register = evt_decoder._register
+        register_class = evt_decoder.register_class
+
+        def _register(topic0: str, event_sig: str, handle_func: Callable) -> None:
+            register(topic0, event_sig, self._instrument_handler(handle_func))
+
+        def _register_class(cls: BaseDecoder) -> None:
+            register_class(cls)
+            self._instrument_decoder(cls)
+
+        self._patch(evt_decoder, "_register", _register)
+        self._patch(evt_decoder, "register_class", _register_class)
+
+    def _sample(self) -> None:
+        own = threading.get_ident()
+        while self._running:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            for tid, stack in list(self._stacks.items()):
+                if tid == own or not stack or tid not in frames:
+                    continue
+                try:
+                    stage, protocol = stack[-1].label
+                except IndexError:
+                    continue
+                names = []
+                frame = frames[tid]
+                while frame is not None:
+                    code = frame.f_code
+                    # Leave the stage wrappers out of the flames
+                    if code.co_filename not in _HIDDEN_FILES:
+                        names.append(
+                            f"{os.path.basename(code.co_filename)}:{code.co_name}"
+                        )
+                    frame = frame.f_back
+                prefix = [stage] if protocol is None else [stage, protocol]
+                self.samples[";".join(prefix + names[::-1])] += 1
+
+    def start(self) -> None:
+        self._running = True
+        self._started = time.perf_counter()
+        if "tracemalloc" in self.profilers:
+            tracemalloc.start(25)
+        if "sample" in self.profilers:
+            self._sampler = threading.Thread(
+                target=self._sample, name="sampler", daemon=True
+            )
+            self._sampler.start()
+
+    def stop(self) -> None:
+        self.elapsed = time.perf_counter() - self._started
+        self._running = False
+        if self._sampler is not None:
+            self._sampler.join()
+        if tracemalloc.is_tracing():
+            self._snapshot = tracemalloc.take_snapshot().filter_traces(
+                [tracemalloc.Filter(False, path) for path in _HIDDEN_FILES]
+            )
+            tracemalloc.stop()
+        for profile in self._cprofiles.values():
+            profile.disable()
+        while self._patches:
+            obj, name, value, own = self._patches.pop()
+            if own:
+                setattr(obj, name, value)
+            else:
+                delattr(obj, name)
+        for evt_decoder in self._evt_decoders:
+            for topic0, handle_func in evt_decoder.hdlrs.items():
+                evt_decoder.hdlrs[topic0] = getattr(
+                    handle_func, "_profiled", handle_func
+                )
+
+    def summary(self) -> str:
+        lines = [f"{'stage':<18} {'protocol':<22} {'calls':>9} {'time':>9} {'%':>6}"]
+        order = {stage: idx for idx, stage in enumerate(STAGES)}
+        labels = sorted(
+            self.stage_times,
+            key=lambda label: (order.get(label[0], len(order)), label[1] or ""),
+        )
+        for label in labels:
+            seconds = self.stage_times[label]
+            lines.append(
+                f"{label[0]:<18} {label[1] or '-':<22} "
+                f"{self.stage_calls[label]:>9} {seconds:>8.3f}s "
+                f"{100 * seconds / self.elapsed if self.elapsed else 0:>5.1f}%"
+            )
+        lines.append(f"{'total (wall)':<41} {'':>9} {self.elapsed:>8.3f}s")
+        # Stages of concurrent threads overlap, their sum can exceed the wall
+        lines.append("stage times are summed over threads, % is of the wall time")
+        return "\n".join(lines)
+
+    def write(self, out_dir: str) -> List[str]:
+        """
+        Writes the reports to `out_dir`.
+
+        Parameters
+        ----------
+        out_dir : str
+            The output directory, created if needed.
+
+        Returns
+        -------
+        List[str]
+            The paths of the written files.
+
+        """
+        os.makedirs(out_dir, exist_ok=True)
+        paths = []
+
+        def dump(name: str, content: str) -> None:
+            path = os.path.join(out_dir, name)
+            with open(path, "w") as f:
+                f.write(content)
+            paths.append(path)
+
+        dump("stages.txt", self.summary() + "\n")
+        # Exclusive time of each stage in microseconds, one flame per stage
+        dump(
+            "stages.collapsed",
+            "".join(
+                f"{stage};{protocol or '-'} {int(seconds * 1e6)}\n"
+                for (stage, protocol), seconds in self.stage_times.items()
+            ),
+        )
+        if self.samples:
+            dump(
+                "samples.collapsed",
+                "".join(f"{stack} {n}\n" for stack, n in self.samples.most_common()),
+            )
+        if self._cprofiles:
+            stats = pstats.Stats(*self._cprofiles.values())
+            path = os.path.join(out_dir, "cprofile.pstats")
+            stats.dump_stats(path)
+            paths.append(path)
+            buf = io.StringIO()
+            stats.stream = buf
+            stats.sort_stats("cumulative").print_stats(self.top)
+            dump("cprofile.txt", buf.getvalue())
+        if self._snapshot is not None:
+            stats = self._snapshot.statistics("traceback")[: self.top]
+            lines = []
+            for rank, stat in enumerate(stats, 1):
+                lines.append(
+                    f"#{rank}: {stat.size / 1024:.1f} KiB in {stat.count} blocks"
+                )
+                lines.extend(f"    {line}" for line in stat.traceback.format()[-6:])
+            dump("allocations.txt", "\n".join(lines) + "\n")
+        return paths
@@ -0,0 +1,124 @@
+"""
+Protocol decoders, imported lazily.
+
+The manifest below lets `EventLogsDecoder.register_protocol` route topics to
+a protocol without importing its module, which only happens the first time
+one of its topics is decoded.
+"""
+
+import importlib
+from typing import TYPE_CHECKING, Dict, Tuple, Type
+
+if TYPE_CHECKING:
+    from decoder import BaseDecoder
+
+PROTOCOLS: Dict[str, Tuple[str, str]] = {
+    "uniswap_v2": ("protocols.uniswap", "UniswapV2Decoder"),
+    "uniswap_v3": ("protocols.uniswap", "UniswapV3Decoder"),
+    "aave_v2": ("protocols.aave", "AAVEV2Decoder"),
+    "aave_v3": ("protocols.aave", "AAVEV3Decoder"),
+    "compound_v3": ("protocols.compound", "CompoundV3Decoder"),
+    "bancor_v3": ("protocols.bancor", "BancorV3Decoder"),
+    "curve_v2": ("protocols.curve", "CurveV2Decoder"),
+}
+
+# topic0 of the handlers of each protocol, checked against its @event methods
+# when the protocol is loaded
+TOPICS: Dict[str, Tuple[str, ...]] = {
+    "uniswap_v2": (
+        # Swap(address,uint256,uint256,uint256,uint256,address)
+        "0xd78ad95fa46c994b6551d0da85fc275fe613ce37657fb8d5e3d130840159d822",
+        # PairCreated(address,address,address,uint256)
+        "0x0d3648bd0f6ba80134a33ba9275ac585d9d315f0ad8355cddefde31afa28d0e9",
+        # Mint(address,uint256,uint256)
+        "0x4c209b5fc8ad50758f13e2e1088ba56a560dff690a1c6fef26394f4c03821c4f",
+        # Burn(address,uint256,uint256,address)
+        "0xdccd412f0b1252819cb1fd330b93224ca42612892bb3f4f789976e6d81936496",
+    ),
+    "uniswap_v3": (
+        # PoolCreated(address,address,uint24,int24,address)
+        "0x783cca1c0412dd0d695e784568c96da2e9c22ff989357a2e8b1d9b2b4e6b7118",
+        # IncreaseLiquidity(uint256,uint128,uint256,uint256)
+        "0x3067048beee31b25b2f1681f88dac838c8bba36af25bfb2b7cf7473a5847e35f",
+        # DecreaseLiquidity(uint256,uint128,uint256,uint256)
+        "0x26f6a048ee9138f2c0ce266f322cb99228e8d619ae2bff30c67f8dcf9d2377b4",
+        # Swap(address,address,int256,int256,uint160,uint128,int24)
+        "0xc42079f94a6350d7e6235f29174924f928cc2ac818eb64fed8004e115fbcca67",
+        # Flash(address,address,uint256,uint256,uint256,uint256)
+        "0xbdbdb71d7860376ba52b25a5028beea23581364a40522f6bcfb86bb1f2dca633",
+        # Collect(address,int24,int24,uint128,uint128)
+        "0xe574944a4118cae222e28b5359f80978fd20eddaff02decf4e24c10fbd1247f7",
+        # OwnerChanged(address,address)
+        "0xb532073b38c83145e3e5135377a08bf9aab55bc0fd7c1179cd4fb995d2a5159c",
+    ),
+    "aave_v2": (
+        # Deposit(address,address,address,uint256,uint16)
+        "0xde6857219544bb5b7746f48ed30be6386fefc61b2f864cacf559893bf50fd951",
+        # Borrow(address,address,address,uint256,uint256,uint256,uint16)
+        "0xc6a898309e823ee50bac64e45ca8adba6690e99e7841c45d754e2a38e9019d9b",
+        # Withdraw(address,address,address,uint256)
+        "0x3115d1449a7b732c986cba18244e897a450f61e1bb8d589cd2e69e6c8924f9f7",
+        # Repay(address,address,address,uint256)
+        "0x4cdde6e09bb755c9a5589ebaec640bbfedff1362d4b255ebf8339782b9942faa",
+        # FlashLoan(address,address,address,uint256,uint256,uint16)
+        "0x631042c832b07452973831137f2d73e395028b44b250dedc5abb0ee766e168ac",
+    ),
+    "aave_v3": (
+        # Supply(address,address,address,uint256,uint16)
+        "0x2b627736bca15cd5381dcf80b0bf11fd197d01a037c52b927a881a10fb73ba61",
+        # Borrow(address,address,address,uint256,uint8,uint256,uint16)
+        "0xb3d084820fb1a9decffb176436bd02558d15fac9b0ddfed8c465bc7359d7dce0",
+        # Withdraw(address,address,address,uint256)
+        "0x3115d1449a7b732c986cba18244e897a450f61e1bb8d589cd2e69e6c8924f9f7",
+        # FlashLoan(address,address,address,uint256,uint8,uint256,uint16)
+        "0xefefaba5e921573100900a3ad9cf29f222d995fb3b6045797eaea7521bd8d6f0",
+        # Repay(address,address,address,uint256,bool)
+        "0xa534c8dbe71f871f9f3530e97a74601fea17b426cae02e1c5aee42c96c784051",
+        # ReserveUsedAsCollateralEnabled(address,address)
+        "0x00058a56ea94653cdf4f152d227ace22d4c00ad99e2a43f58cb7d9e3feb295f2",
+        # ReserveUsedAsCollateralDisabled(address,address)
+        "0x44c58d81365b66dd4b1a7f36c25aa97b8c71c361ee4937adc1a00000227db5dd",
+    ),
+    "compound_v3": (
+        # SupplyCollateral(address,address,address,uint256)
+        "0xfa56f7b24f17183d81894d3ac2ee654e3c26388d17a28dbd9549b8114304e1f4",
+        # Withdraw(address,address,uint256)
+        "0x9b1bfa7fa9ee420a16e124f794c35ac9f90472acc99140eb2f6447c714cad8eb",
+        # Supply(address,address,uint256)
+        "0xd1cf3d156d5f8f0d50f6c122ed609cec09d35c9b9fb3fff6ea0959134dae424e",
+    ),
+    "bancor_v3": (
+        # TokensTraded(bytes32,address,address,uint256,uint256,uint256,uint256,uint256,address)
+        "0x5c02c2bb2d1d082317eb23916ca27b3e7c294398b60061a2ad54f1c3c018c318",
+        # FundsWithdrawn(address,address,address,uint256)
+        "0xc322efa58c9cb2c39cfffdac61d35c8643f5cbf13c6a7d0034de2cf18923aff3",
+    ),
+    "curve_v2": (
+        # TokenExchange(address,address,address,address,address,uint256,uint256)
+        "0xbd3eb7bcfdd1721a4eb4f00d0df3ed91bd6f17222f82b2d7bce519d8cab3fe46",
+    ),
+}
+
+
+def load_protocol(name: str) -> Type["BaseDecoder"]:
+    """
+    Imports the decoder class of a protocol.
+
+    Parameters
+    ----------
+    name : str
+        The protocol name, a key of `PROTOCOLS`.
+
+    Returns
+    -------
+    Type[BaseDecoder]
+        The decoder class.
+
+    """
+    if name not in PROTOCOLS:
+        raise ValueError(f"Unknown protocol: {name}")
+    module, class_name = PROTOCOLS[name]
+    cls = getattr(importlib.import_module(module), class_name)
+    if set(cls.EVENTS) != set(TOPICS[name]):
+        raise ValueError(f"TOPICS of {name} do not match its event handlers")
+    return cls
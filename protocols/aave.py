@@ -0,0 +1,172 @@
+import logging
+
+from multicall import Multicall
+
+from cache import CallCache
+from decoder import BaseDecoder, EventPayload, event
+from utils import get_addr_entry
+
+
+class AAVEV2Decoder(BaseDecoder):
+    def __init__(
+        self, mc: Multicall, logger: logging.Logger = None, cache: CallCache = None
+    ):
+        super().__init__(mc, logger, cache)
+
+    # Deposit (index_topic_1 address reserve, address user, index_topic_2 address onBehalfOf, uint256 amount, index_topic_3 uint16 referral)
+    @event("Deposit(address,address,address,uint256,uint16)")
+    def deposit(self, payload: EventPayload) -> str:
+        template = "Deposit {amount} {token} to {protocol}"
+        token_addr = payload["params"]["reserve"]
+        (token_scale,) = self._get_token_scales(token_addr, payload["blknum"])
+        amount = token_scale(payload["params"]["amount"])
+        return template.format(
+            amount=amount,
+            token=get_addr_entry(token_addr),
+            protocol=get_addr_entry(payload["address"]),
+        )
+
+    # Borrow (index_topic_1 address reserve, address user, index_topic_2 address onBehalfOf, uint256 amount, uint256 borrowRateMode, uint256 borrowRate, index_topic_3 uint16 referral)
+    @event("Borrow(address,address,address,uint256,uint256,uint256,uint16)")
+    def borrow(self, payload: EventPayload) -> str:
+        template = "Borrow {amount} {token} from {protocol}"
+        token_addr = payload["params"]["reserve"]
+        (token_scale,) = self._get_token_scales(token_addr, payload["blknum"])
+        amount = token_scale(payload["params"]["amount"])
+        return template.format(
+            amount=amount,
+            token=get_addr_entry(token_addr),
+            protocol=get_addr_entry(payload["address"]),
+        )
+
+    # Withdraw (index_topic_1 address reserve, index_topic_2 address user, index_topic_3 address to, uint256 amount)
+    @event("Withdraw(address,address,address,uint256)")
+    def withdraw(self, payload: EventPayload) -> str:
+        template = "Withdraw {amount} {token} from {protocol}"
+        token_addr = payload["params"]["reserve"]
+        (token_scale,) = self._get_token_scales(token_addr, payload["blknum"])
+        amount = token_scale(payload["params"]["amount"])
+        return template.format(
+            amount=amount,
+            token=get_addr_entry(token_addr),
+            protocol=get_addr_entry(payload["address"]),
+        )
+
+    # Repay (index_topic_1 address reserve, index_topic_2 address user, index_topic_3 address repayer, uint256 amount)
+    @event("Repay(address,address,address,uint256)")
+    def repay(self, payload: EventPayload) -> str:
+        template = "Repay {amount} {token} to {protocol}"
+        token_addr = payload["params"]["reserve"]
+        (token_scale,) = self._get_token_scales(token_addr, payload["blknum"])
+        amount = token_scale(payload["params"]["amount"])
+        return template.format(
+            amount=amount,
+            token=get_addr_entry(token_addr),
+            protocol=get_addr_entry(payload["address"]),
+        )
+
+    # FlashLoan (index_topic_1 address target, index_topic_2 address initiator, index_topic_3 address asset, uint256 amount, uint256 premium, uint16 referralCode)
+    @event("FlashLoan(address,address,address,uint256,uint256,uint16)")
+    def flashloan(self, payload: EventPayload) -> str:
+        template = "Flashloan {amount} {token} from {protocol}"
+        token_addr = payload["params"]["asset"]
+        (token_scale,) = self._get_token_scales(token_addr, payload["blknum"])
+        amount = token_scale(payload["params"]["amount"])
+
+        return template.format(
+            amount=amount,
+            token=get_addr_entry(token_addr),
+            protocol=get_addr_entry(payload["address"]),
+        )
+
+
+class AAVEV3Decoder(BaseDecoder):
+    """
+    Refs:
+    https://etherscan.io/address/0x87870bca3f3fd6335c3f4ce8392d69350b4fa4e2
+    """
+
+    def __init__(
+        self, mc: Multicall, logger: logging.Logger = None, cache: CallCache = None
+    ):
+        super().__init__(mc, logger, cache)
+
+    # Supply (index_topic_1 address reserve, address user, index_topic_2 address onBehalfOf, uint256 amount, index_topic_3 uint16 referralCode)
+    @event("Supply(address,address,address,uint256,uint16)")
+    def supply(self, payload: EventPayload) -> str:
+        template = "Supply {amount} {token} to {protocol}"
+        token_addr = payload["params"]["reserve"]
+        (token_scale,) = self._get_token_scales(token_addr, payload["blknum"])
+        amount = token_scale(payload["params"]["amount"])
+        return template.format(
+            amount=amount,
+            token=get_addr_entry(token_addr),
+            protocol=get_addr_entry(payload["address"]),
+        )
+
+    # Borrow (index_topic_1 address reserve, address user, index_topic_2 address onBehalfOf, uint256 amount, uint8 interestRateMode, uint256 borrowRate, index_topic_3 uint16 referralCode)
+    @event("Borrow(address,address,address,uint256,uint8,uint256,uint16)")
+    def borrow(self, payload: EventPayload) -> str:
+        template = "Borrow {amount} {token} from {protocol}"
+        token_addr = payload["params"]["reserve"]
+        (token_scale,) = self._get_token_scales(token_addr, payload["blknum"])
+        amount = token_scale(payload["params"]["amount"])
+        return template.format(
+            amount=amount,
+            token=get_addr_entry(token_addr),
+            protocol=get_addr_entry(payload["address"]),
+        )
+
+    # Withdraw (index_topic_1 address reserve, index_topic_2 address user, index_topic_3 address to, uint256 amount)
+    @event("Withdraw(address,address,address,uint256)")
+    def withdraw(self, payload: EventPayload) -> str:
+        template = "Withdraw {amount} {token} from {protocol}"
+        token_addr = payload["params"]["reserve"]
+        (token_scale,) = self._get_token_scales(token_addr, payload["blknum"])
+        amount = token_scale(payload["params"]["amount"])
+        return template.format(
+            amount=amount,
+            token=get_addr_entry(token_addr),
+            protocol=get_addr_entry(payload["address"]),
+        )
+
+    # FlashLoan(address indexed target, address initiator, address indexed asset, uint256 amount, DataTypes.InterestRateMode interestRateMode, uint256 premium, uint16 indexed referralCode);
+    # Custon Type DataTypes.InterestRateMode is an enum, so we use uint8 to represent it
+    @event("FlashLoan(address,address,address,uint256,uint8,uint256,uint16)")
+    def flashloan(self, payload: EventPayload) -> str:
+        template = "Flashloan {amount} {token} from {protocol}"
+        token_addr = payload["params"]["asset"]
+        (token_scale,) = self._get_token_scales(token_addr, payload["blknum"])
+        amount = token_scale(payload["params"]["amount"])
+        return template.format(
+            amount=amount,
+            token=get_addr_entry(token_addr),
+            protocol=get_addr_entry(payload["address"]),
+        )
+
+    # event Repay(address indexed reserve, address indexed user, address indexed repayer, uint256 amount, bool useATokens);
+    @event("Repay(address,address,address,uint256,bool)")
+    def repay(self, payload: EventPayload) -> str:
+        template = "Repay {amount} {token} to {protocol}"
+        token_addr = payload["params"]["reserve"]
+        (token_scale,) = self._get_token_scales(token_addr, payload["blknum"])
+        amount = token_scale(payload["params"]["amount"])
+        return template.format(
+            amount=amount,
+            token=get_addr_entry(token_addr),
+            protocol=get_addr_entry(payload["address"]),
+        )
+
+    # ReserveUsedAsCollateralEnabled (index_topic_1 address reserve, index_topic_2 address user)
+    @event("ReserveUsedAsCollateralEnabled(address,address)")
+    def reserve_used_as_collateral_enabled(self, payload: EventPayload) -> str:
+        asset = get_addr_entry(payload["params"]["reserve"])
+        addr = get_addr_entry(payload["address"])
+        return f"Enable {asset} as collateral on {addr}"
+
+    # ReserveUsedAsCollateralDisabled (index_topic_1 address reserve, index_topic_2 address user)
+    @event("ReserveUsedAsCollateralDisabled(address,address)")
+    def reserve_used_as_collateral_disabled(self, payload: EventPayload) -> str:
+        asset = get_addr_entry(payload["params"]["reserve"])
+        addr = get_addr_entry(payload["address"])
+        return f"Disable {asset} as collateral on {addr}"
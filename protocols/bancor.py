@@ -0,0 +1,49 @@
+import logging
+
+from multicall import Multicall
+
+from cache import CallCache
+from decoder import BaseDecoder, EventPayload, event
+from utils import get_addr_entry
+
+
+class BancorV3Decoder(BaseDecoder):
+    def __init__(
+        self, mc: Multicall, logger: logging.Logger = None, cache: CallCache = None
+    ):
+        super().__init__(mc, logger, cache)
+
+    # TokensTraded (index_topic_1 bytes32 contextId, index_topic_2 address sourceToken, index_topic_3 address targetToken, uint256 sourceAmount, uint256 targetAmount, uint256 bntAmount, uint256 targetFeeAmount, uint256 bntFeeAmount, address trader)
+    @event(
+        "TokensTraded(bytes32,address,address,uint256,uint256,uint256,uint256,uint256,address)"
+    )
+    def tokens_traded(self, payload: EventPayload) -> str:
+        template = "Trade {amount} {token} for {get_amount} {get_token} on Bancor"
+        token_addr = payload["params"]["sourceToken"]
+        get_token_addr = payload["params"]["targetToken"]
+        (token_scale, get_token_scale) = self._get_token_scales(
+            [token_addr, get_token_addr], payload["blknum"]
+        )
+        params = payload["params"]
+        amount = token_scale(params["sourceAmount"])
+        get_amount = get_token_scale(params["targetAmount"])
+        return template.format(
+            amount=amount,
+            token=get_addr_entry(token_addr),
+            get_amount=get_amount,
+            get_token=get_addr_entry(get_token_addr),
+        )
+
+    # FundsWithdrawn (index_topic_1 address token, index_topic_2 address caller, index_topic_3 address target, uint256 amount)
+    @event("FundsWithdrawn(address,address,address,uint256)")
+    def funds_withdrawn(self, payload: EventPayload) -> str:
+        template = "Withdraw {amount} {token} from {protocol}"
+        token_addr = payload["params"]["token"]
+        (token_scale,) = self._get_token_scales(token_addr, payload["blknum"])
+        params = payload["params"]
+        amount = token_scale(params["amount"])
+        return template.format(
+            amount=amount,
+            token=get_addr_entry(token_addr),
+            protocol=get_addr_entry(payload["address"]),
+        )
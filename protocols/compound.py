@@ -0,0 +1,58 @@
+import logging
+
+from multicall import Multicall
+
+from cache import CallCache
+from decoder import BaseDecoder, EventPayload, event
+from utils import get_addr_entry
+
+
+class CompoundV3Decoder(BaseDecoder):
+    def __init__(
+        self, mc: Multicall, logger: logging.Logger = None, cache: CallCache = None
+    ):
+        super().__init__(mc, logger, cache)
+
+    # SupplyCollateral (index_topic_1 address from, index_topic_2 address dst, index_topic_3 address asset, uint256 amount)
+    @event("SupplyCollateral(address,address,address,uint256)")
+    def supply_collateral(self, payload: EventPayload) -> str:
+        template = "Supply {amount} {token} as collateral to {protocol}"
+        token_addr = payload["params"]["asset"]
+        (token_scale,) = self._get_token_scales(token_addr, payload["blknum"])
+        amount = token_scale(payload["params"]["amount"])
+
+        return template.format(
+            amount=amount,
+            token=get_addr_entry(token_addr),
+            protocol=get_addr_entry(payload["address"]),
+        )
+
+    # Withdraw (index_topic_1 address src, index_topic_2 address to, uint256 amount)
+    @event("Withdraw(address,address,uint256)")
+    def withdraw(self, payload: EventPayload) -> str:
+        template = "Withdraw {amount} {token} to {reciver} on Compound"
+        token_addr = payload["address"]
+        (token_scale,) = self._get_token_scales(token_addr, payload["blknum"])
+        params = payload["params"]
+        amount = token_scale(params["__idx_2"])
+        recieiver = params["__idx_1"]
+        return template.format(
+            amount=amount,
+            token=get_addr_entry(token_addr),
+            reciver=get_addr_entry(recieiver),
+        )
+
+    # Supply (index_topic_1 address from, index_topic_2 address dst, uint256 amount)
+    @event("Supply(address,address,uint256)")
+    def supply(self, payload: EventPayload) -> str:
+        template = "Supply {amount} {token} to {dst} on Compound"
+        token_addr = payload["address"]
+        (token_scale,) = self._get_token_scales(token_addr, payload["blknum"])
+        params = payload["params"]
+        amount = token_scale(params["__idx_2"])
+        dst = params["__idx_1"]
+        return template.format(
+            amount=amount,
+            token=get_addr_entry(token_addr),
+            dst=get_addr_entry(dst),
+        )
@@ -0,0 +1,33 @@
+import logging
+
+from multicall import Multicall
+
+from cache import CallCache
+from decoder import BaseDecoder, EventPayload, event
+from utils import get_addr_entry
+
+
+class CurveV2Decoder(BaseDecoder):
+    def __init__(
+        self, mc: Multicall, logger: logging.Logger = None, cache: CallCache = None
+    ):
+        super().__init__(mc, logger, cache)
+
+    # TokenExchange (index_topic_1 address buyer, index_topic_2 address receiver, index_topic_3 address pool, address token_sold, address token_bought, uint256 amount_sold, uint256 amount_bought)
+    @event("TokenExchange(address,address,address,address,address,uint256,uint256)")
+    def token_exchange(self, payload: EventPayload) -> str:
+        template = "Exchange {amount} {token} for {get_amount} {get_token} on Curve"
+        token_addr = payload["params"]["token_sold"]
+        get_token_addr = payload["params"]["token_bought"]
+        (token_scale, get_token_scale) = self._get_token_scales(
+            [token_addr, get_token_addr], payload["blknum"]
+        )
+        params = payload["params"]
+        amount = token_scale(params["amount_sold"])
+        get_amount = get_token_scale(params["amount_bought"])
+        return template.format(
+            amount=amount,
+            token=get_addr_entry(token_addr),
+            get_amount=get_amount,
+            get_token=get_addr_entry(get_token_addr),
+        )
@@ -0,0 +1,306 @@
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional, Set, Tuple
+
+from multicall import Call, Multicall
+
+from cache import CallCache, Position, PositionIndex
+from decoder import BaseDecoder, EventPayload, LookupFailed, event
+from type import LogDict
+from utils import get_addr_entry
+
+
+class BaseUniswapDecoder(BaseDecoder):
+    def _get_token_pair(
+        self, pool_addr: str, block: Optional[int] = None
+    ) -> Tuple[str, str]:
+        token0_addr, token1_addr = self._lookup(
+            [
+                Call(
+                    target=pool_addr,
+                    function="token0()(address)",
+                    request_id="token0",
+                ),
+                Call(
+                    target=pool_addr,
+                    function="token1()(address)",
+                    request_id="token1",
+                ),
+            ],
+            block,
+        )
+        if token0_addr is None or token1_addr is None:
+            raise LookupFailed(f"Cannot fetch token pair of {pool_addr}")
+        return token0_addr, token1_addr
+
+
+class UniswapV2Decoder(BaseUniswapDecoder):
+    def __init__(
+        self,
+        mc: Multicall,
+        logger: logging.Logger = None,
+        cache: CallCache = None,
+    ) -> None:
+        super().__init__(mc, logger, cache)
+
+    # Swap(address indexed sender,uint amount0In, uint amount1In, uint amount0Out, uint amount1Out, address indexed to);
+    @event("Swap(address,uint256,uint256,uint256,uint256,address)")
+    def swap(self, payload: EventPayload) -> str:
+        template = "Swap {get_amount} {get_token} for {pay_amount} {pay_token}  on UniswapV2"
+        token0_addr, token1_addr = self._get_token_pair(
+            payload["address"], payload["blknum"]
+        )
+        token0_scale, token1_scale = self._get_token_scales(
+            [token0_addr, token1_addr], payload["blknum"]
+        )
+        params = payload["params"]
+        amount0_diff = int(params["amount0Out"]) - int(params["amount0In"])
+        amount1_diff = int(params["amount1Out"]) - int(params["amount1In"])
+        if amount0_diff > 0:
+            return template.format(
+                pay_amount=token0_scale(abs(amount0_diff)),
+                pay_token=get_addr_entry(token0_addr),
+                get_amount=token1_scale(abs(amount1_diff)),
+                get_token=get_addr_entry(token1_addr),
+            )
+        else:
+            return template.format(
+                pay_amount=token1_scale(abs(amount1_diff)),
+                pay_token=get_addr_entry(token1_addr),
+                get_amount=token0_scale(abs(amount0_diff)),
+                get_token=get_addr_entry(token0_addr),
+            )
+
+    # PairCreated(address indexed token0, address indexed token1, address pair, uint);
+    @event("PairCreated(address,address,address,uint256)")
+    def pair_created(self, payload: EventPayload) -> str:
+        token0 = get_addr_entry(payload["params"]["token0"])
+        token1 = get_addr_entry(payload["params"]["token1"])
+        return f"Created {token0}/{token1} pair"
+
+    # Mint(address indexed sender, uint amount0, uint amount1);
+    @event("Mint(address,uint256,uint256)")
+    def mint(self, payload: EventPayload) -> str:
+        token0_addr, token1_addr = self._get_token_pair(
+            payload["address"], payload["blknum"]
+        )
+        token0_scale, token1_scale = self._get_token_scales(
+            [token0_addr, token1_addr], payload["blknum"]
+        )
+        params = payload["params"]
+        return ""
+
+    # Burn(address indexed sender, uint amount0, uint amount1, address indexed to);
+    @event("Burn(address,uint256,uint256,address)")
+    def burn(self, payload: EventPayload) -> str:
+        token0_addr, token1_addr = self._get_token_pair(
+            payload["address"], payload["blknum"]
+        )
+        token0_scale, token1_scale = self._get_token_scales(
+            [token0_addr, token1_addr], payload["blknum"]
+        )
+        params = payload["params"]
+        return ""
+
+
+class UniswapV3Decoder(BaseUniswapDecoder):
+    """
+    https://docs.uniswap.org/contracts/v3/reference/core/interfaces/pool/IUniswapV3PoolEvents
+    """
+
+    # Only the fields up to the fee are decoded from the positions() result
+    POSITIONS_FUNC = "positions(uint256)(uint96,address,address,address,uint24)"
+
+    def __init__(
+        self,
+        mc: Multicall,
+        logger: logging.Logger = None,
+        cache: CallCache = None,
+        positions: PositionIndex = None,
+    ):
+        super().__init__(mc, logger, cache)
+        self.positions = positions if positions is not None else PositionIndex()
+        self._position_topics = {
+            self.increase_liquidity.topic0,
+            self.decrease_liquidity.topic0,
+        }
+
+    def prefetch(self, logs: List[LogDict]) -> None:
+        keys: Dict[Optional[int], Set[Tuple[str, int]]] = defaultdict(set)
+        for log in logs:
+            topics = log.get("topics", [])
+            if len(topics) > 1 and topics[0] in self._position_topics:
+                token_id = int(topics[1], 16)
+                keys[log.get("blknum")].add((log["address"], token_id))
+        for block, block_keys in keys.items():
+            self._load_positions(list(block_keys), block)
+
+    def _load_positions(
+        self, keys: List[Tuple[str, int]], block: Optional[int] = None
+    ) -> None:
+        keys = self.positions.missing(keys)
+        if not keys:
+            return
+        calls = [
+            Call(target=manager, function=self.POSITIONS_FUNC, args=[token_id])
+            for manager, token_id in keys
+        ]
+        results = self.mc.fetch(calls, block)
+        if block is not None:
+            # Positions burned within the block only exist at the previous one
+            failed = [idx for idx, result in enumerate(results) if result is None]
+            retried = self.mc.fetch([calls[idx] for idx in failed], block - 1)
+            for idx, result in zip(failed, retried):
+                results[idx] = result
+        for (manager, token_id), result in zip(keys, results):
+            if result is not None:
+                self.positions.add(
+                    manager, token_id, Position(result[2], result[3], result[4])
+                )
+
+    def _get_tokens_by_position(
+        self, manager_addr: str, pos_id: int, block: Optional[int] = None
+    ) -> Tuple[str, str]:
+        position = self.positions.get(manager_addr, pos_id)
+        if position is None:
+            self._load_positions([(manager_addr, pos_id)], block)
+            position = self.positions.get(manager_addr, pos_id)
+        if position is None:
+            raise LookupFailed(f"Cannot find position {pos_id} in {manager_addr}")
+        return position.token0, position.token1
+
+    # PoolCreated(address token0,address token1,uint24 fee,int24 tickSpacing,address pool)
+    @event("PoolCreated(address,address,uint24,int24,address)")
+    def pool_created(self, payload: EventPayload) -> str:
+        token0 = get_addr_entry(payload["params"]["token0"])
+        token1 = get_addr_entry(payload["params"]["token1"])
+        return f"Created {token0}/{token1} pool with {payload['params']['fee']/ 100}% fee"
+
+    # IncreaseLiquidity(uint256 indexed tokenId, uint128 liquidity, uint256 amount0, uint256 amount1);
+    @event("IncreaseLiquidity(uint256,uint128,uint256,uint256)")
+    def increase_liquidity(self, payload: EventPayload) -> str:
+        template = (
+            "Add {amount0} {token0} and {amount1} {token1} liquidity to {pool}"
+        )
+        params = payload["params"]
+        token0_addr, token1_addr = self._get_tokens_by_position(
+            payload["address"], params["tokenId"], payload["blknum"]
+        )
+        token0_scale, token1_scale = self._get_token_scales(
+            [token0_addr, token1_addr], payload["blknum"]
+        )
+        return template.format(
+            amount0=token0_scale(abs(int(params["amount0"]))),
+            token0=get_addr_entry(token0_addr),
+            amount1=token1_scale(abs(int(params["amount1"]))),
+            token1=get_addr_entry(token1_addr),
+            pool=get_addr_entry(payload["address"]),
+        )
+
+    # DecreaseLiquidity(uint256 indexed tokenId, uint128 liquidity, uint256 amount0, uint256 amount1);
+    @event("DecreaseLiquidity(uint256,uint128,uint256,uint256)")
+    def decrease_liquidity(self, payload: EventPayload) -> str:
+        template = (
+            "Remove {amount0} {token0} and {amount1} {token1} liquidity from {pool}"
+        )
+        params = payload["params"]
+        token0_addr, token1_addr = self._get_tokens_by_position(
+            payload["address"], params["tokenId"], payload["blknum"]
+        )
+        token0_scale, token1_scale = self._get_token_scales(
+            [token0_addr, token1_addr], payload["blknum"]
+        )
+        return template.format(
+            amount0=token0_scale(abs(int(params["amount0"]))),
+            token0=get_addr_entry(token0_addr),
+            amount1=token1_scale(abs(int(params["amount1"]))),
+            token1=get_addr_entry(token1_addr),
+            pool=get_addr_entry(payload["address"]),
+        )
+
+    # Swap(address sender,address recipient,int256 amount0,int256 amount1,uint160 sqrtPriceX96,uint128 liquidity,int24 tick)
+    @event("Swap(address,address,int256,int256,uint160,uint128,int24)")
+    def swap(self, payload: EventPayload) -> str:
+        template = "Swap {pay_amount} {pay_token} for {get_amount} {get_token} on UniswapV3"
+        token0_addr, token1_addr = self._get_token_pair(
+            payload["address"], payload["blknum"]
+        )
+        token0, token1 = get_addr_entry(token0_addr), get_addr_entry(token1_addr)
+        amount0, amount1 = (
+            payload["params"]["amount0"],
+            payload["params"]["amount1"],
+        )
+        token0_scale, token1_scale = self._get_token_scales(
+            [token0_addr, token1_addr], payload["blknum"]
+        )
+        if int(amount0) > 0:
+            return template.format(
+                pay_amount=token0_scale(abs(int(amount0))),
+                pay_token=token0,
+                get_amount=token1_scale(abs(int(amount1))),
+                get_token=token1,
+            )
+        else:
+            return template.format(
+                pay_amount=token1_scale(abs(int(amount1))),
+                pay_token=token1,
+                get_amount=token0_scale(abs(int(amount0))),
+                get_token=token0,
+            )
+
+    # Flash(address sender, address recipient, uint256 amount0, uint256 amount1 ,uint256 paid0, uint256 paid1)
+    @event("Flash(address,address,uint256,uint256,uint256,uint256)")
+    def flash(self, payload: EventPayload) -> str:
+        template = "Flashloan {flash_stmt} then repay {repay_stmt}"
+        token0_addr, token1_addr = self._get_token_pair(
+            payload["address"], payload["blknum"]
+        )
+        token0, token1 = get_addr_entry(token0_addr), get_addr_entry(token1_addr)
+        token0_scale, token1_scale = self._get_token_scales(
+            [token0_addr, token1_addr], payload["blknum"]
+        )
+        params = payload["params"]
+        amount0, paid0 = token0_scale(params["amount0"]), token0_scale(params["paid0"])
+        amount1, paid1 = token1_scale(params["amount1"]), token1_scale(params["paid1"])
+        flash_stmt = []
+        if amount0 > 0:
+            flash_stmt.append(f"{amount0} {token0}")
+        if amount1 > 0:
+            flash_stmt.append(f"{amount1} {token1}")
+
+        repay_stmt = []
+        if paid0 > 0:
+            repay_stmt.append(f"{paid0} {token0}")
+        if paid1 > 0:
+            repay_stmt.append(f"{paid1} {token1}")
+
+        return template.format(
+            flash_stmt=" and ".join(flash_stmt),
+            repay_stmt=" and ".join(repay_stmt),
+        )
+
+    # Collect(address owner,int24 tickLower,int24 tickUpper,uint128 amount0,uint128 amount1)
+    @event("Collect(address,int24,int24,uint128,uint128)")
+    def collect(self, payload: EventPayload) -> str:
+        template = (
+            "Collect {amount0} {token0} and {amount1} {token1} fees from {pool}"
+        )
+        token0_addr, token1_addr = self._get_token_pair(
+            payload["address"], payload["blknum"]
+        )
+        token0_scale, token1_scale = self._get_token_scales(
+            [token0_addr, token1_addr], payload["blknum"]
+        )
+        params = payload["params"]
+        return template.format(
+            amount0=token0_scale(abs(int(params["amount0"]))),
+            token0=get_addr_entry(token0_addr),
+            amount1=token1_scale(abs(int(params["amount1"]))),
+            token1=get_addr_entry(token1_addr),
+            pool=get_addr_entry(payload["address"]),
+        )
+
+    # OwnerChanged(address oldOwner, address newOwner)
+    @event("OwnerChanged(address,address)")
+    def owner_changed(self, payload: EventPayload) -> str:
+        return f"Change owner of {payload['address']} from {payload['params']['oldOwner']} to {payload['params']['newOwner']}"
@@ -1,14 +1,33 @@
 from abc import ABC, abstractmethod
+from bisect import bisect_right
+import logging
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import date
 from type import TxDict, LogDict
-from typing import Literal, List
+from typing import (
+    Any,
+    Deque,
+    Dict,
+    Iterator,
+    Literal,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+from bloom import BloomFilter
 from os import getenv
 from sqlalchemy.engine import Engine, create_engine
-from sqlalchemy.orm import sessionmaker, Session
-from model import Transaction, Log
+from sqlalchemy.orm import Session
+from model import BlockDay, Log, LogTopics, Transaction, TxIndex
 from web3 import Web3
 from sqlalchemy import select
-from web3.types import TxReceipt, LogReceipt
-from ens import ENS
+from web3.types import BlockData, TxData, TxReceipt, LogReceipt
+from ratelimit import is_rate_limited
+from replicas import ReplicaSet
+from rpc import RawJSONRPC
 
 
 class BaseProvider(ABC):
@@ -21,7 +40,32 @@ class BaseProvider(ABC):
 
 
 class SQLProvider:
-    def __init__(self, dialect: Literal["postgresql"] = "postgresql") -> None:
+    """
+    Reads transactions from the ethereum-etl Postgres tables.
+
+    `ethereum.logs.topics` holds the topics as one comma separated string.
+    With `topic_columns`, logs are read from the `ethereum.log_topics` view
+    instead (migrations/001_log_topics.sql), whose topics are already split
+    into binary columns, so no text is parsed per row.
+
+    `ethereum.txs` and `ethereum.logs` are partitioned by `_st_day`, every
+    query filters on it so that Postgres prunes to a single partition. The
+    day of a transaction is given by the caller, or derived from its block
+    through the `ethereum.block_days` map, or looked up by hash in
+    `ethereum.tx_index` (migrations/002_partition_lookup.sql). Both are
+    materialized views: blocks loaded since their last refresh are read
+    without the `_st_day` filter instead, scanning every partition.
+    """
+
+    def __init__(
+        self,
+        dialect: Literal["postgresql"] = "postgresql",
+        topic_columns: bool = False,
+        replicas: Sequence[str] = None,
+        workers: int = 4,
+        shard_size: int = 10_000,
+        logger: logging.Logger = None,
+    ) -> None:
         db_username = getenv("DB_USERNAME")
         db_password = getenv("DB_PASSWORD")
         db_host = getenv("DB_HOST")
@@ -31,79 +75,638 @@ class SQLProvider:
             f"{dialect}://{db_username}:{db_password}@{db_host}:{db_port}/{db_name}"
         )
         self.engine: Engine = create_engine(db_url, echo=True)
+        if replicas is None:
+            replicas = [
+                host for host in getenv("DB_REPLICA_HOSTS", "").split(",") if host
+            ]
+        # Replicas share the credentials of the primary, "host" or "host:port"
+        replica_engines = [
+            create_engine(
+                f"{dialect}://{db_username}:{db_password}@"
+                f"{host if ':' in host else f'{host}:{db_port}'}/{db_name}",
+                echo=True,
+            )
+            for host in replicas
+        ]
+        self.db = ReplicaSet(self.engine, replica_engines, logger=logger)
+        self.topic_columns = topic_columns
+        self.workers = workers
+        self.shard_size = shard_size
+        # (first block, last block, day) sorted by first block
+        self._days: List[Tuple[int, int, date]] = []
+        self._day_starts: List[int] = []
+
+    def _load_days(self, sess: Session) -> None:
+        stmt = select(
+            BlockDay.start_blknum, BlockDay.end_blknum, BlockDay._st_day
+        ).order_by(BlockDay.start_blknum)
+        days = [tuple(row) for row in sess.execute(stmt)]
+        self._days, self._day_starts = days, [start for start, _, _ in days]
+
+    def _day_of_block(self, sess: Session, blknum: int) -> Optional[date]:
+        if not self._days or blknum > self._days[-1][1]:
+            # New days are appended as blocks get loaded
+            self._load_days(sess)
+        i = bisect_right(self._day_starts, blknum) - 1
+        if i < 0 or blknum > self._days[i][1]:
+            # Not in block_days yet
+            return None
+        return self._days[i][2]
 
-    def _make_logs(self, logs: list[Log]) -> list[LogDict]:
+    def _days_in_range(
+        self, sess: Session, start: int, end: int
+    ) -> List[Tuple[int, int, Optional[date]]]:
+        if not self._days or end > self._days[-1][1]:
+            self._load_days(sess)
+        days = []
+        # Blocks of [start, end] missing from block_days get a None day
+        cursor = start
+        for first, last, day in self._days:
+            if first > end or last < start:
+                continue
+            if first > cursor:
+                days.append((cursor, first - 1, None))
+            days.append((max(start, first), min(end, last), day))
+            cursor = last + 1
+        if cursor <= end:
+            days.append((cursor, end, None))
+        return days
+
+    def _locate(
+        self,
+        sess: Session,
+        txhash: str,
+        blknum: Optional[int] = None,
+        day: Optional[date] = None,
+    ) -> Tuple[Optional[int], Optional[date]]:
+        if day is not None:
+            return blknum, day
+        if blknum is not None:
+            return blknum, self._day_of_block(sess, blknum)
+        stmt = select(TxIndex.blknum, TxIndex._st_day).where(TxIndex.txhash == txhash)
+        row = sess.execute(stmt).one_or_none()
+        if row is None:
+            # Not in tx_index yet
+            return None, None
+        return row.blknum, row._st_day
+
+    def _make_logs(self, logs: list[Log]) -> list[Tuple[str, LogDict]]:
         return [
-            {
-                "logpos": log.logpos,
-                "address": log.address,
-                "topics": log.topics,
-                "data": log.data,
-            }
+            (
+                log.txhash,
+                {
+                    "blknum": log.blknum,
+                    "logpos": log.logpos,
+                    "address": log.address,
+                    "topics": log.topics.split(",") if log.topics else [],
+                    "data": log.data,
+                },
+            )
             for log in logs
         ]
 
-    def get_tx_by_hash(self, txhash: str) -> TxDict:
-        SessFactory = sessionmaker(bind=self.engine)
-        with SessFactory() as sess:
-            stmt_tx = select(Transaction).where(Transaction.txhash == txhash)
-            result = sess.scalars(stmt_tx).one()
-
-            stmt_logs = select(Log).where(Log.txhash == txhash).order_by(Log.logpos)
-            logs = sess.scalars(stmt_logs).all()
-
-            return {
-                "txhash": result.txhash,
-                "from": result.from_address,
-                "to": result.to_address,
-                "value": result.value,
-                "block_timestamp": result.block_timestamp,
-                "gas_used": result.gas,
-                "gas_price": result.gas_price,
-                "input": result.input,
-                "status": result.receipt_status,
-                "logs": self._make_logs(logs),
-            }
+    def _get_split_logs(
+        self,
+        sess: Session,
+        day: Optional[date],
+        start: int,
+        end: int,
+        txhash: Optional[str] = None,
+    ) -> list[Tuple[str, LogDict]]:
+        stmt = (
+            select(
+                LogTopics.txhash,
+                LogTopics.blknum,
+                LogTopics.logpos,
+                LogTopics.address,
+                LogTopics.data,
+                LogTopics.topic0,
+                LogTopics.topic1,
+                LogTopics.topic2,
+                LogTopics.topic3,
+            )
+            .where(*_partition(LogTopics, day, start, end, txhash))
+            .order_by(LogTopics.blknum, LogTopics.logpos)
+        )
+        return [
+            (
+                log_txhash,
+                {
+                    "blknum": blknum,
+                    "logpos": logpos,
+                    "address": address,
+                    "topics": [
+                        "0x" + topic.hex() for topic in topics if topic is not None
+                    ],
+                    "data": data,
+                },
+            )
+            for log_txhash, blknum, logpos, address, data, *topics in sess.execute(stmt)
+        ]
+
+    def _get_logs(
+        self,
+        sess: Session,
+        day: Optional[date],
+        start: int,
+        end: int,
+        txhash: Optional[str] = None,
+    ) -> list[Tuple[str, LogDict]]:
+        if self.topic_columns:
+            return self._get_split_logs(sess, day, start, end, txhash)
+        stmt = (
+            select(Log)
+            .where(*_partition(Log, day, start, end, txhash))
+            .order_by(Log.blknum, Log.logpos)
+        )
+        return self._make_logs(sess.scalars(stmt).all())
+
+    def _make_tx(self, result: Transaction, logs: list[LogDict]) -> TxDict:
+        return {
+            "txhash": result.txhash,
+            "blknum": result.blknum,
+            "from": result.from_address,
+            "to": result.to_address,
+            "value": result.value,
+            "block_timestamp": result.block_timestamp,
+            "gas_used": result.gas,
+            "gas_price": result.gas_price,
+            "input": result.input,
+            "status": result.receipt_status,
+            "logs": logs,
+        }
+
+    def _read_tx(
+        self, sess: Session, txhash: str, blknum: Optional[int], day: Optional[date]
+    ) -> TxDict:
+        blknum, day = self._locate(sess, txhash, blknum, day)
+        stmt_tx = select(Transaction).where(
+            *_partition(Transaction, day, blknum, blknum, txhash)
+        )
+        result = sess.scalars(stmt_tx).one_or_none()
+        if result is None:
+            raise ValueError(f"Transaction {txhash} not found")
+        # The transaction gives the partition of its logs in any case
+        logs = self._get_logs(
+            sess, result._st_day, result.blknum, result.blknum, txhash
+        )
+        return self._make_tx(result, [log for _, log in logs])
+
+    def get_tx_by_hash(
+        self, txhash: str, blknum: Optional[int] = None, day: Optional[date] = None
+    ) -> TxDict:
+        """
+        Reads a transaction and its logs from its partition, on a replica.
+
+        Parameters
+        ----------
+        txhash : str
+            The transaction hash.
+        blknum : Optional[int]
+            The block number if known, spares the `tx_index` lookup.
+        day : Optional[date]
+            The `_st_day` of the transaction if known.
+
+        Returns
+        -------
+        TxDict
+            The transaction.
+
+        """
+        return self.db.run(lambda sess: self._read_tx(sess, txhash, blknum, day))
+
+    def get_txs_by_block(self, blknum: int) -> List[TxDict]:
+        return list(self.iter_txs_by_range(blknum, blknum))
+
+    def _read_range(
+        self, sess: Session, first: int, last: int, day: Optional[date]
+    ) -> List[TxDict]:
+        stmt_txs = (
+            select(Transaction)
+            .where(*_partition(Transaction, day, first, last))
+            .order_by(Transaction.blknum, Transaction.txpos)
+        )
+        txs = sess.scalars(stmt_txs).all()
+        logs: Dict[str, list[LogDict]] = {}
+        for txhash, log in self._get_logs(sess, day, first, last):
+            logs.setdefault(txhash, []).append(log)
+        return [self._make_tx(result, logs.get(result.txhash, [])) for result in txs]
+
+    def iter_txs_by_range(self, start: int, end: int) -> Iterator[TxDict]:
+        """
+        Yields the transactions of blocks [start, end] in block order.
+
+        The range is split by `_st_day` partition, then into shards of at most
+        `shard_size` blocks, read by `workers` concurrent queries spread over
+        the replicas. At most twice that many shards are held in memory.
+        Blocks missing from `block_days` are read without partition pruning.
+        """
+        days = self.db.run(lambda sess: self._days_in_range(sess, start, end))
+        shards = (
+            (first, min(first + self.shard_size - 1, last), day)
+            for lo, last, day in days
+            for first in range(lo, last + 1, self.shard_size)
+        )
+
+        def read(shard: Tuple[int, int, Optional[date]]) -> List[TxDict]:
+            return self.db.run(lambda sess: self._read_range(sess, *shard))
+
+        in_flight: Deque[Future] = deque()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for shard in shards:
+                in_flight.append(executor.submit(read, shard))
+                if len(in_flight) >= 2 * self.workers:
+                    yield from in_flight.popleft().result()
+            while in_flight:
+                yield from in_flight.popleft().result()
+
+
+def _partition(
+    model: Any,
+    day: Optional[date],
+    start: Optional[int] = None,
+    end: Optional[int] = None,
+    txhash: Optional[str] = None,
+) -> list:
+    # `_st_day` comes first, it is the partition key. Unknown days scan every
+    # partition
+    clauses = [] if day is None else [model._st_day == day]
+    if start is not None and start == end:
+        clauses.append(model.blknum == start)
+    elif start is not None:
+        clauses.append(model.blknum.between(start, end))
+    if txhash is not None:
+        clauses.append(model.txhash == txhash)
+    return clauses
+
+
+def _to_hex(value: Union[str, bytes]) -> str:
+    # web3 returns HexBytes, archived JSON payloads already hold hex strings
+    return value if isinstance(value, str) else value.hex()
+
+
+def make_logs(logs: List[LogReceipt]) -> List[LogDict]:
+    return [
+        {
+            "blknum": log["blockNumber"],
+            "logpos": log["logIndex"],
+            "address": log["address"],
+            "topics": [_to_hex(topic) for topic in log["topics"] if topic],
+            "data": log["data"],
+        }
+        for log in logs
+    ]
+
+
+def make_tx(tx: TxData, rtn: TxReceipt, block_timestamp: int) -> TxDict:
+    return {
+        "txhash": _to_hex(rtn["transactionHash"]),
+        "blknum": rtn["blockNumber"],
+        "from": tx["from"],
+        "to": tx["to"],
+        "block_timestamp": block_timestamp,
+        "value": tx["value"],
+        "gas_used": rtn["gasUsed"],
+        "gas_price": tx["gasPrice"],
+        "input": tx["input"] if tx["input"] else "0x",
+        "status": rtn["status"],
+        "logs": make_logs(rtn["logs"]),
+    }
+
+
+# Error fragments nodes use when an eth_getLogs range returns too much data
+_LOG_RANGE_ERRORS = (
+    "more than",
+    "too large",
+    "too wide",
+    "block range",
+    "response size",
+    "limited to a",
+    "exceed maximum",
+    "query timeout",
+)
+
+
+def _is_log_range_error(e: Exception) -> bool:
+    # Infura also answers -32005 when throttling, splitting would only add load
+    if is_rate_limited(e):
+        return False
+    err = e.args[0] if e.args else e
+    if isinstance(err, dict):
+        if err.get("code") == -32005:
+            return True
+        err = err.get("message", "")
+    message = str(err).lower()
+    return any(fragment in message for fragment in _LOG_RANGE_ERRORS)
 
 
 class Web3Provider:
     def __init__(self, w3: Web3) -> None:
         self.w3 = w3
-        self.ns = ENS.fromWeb3(w3)
 
-    def _get_logs(self, logs: List[LogReceipt]) -> List[LogDict]:
-        return [
-            {
-                "logpos": log["logIndex"],
-                "address": log["address"],
-                "topics": [topic.hex() for topic in log["topics"] if topic],
-                "data": log["data"],
-            }
-            for log in logs
+    def get_raw_tx_by_hash(self, txhash: str) -> Tuple[TxData, TxReceipt, BlockData]:
+        tx = self.w3.eth.get_transaction(txhash)
+        rtn: TxReceipt = self.w3.eth.getTransactionReceipt(txhash)
+        block = self.w3.eth.get_block(rtn["blockNumber"])
+        return tx, rtn, block
+
+    def get_raw_block(self, blknum: int) -> Tuple[BlockData, List[TxReceipt]]:
+        block = self.w3.eth.get_block(blknum, full_transactions=True)
+        rtns = [
+            self.w3.eth.get_transaction_receipt(tx["hash"])
+            for tx in block["transactions"]
         ]
+        return block, rtns
 
     def get_tx_by_hash(self, txhash: str) -> TxDict:
-        tx = self.w3.eth.get_transaction(txhash)
-        rtn: TxReceipt = self.w3.eth.getTransactionReceipt(txhash)
-        block_timestamp = self.w3.eth.get_block(rtn["blockNumber"]).timestamp
-        return {
-            "txhash": rtn["transactionHash"].hex(),
-            "from": tx["from"],
-            "to": tx["to"],
-            "block_timestamp": block_timestamp,
-            "value": tx["value"],
-            "gas_used": rtn["gasUsed"],
-            "gas_price": tx["gasPrice"],
-            "input": tx["input"] if tx["input"] else "0x",
-            "status": rtn["status"],
-            "logs": self._get_logs(rtn["logs"]),
+        tx, rtn, block = self.get_raw_tx_by_hash(txhash)
+        return make_tx(tx, rtn, block["timestamp"])
+
+    def get_txs_by_block(self, blknum: int, bloom: BloomFilter = None) -> List[TxDict]:
+        """
+        Fetches the transactions of a block with their receipts.
+
+        Parameters
+        ----------
+        blknum : int
+            The block number.
+        bloom : BloomFilter
+            If given, transactions whose receipt bloom cannot match are dropped.
+
+        Returns
+        -------
+        List[TxDict]
+            The transactions in block order.
+
+        """
+        block: BlockData = self.w3.eth.get_block(blknum, full_transactions=True)
+        txs = []
+        for tx in block["transactions"]:
+            rtn = self.w3.eth.get_transaction_receipt(tx["hash"])
+            if bloom is not None and not bloom.matches(rtn["logsBloom"]):
+                continue
+            txs.append(make_tx(tx, rtn, block["timestamp"]))
+        return txs
+
+    def iter_txs_by_range(
+        self,
+        start: int,
+        end: int,
+        bloom: BloomFilter = None,
+        match_txs: bool = False,
+        batch_size: int = 100,
+        workers: int = 8,
+    ) -> Iterator[TxDict]:
+        """
+        Yields the transactions of blocks [start, end] in block order.
+
+        Headers are fetched first and, when a bloom filter is given, receipts
+        are only fetched for blocks whose `logsBloom` may match it.
+
+        Parameters
+        ----------
+        start : int
+            The first block number.
+        end : int
+            The last block number, inclusive.
+        bloom : BloomFilter
+            The filter built from the registered topics and addresses.
+        match_txs : bool
+            Whether to also drop transactions whose receipt bloom cannot match.
+        batch_size : int
+            The number of headers fetched per batch.
+        workers : int
+            The number of concurrent requests.
+
+        """
+        tx_bloom = bloom if match_txs else None
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for batch_start in range(start, end + 1, batch_size):
+                blknums = range(batch_start, min(batch_start + batch_size, end + 1))
+                headers = list(executor.map(self.w3.eth.get_block, blknums))
+                if bloom is not None:
+                    headers = bloom.filter(headers)
+                blocks = executor.map(
+                    lambda header: self.get_txs_by_block(header["number"], tx_bloom),
+                    headers,
+                )
+                for txs in blocks:
+                    yield from txs
+
+    def _get_logs_by_range(
+        self, start: int, end: int, topics: Sequence[str]
+    ) -> Tuple[List[LogReceipt], int, Optional[int]]:
+        # Also returns the number of blocks per request the node accepted, and
+        # the smallest one it rejected if the range had to be split
+        try:
+            logs = self.w3.eth.get_logs(
+                {"fromBlock": start, "toBlock": end, "topics": [list(topics)]}
+            )
+            return logs, end - start + 1, None
+        except Exception as e:
+            if start == end or not _is_log_range_error(e):
+                raise
+            # The node rejected the range, split it and merge both halves
+            mid = (start + end) // 2
+            head, head_size, head_rejected = self._get_logs_by_range(start, mid, topics)
+            tail, tail_size, tail_rejected = self._get_logs_by_range(
+                mid + 1, end, topics
+            )
+            rejected = min(
+                size
+                for size in (end - start + 1, head_rejected, tail_rejected)
+                if size is not None
+            )
+            return head + tail, min(head_size, tail_size), rejected
+
+    def scan_logs(
+        self,
+        start: int,
+        end: int,
+        topics: Sequence[str],
+        window: int = 2000,
+        workers: int = 8,
+    ) -> Iterator[Tuple[str, List[LogDict]]]:
+        """
+        Scans blocks [start, end] with server-side filtered `eth_getLogs`.
+
+        At most `workers` windows are in flight. A window the node rejects as
+        too large is split in halves, and the next windows are sent at the
+        size it accepted. As log density varies along the chain, the size
+        grows back by a quarter, up to `window`, each time `workers` windows
+        in a row are accepted. It stays below the smallest rejected size until
+        `8 * workers` windows in a row were accepted right below it.
+
+        Parameters
+        ----------
+        start : int
+            The first block number.
+        end : int
+            The last block number, inclusive.
+        topics : Sequence[str]
+            The topic0 set to keep, see `EventLogsDecoder.topics`.
+        window : int
+            The maximum number of blocks per `eth_getLogs` request.
+        workers : int
+            The number of concurrent requests.
+
+        Returns
+        -------
+        Iterator[Tuple[str, List[LogDict]]]
+            (txhash, logs) pairs in block and transaction order.
+
+        """
+        size = window
+        # The smallest window rejected since the last probe, windows only
+        # grow past it after many were accepted right below it
+        limit = window + 1
+        # Windows accepted in a row at the current size
+        streak = 0
+        next_start = start
+        in_flight: Deque[Future] = deque()
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while next_start <= end or in_flight:
+                while next_start <= end and len(in_flight) < workers:
+                    window_end = min(next_start + size - 1, end)
+                    future = executor.submit(
+                        self._get_logs_by_range, next_start, window_end, topics
+                    )
+                    in_flight.append(future)
+                    next_start = window_end + 1
+                logs, accepted, rejected = in_flight.popleft().result()
+                if rejected is not None:
+                    # Later windows start at the size the node accepted
+                    size, limit, streak = min(size, accepted), min(limit, rejected), 0
+                elif accepted >= size:
+                    streak += 1
+                    if size + 1 < limit and streak >= workers:
+                        size, streak = min(limit - 1, size + max(1, size // 4)), 0
+                    elif size < window and streak >= 8 * workers:
+                        # Probe the rejected size again, logs may be sparser now
+                        size, limit, streak = limit, window + 1, 0
+                logs = sorted(
+                    logs, key=lambda log: (log["blockNumber"], log["logIndex"])
+                )
+                txs: Dict[str, List[LogReceipt]] = {}
+                for log in logs:
+                    txs.setdefault(_to_hex(log["transactionHash"]), []).append(log)
+                for txhash, tx_logs in txs.items():
+                    yield txhash, make_logs(tx_logs)
+
+
+def make_raw_logs(logs: List[Dict]) -> List[LogDict]:
+    return [
+        {
+            "blknum": int(log["blockNumber"], 16),
+            "logpos": int(log["logIndex"], 16),
+            "address": log["address"],
+            "topics": log["topics"],
+            "data": log["data"],
         }
+        for log in logs
+    ]
 
 
-def get_provider(p: Literal["web3", "sql"], **kwargs) -> BaseProvider:
+def make_raw_tx(tx: Dict, rtn: Dict, block_timestamp: int) -> TxDict:
+    """
+    Builds a TxDict from raw JSON-RPC results, quantities are hex strings.
+    """
+    return {
+        "txhash": rtn["transactionHash"],
+        "blknum": int(rtn["blockNumber"], 16),
+        "from": tx["from"],
+        "to": tx["to"],
+        "block_timestamp": block_timestamp,
+        "value": int(tx["value"], 16),
+        "gas_used": int(rtn["gasUsed"], 16),
+        "gas_price": int(tx["gasPrice"], 16),
+        "input": tx["input"] or "0x",
+        "status": int(rtn["status"], 16),
+        "logs": make_raw_logs(rtn["logs"]),
+    }
+
+
+class RawRPCProvider(BaseProvider):
+    """
+    Provider reading raw JSON-RPC results through `RawJSONRPC`.
+
+    It returns the same dicts as `Web3Provider` without web3's middlewares
+    and AttributeDict/HexBytes conversion. Addresses are left lowercase, as
+    with `SQLProvider`.
+    """
+
+    def __init__(self, client: RawJSONRPC) -> None:
+        super().__init__()
+        self.client = client
+
+    def get_tx_by_hash(self, txhash: str) -> TxDict:
+        (tx,) = self.get_txs_by_hashes([txhash])
+        if tx is None:
+            raise ValueError(f"Transaction {txhash} not found")
+        return tx
+
+    def get_txs_by_hashes(self, txhashes: Sequence[str]) -> List[Optional[TxDict]]:
+        """
+        Fetches many transactions in two JSON-RPC batches.
+
+        Parameters
+        ----------
+        txhashes : Sequence[str]
+            The transaction hashes.
+
+        Returns
+        -------
+        List[Optional[TxDict]]
+            The transactions in input order, None for unknown or pending ones.
+
+        """
+        results = self.client.batch(
+            [
+                (method, [txhash])
+                for txhash in txhashes
+                for method in ("eth_getTransactionByHash", "eth_getTransactionReceipt")
+            ]
+        )
+        pairs = list(zip(results[::2], results[1::2]))
+        blknums = sorted({rtn["blockNumber"] for tx, rtn in pairs if tx and rtn})
+        blocks = self.client.batch(
+            [("eth_getBlockByNumber", [blknum, False]) for blknum in blknums]
+        )
+        timestamps = {
+            blknum: int(block["timestamp"], 16)
+            for blknum, block in zip(blknums, blocks)
+        }
+        return [
+            make_raw_tx(tx, rtn, timestamps[rtn["blockNumber"]]) if tx and rtn else None
+            for tx, rtn in pairs
+        ]
+
+    def get_txs_by_block(self, blknum: int, bloom: BloomFilter = None) -> List[TxDict]:
+        block = self.client.call("eth_getBlockByNumber", [hex(blknum), True])
+        if bloom is not None and not bloom.matches(block["logsBloom"]):
+            return []
+        txs = block["transactions"]
+        rtns = self.client.batch(
+            [("eth_getTransactionReceipt", [tx["hash"]]) for tx in txs]
+        )
+        timestamp = int(block["timestamp"], 16)
+        return [
+            make_raw_tx(tx, rtn, timestamp)
+            for tx, rtn in zip(txs, rtns)
+            if bloom is None or bloom.matches(rtn["logsBloom"])
+        ]
+
+
+def get_provider(p: Literal["web3", "sql", "archive", "raw"], **kwargs) -> BaseProvider:
     if p == "web3":
         return Web3Provider(**kwargs)
     elif p == "sql":
         return SQLProvider(**kwargs)
+    elif p == "archive":
+        from archive import ArchiveProvider
+
+        return ArchiveProvider(**kwargs)
+    elif p == "raw":
+        return RawRPCProvider(**kwargs)
     else:
         raise ValueError(f"Invalid provider: {p}")
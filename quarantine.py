@@ -0,0 +1,131 @@
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple, Type
+
+from ratelimit import is_rate_limited
+from utils import dump_json_atomic
+
+
+class LookupFailed(ValueError):
+    """
+    A contract read needed to decode a log (decimals, pool tokens, ...)
+    returned nothing.
+
+    `MulticallBatcher` raises transport and rate-limit errors itself, so a
+    failed lookup means the call reverted or the contract does not conform
+    (a spam token, a pool without `token0()`), and counts towards quarantine.
+    """
+
+
+class Quarantine:
+    """
+    Bounded negative cache of (topic0, address) pairs whose logs fail to decode.
+
+    A pair is quarantined for `ttl` seconds once it failed `threshold` times
+    in a row with the same failure class (exception type), so non-standard
+    events and pools are skipped before any ABI decoding or RPC call. A
+    successful decode resets the count. Transient errors (network, timeouts,
+    rate limits) never quarantine a pair.
+    """
+
+    def __init__(
+        self,
+        maxsize: int = 100_000,
+        ttl: float = 24 * 3600,
+        threshold: int = 2,
+        path: str = None,
+        transient: Tuple[Type[Exception], ...] = (OSError,),
+        logger: logging.Logger = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self.path = path
+        self.transient = transient
+        self.logger = logger
+        # (topic0, address) -> (failure class, failures, expires at)
+        self._entries: OrderedDict[Tuple[str, str], Tuple[str, int, float]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+        self.counters: Dict[str, int] = {
+            "hits": 0,
+            "failures": 0,
+            "quarantined": 0,
+            "expired": 0,
+            "evicted": 0,
+        }
+        if path and os.path.exists(path):
+            try:
+                self.load(path)
+            except (OSError, ValueError, TypeError) as e:
+                # Starting with an empty quarantine is always safe
+                if self.logger:
+                    self.logger.warning(f"Ignoring quarantine snapshot {path}: {e}")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def is_quarantined(self, topic0: str, address: str) -> bool:
+        key = (topic0, address.lower())
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[1] < self.threshold:
+                return False
+            if entry[2] < time.time():
+                del self._entries[key]
+                self.counters["expired"] += 1
+                return False
+            self.counters["hits"] += 1
+            return True
+
+    def record_success(self, topic0: str, address: str) -> None:
+        key = (topic0, address.lower())
+        # Lock-free check, almost every decoded pair has no entry
+        if key in self._entries:
+            with self._lock:
+                self._entries.pop(key, None)
+
+    def record_failure(self, topic0: str, address: str, error: Exception) -> None:
+        if isinstance(error, self.transient) or is_rate_limited(error):
+            return
+        key = (topic0, address.lower())
+        failure_class = type(error).__name__
+        with self._lock:
+            self.counters["failures"] += 1
+            entry = self._entries.pop(key, None)
+            failures = 1
+            if entry is not None and entry[0] == failure_class:
+                failures = entry[1] + 1
+            if failures == self.threshold:
+                self.counters["quarantined"] += 1
+            self._entries[key] = (failure_class, failures, time.time() + self.ttl)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.counters["evicted"] += 1
+
+    def save(self, path: Optional[str] = None) -> None:
+        path = path or self.path
+        now = time.time()
+        with self._lock:
+            entries = [
+                [*key, *entry] for key, entry in self._entries.items() if entry[2] > now
+            ]
+        dump_json_atomic(entries, path)
+
+    def load(self, path: str) -> None:
+        now = time.time()
+        with open(path, "r") as f:
+            entries = json.load(f)
+        with self._lock:
+            for topic0, address, failure_class, failures, expires_at in entries:
+                if expires_at > now:
+                    self._entries[(topic0, address)] = (
+                        failure_class,
+                        failures,
+                        expires_at,
+                    )
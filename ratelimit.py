@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence
+
+# Priority classes, lower values are served first
+INTERACTIVE = 0
+BACKFILL = 1
+
+# Per-method cost in compute units, in the style of hosted RPC plans
+METHOD_COSTS: Dict[str, float] = {
+    "eth_chainId": 0,
+    "net_version": 0,
+    "eth_blockNumber": 10,
+    "eth_getBalance": 19,
+    "eth_getCode": 26,
+    "eth_getStorageAt": 17,
+    "eth_call": 26,
+    "eth_getTransactionByHash": 17,
+    "eth_getTransactionReceipt": 15,
+    "eth_getBlockByHash": 16,
+    "eth_getBlockByNumber": 16,
+    "eth_getBlockReceipts": 500,
+    "eth_getLogs": 75,
+}
+DEFAULT_COST = 20
+
+
+def is_rate_limited(e: Exception) -> bool:
+    """
+    Tells whether an RPC error is a rate-limit rejection (HTTP 429 or the
+    JSON-RPC errors some providers answer with).
+
+    -32005 alone is not enough, nodes also use it for oversized eth_getLogs.
+    """
+    response = getattr(e, "response", None)
+    if getattr(response, "status_code", None) == 429:
+        return True
+    err = e.args[0] if e.args else None
+    if isinstance(err, dict):
+        if err.get("code") == 429:
+            return True
+        err = err.get("message", "")
+    message = str(err).lower()
+    return "rate limit" in message or "too many requests" in message
+
+
+def retry_after(e: Exception) -> Optional[float]:
+    response = getattr(e, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return float(headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """
+    Token bucket shared by all outbound RPC traffic.
+
+    Requests are charged by method cost against a bucket refilled at `rate`
+    units per second, up to `burst` units. Waiting requests of a higher
+    priority class go first, so interactive lookups are not stuck behind a
+    backfill. A rate-limit response pauses the bucket with exponential
+    backoff, or for the server's Retry-After when given. Time is read from
+    `clock`, in seconds.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float = None,
+        costs: Dict[str, float] = None,
+        default_cost: float = DEFAULT_COST,
+        max_backoff: float = 30.0,
+        logger: logging.Logger = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst or rate
+        self.costs = {**METHOD_COSTS, **(costs or {})}
+        self.default_cost = default_cost
+        self.max_backoff = max_backoff
+        self.logger = logger
+        self.clock = clock
+        self.tokens = self.burst
+        self.rate_limited = 0
+        self._updated = clock()
+        self._paused_until = 0.0
+        self._backoff = 0.0
+        self._waiting: List[int] = [0, 0]
+        self._cond = threading.Condition()
+
+    def cost(self, methods: Sequence[str]) -> float:
+        if not methods:
+            return self.default_cost
+        return sum(self.costs.get(method, self.default_cost) for method in methods)
+
+    def _refill(self, now: float) -> None:
+        elapsed = max(0.0, now - self._updated)
+        self.tokens = min(self.burst, self.tokens + elapsed * self.rate)
+        self._updated = max(now, self._updated)
+
+    def acquire(self, methods: Sequence[str], priority: int = INTERACTIVE) -> None:
+        """
+        Blocks until the bucket can pay for `methods`.
+
+        Parameters
+        ----------
+        methods : Sequence[str]
+            The JSON-RPC methods of the request, several for a batch.
+        priority : int
+            INTERACTIVE or BACKFILL.
+
+        """
+        # A request larger than the bucket would never fit, it drains it instead
+        cost = min(self.cost(methods), self.burst)
+        with self._cond:
+            self._waiting[priority] += 1
+            try:
+                while True:
+                    now = self.clock()
+                    self._refill(now)
+                    if now < self._paused_until:
+                        timeout = self._paused_until - now
+                    elif any(self._waiting[:priority]):
+                        timeout = None
+                    elif self.tokens >= cost:
+                        self.tokens -= cost
+                        return
+                    else:
+                        timeout = (cost - self.tokens) / self.rate
+                    self._cond.wait(timeout)
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+    def on_success(self) -> None:
+        self._backoff = 0.0
+
+    def on_rate_limited(self, delay: Optional[float] = None) -> None:
+        with self._cond:
+            self.rate_limited += 1
+            if delay is None:
+                self._backoff = min(self.max_backoff, max(0.5, self._backoff * 2))
+                delay = self._backoff
+            self._paused_until = max(self._paused_until, self.clock() + delay)
+            # The bucket restarts empty once the pause is over
+            self.tokens = 0.0
+            self._updated = self._paused_until
+            self._cond.notify_all()
+        if self.logger:
+            self.logger.warning(f"RPC rate limited, pausing for {delay:.1f}s")
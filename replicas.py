@@ -0,0 +1,129 @@
+import logging
+import threading
+import time
+from typing import Callable, List, Sequence, TypeVar
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import Session, sessionmaker
+
+T = TypeVar("T")
+
+
+class Replica:
+    def __init__(self, engine: Engine, alpha: float = 0.2) -> None:
+        self.engine = engine
+        self.Session = sessionmaker(bind=engine)
+        self.alpha = alpha
+        self.latency = 0.0
+        self.in_flight = 0
+        self.failures = 0
+        self.retry_at = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return str(self.engine.url.host)
+
+    def is_healthy(self) -> bool:
+        return self.failures == 0 or time.monotonic() >= self.retry_at
+
+    def load(self) -> float:
+        return (self.in_flight + 1) * (self.latency or 1e-3)
+
+    def acquire(self) -> None:
+        with self._lock:
+            self.in_flight += 1
+
+    def release(self) -> None:
+        with self._lock:
+            self.in_flight -= 1
+
+    def record_success(self, elapsed: float) -> None:
+        with self._lock:
+            if self.latency:
+                self.latency += self.alpha * (elapsed - self.latency)
+            else:
+                self.latency = elapsed
+            self.failures = 0
+            self.retry_at = 0.0
+
+    def record_failure(self, cooldown: float) -> None:
+        with self._lock:
+            self.failures += 1
+            self.retry_at = time.monotonic() + cooldown * 2 ** (self.failures - 1)
+
+    def check(self) -> bool:
+        try:
+            with self.engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+            return True
+        except OperationalError:
+            return False
+
+
+class ReplicaSet:
+    """
+    Routes read-only queries over the read replicas of a database.
+
+    Queries go to the healthy replica with the least load, weighted by its
+    EWMA latency, and fail over to the next one on connection errors. A
+    failed replica is skipped for an exponentially growing cooldown, then
+    probed with `SELECT 1` before taking queries again. The primary only
+    serves reads once no replica is left.
+    """
+
+    def __init__(
+        self,
+        primary: Engine,
+        replicas: Sequence[Engine] = (),
+        cooldown: float = 5,
+        logger: logging.Logger = None,
+    ) -> None:
+        self.primary = Replica(primary)
+        self.replicas = [Replica(engine) for engine in replicas]
+        self.cooldown = cooldown
+        self.logger = logger
+
+    def _ranked(self) -> List[Replica]:
+        healthy = [replica for replica in self.replicas if replica.is_healthy()]
+        return sorted(healthy, key=Replica.load) + [self.primary]
+
+    def run(self, fn: Callable[[Session], T]) -> T:
+        """
+        Runs `fn` in a session of the best available replica.
+
+        Parameters
+        ----------
+        fn : Callable[[Session], T]
+            The read-only queries, run again on the next replica if the
+            connection fails.
+
+        Returns
+        -------
+        T
+            The result of `fn`.
+
+        """
+        error = None
+        for replica in self._ranked():
+            if replica.failures and not replica.check():
+                replica.record_failure(self.cooldown)
+                continue
+            replica.acquire()
+            start = time.monotonic()
+            try:
+                with replica.Session() as sess:
+                    result = fn(sess)
+            except OperationalError as e:
+                error = e
+                replica.record_failure(self.cooldown)
+                if self.logger:
+                    self.logger.warning(f"DB replica {replica.name} failed: {e}")
+                continue
+            finally:
+                replica.release()
+            replica.record_success(time.monotonic() - start)
+            return result
+        raise error or OperationalError("No database replica available", None, None)
@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from ens import ENS
+from multicall import Call
+
+from batcher import MulticallBatcher
+
+ENS_REGISTRY = "0x00000000000C2E074eC69A0dFb2997BA6C7d2e1e"
+RESOLVER_FUNC = "resolver(bytes32)(address)"
+NAME_FUNC = "name(bytes32)(string)"
+ADDR_FUNC = "addr(bytes32)(address)"
+
+
+def _is_zero_address(addr: Optional[str]) -> bool:
+    return not addr or int(addr, 16) == 0
+
+
+class ReverseResolver:
+    """
+    Batched ENS reverse resolution with a TTL cache.
+
+    A batch of addresses is resolved in a fixed number of Multicall round
+    trips whatever its size: reverse node resolvers, names, then the
+    forward check (name resolver and `addr`), so a name is only returned if
+    it resolves back to the address. Confirmed missing names are cached
+    too, but not addresses whose lookups failed.
+    """
+
+    def __init__(
+        self, mc: MulticallBatcher, ttl: float = 3600, maxsize: int = 100_000
+    ) -> None:
+        self.mc = mc
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # address -> (name, expires at)
+        self._names: OrderedDict[str, Tuple[Optional[str], float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _resolvers(self, nodes: List[bytes]) -> List[Optional[str]]:
+        calls = [
+            Call(target=ENS_REGISTRY, function=RESOLVER_FUNC, args=[node])
+            for node in nodes
+        ]
+        return self.mc.fetch(calls)
+
+    def _resolve(self, addrs: List[str]) -> Tuple[Dict[str, Optional[str]], Set[str]]:
+        # Also returns the addresses with a failed lookup, None is not an answer
+        names: Dict[str, Optional[str]] = {addr: None for addr in addrs}
+        failed: Set[str] = set()
+
+        nodes = [ENS.namehash(ENS.reverse_domain(addr)) for addr in addrs]
+        resolvers = self._resolvers(nodes)
+        failed.update(addr for addr, r in zip(addrs, resolvers) if r is None)
+        pending = [
+            (addr, node, resolver)
+            for addr, node, resolver in zip(addrs, nodes, resolvers)
+            if not _is_zero_address(resolver)
+        ]
+        calls = [
+            Call(target=resolver, function=NAME_FUNC, args=[node])
+            for _, node, resolver in pending
+        ]
+        claimed: List[Tuple[str, str, bytes]] = []
+        for (addr, _, _), name in zip(pending, self.mc.fetch(calls)):
+            if name is None:
+                failed.add(addr)
+            if not name:
+                continue
+            try:
+                claimed.append((addr, name, ENS.namehash(name)))
+            except Exception:
+                # Names which do not normalize can never resolve forward
+                continue
+
+        # Forward check, the reverse record is set by the address owner alone
+        resolvers = self._resolvers([node for _, _, node in claimed])
+        failed.update(addr for (addr, _, _), r in zip(claimed, resolvers) if r is None)
+        checks = [
+            (addr, name, node, resolver)
+            for (addr, name, node), resolver in zip(claimed, resolvers)
+            if not _is_zero_address(resolver)
+        ]
+        calls = [
+            Call(target=resolver, function=ADDR_FUNC, args=[node])
+            for _, _, node, resolver in checks
+        ]
+        for (addr, name, _, _), forward in zip(checks, self.mc.fetch(calls)):
+            if forward is None:
+                failed.add(addr)
+            elif forward.lower() == addr:
+                names[addr] = name
+        return names, failed
+
+    def names(self, addresses: Iterable[str]) -> Dict[str, Optional[str]]:
+        """
+        Resolves the primary ENS names of many addresses.
+
+        Parameters
+        ----------
+        addresses : Iterable[str]
+            The addresses, in any case.
+
+        Returns
+        -------
+        Dict[str, Optional[str]]
+            The verified name of each lowercased address, None if it has none.
+
+        """
+        now = time.time()
+        results: Dict[str, Optional[str]] = {}
+        missing = []
+        with self._lock:
+            for addr in {addr.lower() for addr in addresses}:
+                entry = self._names.get(addr)
+                if entry is not None and entry[1] > now:
+                    self._names.move_to_end(addr)
+                    results[addr] = entry[0]
+                else:
+                    missing.append(addr)
+        if missing:
+            resolved, failed = self._resolve(missing)
+            with self._lock:
+                for addr, name in resolved.items():
+                    if addr in failed:
+                        # Retried on the next call rather than hidden for the TTL
+                        continue
+                    self._names[addr] = (name, now + self.ttl)
+                    self._names.move_to_end(addr)
+                while len(self._names) > self.maxsize:
+                    self._names.popitem(last=False)
+            results.update(resolved)
+        return results
+
+    def name(self, address: str) -> Optional[str]:
+        return self.names([address])[address.lower()]
@@ -0,0 +1,355 @@
+import json
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Deque, List, Sequence, Tuple, TypeVar
+
+import requests
+from multicall import Call, Multicall
+from web3 import HTTPProvider
+from web3.providers import JSONBaseProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+from ratelimit import INTERACTIVE, RateLimiter, is_rate_limited, retry_after
+
+try:
+    import orjson
+
+    _dumps = orjson.dumps
+    _loads = orjson.loads
+except ImportError:
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, separators=(",", ":")).encode()
+
+    _loads = json.loads
+
+T = TypeVar("T")
+
+
+def _raise_if_rate_limited(resp: Any) -> Any:
+    # Rate-limit errors in a JSON-RPC body must fail over like HTTP 429s
+    if isinstance(resp, dict) and "error" in resp:
+        error = ValueError(resp["error"])
+        if is_rate_limited(error):
+            raise error
+    return resp
+
+
+# Read-only methods which are safe to send to several endpoints at once
+HEDGED_METHODS = {
+    "eth_call",
+    "eth_getBlockByNumber",
+    "eth_getTransactionByHash",
+    "eth_getTransactionReceipt",
+}
+
+
+class Endpoint:
+    def __init__(self, url: str, timeout: float = 10, alpha: float = 0.2) -> None:
+        self.url = url
+        self.timeout = timeout
+        self.alpha = alpha
+        # Passing the session registers it in web3's per-URL session cache, so
+        # every web3 based client of this URL reuses the keep-alive connections
+        self.session = requests.Session()
+        self.provider = HTTPProvider(
+            url, request_kwargs={"timeout": timeout}, session=self.session
+        )
+        self.latency = 0.0
+        self.error_rate = 0.0
+        self.failures = 0
+        self.retry_at = 0.0
+        self.samples: Deque[float] = deque(maxlen=200)
+        self._multicall = None
+        self._lock = threading.Lock()
+
+    @property
+    def multicall(self) -> Multicall:
+        if self._multicall is None:
+            self._multicall = Multicall(self.url)
+        return self._multicall
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return self.provider.make_request(method, params)
+
+    def is_healthy(self) -> bool:
+        return time.monotonic() >= self.retry_at
+
+    def score(self, error_penalty: float) -> float:
+        return self.latency * (1 + error_penalty * self.error_rate)
+
+    def percentile(self, q: float) -> float | None:
+        samples = sorted(self.samples)
+        if len(samples) < 20:
+            return None
+        return samples[min(int(len(samples) * q), len(samples) - 1)]
+
+    def record_success(self, elapsed: float) -> None:
+        with self._lock:
+            self.samples.append(elapsed)
+            if self.latency:
+                self.latency += self.alpha * (elapsed - self.latency)
+            else:
+                self.latency = elapsed
+            self.error_rate *= 1 - self.alpha
+            self.failures = 0
+            self.retry_at = 0.0
+
+    def record_failure(self, cooldown: float) -> None:
+        with self._lock:
+            self.error_rate += self.alpha * (1 - self.error_rate)
+            self.failures += 1
+            if self.failures >= 3:
+                backoff = cooldown * 2 ** (self.failures - 3)
+                self.retry_at = time.monotonic() + backoff
+
+
+class RPCPool:
+    """
+    Routes JSON-RPC traffic over several endpoints.
+
+    Endpoints are ranked by their EWMA latency weighted by their error rate.
+    A failing endpoint is skipped for an exponentially growing cooldown and
+    the request fails over to the next one. Hedged requests are duplicated to
+    the runner-up endpoint once the primary exceeds its latency percentile.
+    With a `RateLimiter`, every attempt (hedges and failovers included) is
+    charged to it before being sent.
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        timeout: float = 10,
+        alpha: float = 0.2,
+        error_penalty: float = 10,
+        hedge_percentile: float = 0.95,
+        cooldown: float = 5,
+        max_workers: int = 16,
+        limiter: RateLimiter = None,
+        logger: logging.Logger = None,
+    ) -> None:
+        if not urls:
+            raise ValueError("RPCPool requires at least one endpoint")
+        self.endpoints = [Endpoint(url, timeout, alpha) for url in urls]
+        self.error_penalty = error_penalty
+        self.hedge_percentile = hedge_percentile
+        self.cooldown = cooldown
+        self.limiter = limiter
+        self.logger = logger
+        self._executor = ThreadPoolExecutor(max_workers=max_workers)
+
+    def _ranked(self) -> List[Endpoint]:
+        endpoints = sorted(
+            self.endpoints, key=lambda ep: ep.score(self.error_penalty)
+        )
+        healthy = [ep for ep in endpoints if ep.is_healthy()]
+        # Endpoints in cooldown are only used once every healthy one failed
+        return healthy + [ep for ep in endpoints if not ep.is_healthy()]
+
+    def _run(
+        self,
+        ep: Endpoint,
+        fn: Callable[[Endpoint], T],
+        methods: Sequence[str],
+        priority: int,
+    ) -> T:
+        if self.limiter:
+            self.limiter.acquire(methods, priority)
+        start = time.monotonic()
+        try:
+            result = fn(ep)
+        except Exception as e:
+            if self.limiter and is_rate_limited(e):
+                self.limiter.on_rate_limited(retry_after(e))
+            ep.record_failure(self.cooldown)
+            if self.logger:
+                self.logger.warning(f"RPC endpoint {ep.url} failed: {e}")
+            raise
+        ep.record_success(time.monotonic() - start)
+        if self.limiter:
+            self.limiter.on_success()
+        return result
+
+    def execute(
+        self,
+        fn: Callable[[Endpoint], T],
+        hedge: bool = False,
+        methods: Sequence[str] = (),
+        priority: int = INTERACTIVE,
+    ) -> T:
+        """
+        Runs `fn` against the best endpoint, failing over on errors.
+
+        Parameters
+        ----------
+        fn : Callable[[Endpoint], T]
+            The request to perform on the chosen endpoint.
+        hedge : bool
+            Whether to duplicate the request once to the runner-up endpoint
+            when the best one is slower than its latency percentile.
+        methods : Sequence[str]
+            The JSON-RPC methods `fn` sends, charged to the rate limiter.
+        priority : int
+            The rate limiter priority class, INTERACTIVE or BACKFILL.
+
+        Returns
+        -------
+        T
+            The result of the first successful attempt.
+
+        """
+        candidates = iter(self._ranked())
+        ep = next(candidates)
+        delay = ep.percentile(self.hedge_percentile) if hedge else None
+        pending = {self._executor.submit(self._run, ep, fn, methods, priority)}
+        error = None
+        while pending:
+            done, pending = wait(
+                pending, timeout=delay, return_when=FIRST_COMPLETED
+            )
+            for future in done:
+                try:
+                    # Slower duplicates keep running, their results are dropped
+                    return future.result()
+                except Exception as e:
+                    error = e
+            if done and pending:
+                # The hedge still running already stands in for the failure
+                continue
+            # Hedge once, later attempts only replace failed ones
+            delay = None
+            ep = next(candidates, None)
+            if ep is not None:
+                pending.add(
+                    self._executor.submit(self._run, ep, fn, methods, priority)
+                )
+        raise error
+
+    def make_request(
+        self,
+        method: RPCEndpoint,
+        params: Any,
+        hedge: bool = None,
+        priority: int = INTERACTIVE,
+    ) -> RPCResponse:
+        if hedge is None:
+            hedge = method in HEDGED_METHODS
+        return self.execute(
+            lambda ep: _raise_if_rate_limited(ep.make_request(method, params)),
+            hedge,
+            (method,),
+            priority,
+        )
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    def __init__(self, pool: RPCPool, priority: int = INTERACTIVE) -> None:
+        super().__init__()
+        self.pool = pool
+        self.priority = priority
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        return self.pool.make_request(method, params, priority=self.priority)
+
+    def isConnected(self) -> bool:
+        try:
+            return "result" in self.make_request("web3_clientVersion", [])
+        except Exception:
+            return False
+
+
+class PooledMulticall:
+    """
+    Multicall facade which sends every aggregate through an `RPCPool`.
+    """
+
+    def __init__(
+        self, pool: RPCPool, hedge: bool = True, priority: int = INTERACTIVE
+    ) -> None:
+        self.pool = pool
+        self.hedge = hedge
+        self.priority = priority
+
+    def agg(self, calls: List[Call], **kwargs) -> List[dict]:
+        return self.pool.execute(
+            lambda ep: ep.multicall.agg(calls, **kwargs),
+            self.hedge,
+            ("eth_call",),
+            self.priority,
+        )
+
+
+class RawJSONRPC:
+    """
+    JSON-RPC client which posts straight over the pool's keep-alive sessions.
+
+    It skips web3's middlewares and result formatters, results are the raw
+    JSON values with quantities and data left as hex strings. orjson is used
+    for (de)serialization when installed.
+    """
+
+    def __init__(self, pool: RPCPool, priority: int = INTERACTIVE) -> None:
+        self.pool = pool
+        self.priority = priority
+        self._headers = {"Content-Type": "application/json"}
+
+    def _post(self, ep: Endpoint, payload: bytes) -> Any:
+        resp = ep.session.post(
+            ep.url, data=payload, headers=self._headers, timeout=ep.timeout
+        )
+        resp.raise_for_status()
+        return _raise_if_rate_limited(_loads(resp.content))
+
+    def call(self, method: str, params: Any, hedge: bool = None) -> Any:
+        if hedge is None:
+            hedge = method in HEDGED_METHODS
+        payload = _dumps(
+            {"jsonrpc": "2.0", "id": 0, "method": method, "params": params}
+        )
+        resp = self.pool.execute(
+            lambda ep: self._post(ep, payload), hedge, (method,), self.priority
+        )
+        if "error" in resp:
+            raise ValueError(resp["error"])
+        return resp["result"]
+
+    def batch(self, requests: Sequence[Tuple[str, Any]]) -> List[Any]:
+        """
+        Sends several calls in one JSON-RPC batch.
+
+        Parameters
+        ----------
+        requests : Sequence[Tuple[str, Any]]
+            The (method, params) pairs.
+
+        Returns
+        -------
+        List[Any]
+            The results in request order.
+
+        """
+        if not requests:
+            return []
+        payload = _dumps(
+            [
+                {"jsonrpc": "2.0", "id": idx, "method": method, "params": params}
+                for idx, (method, params) in enumerate(requests)
+            ]
+        )
+        methods = [method for method, _ in requests]
+        hedge = all(method in HEDGED_METHODS for method in methods)
+        resps = self.pool.execute(
+            lambda ep: self._post(ep, payload), hedge, methods, self.priority
+        )
+        if isinstance(resps, dict):
+            # Some nodes answer a whole batch with a single error object
+            raise ValueError(resps.get("error", resps))
+        results: List[Any] = [None] * len(requests)
+        for resp in resps:
+            if "error" in resp:
+                raise ValueError(resp["error"])
+            results[resp["id"]] = resp["result"]
+        return results
@@ -0,0 +1,242 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Any, Callable, Dict, Optional
+
+from web3 import Web3
+from web3.types import RPCEndpoint, RPCResponse
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    atime REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS responses_atime ON responses (atime);
+"""
+
+# Methods whose response is pinned by the block they return
+RESULT_BLOCK_METHODS = {
+    "eth_getTransactionByHash": "blockNumber",
+    "eth_getTransactionReceipt": "blockNumber",
+    "eth_getBlockByHash": "number",
+}
+
+# Methods whose response is pinned by a block parameter, mapped to its position
+PARAM_BLOCK_METHODS = {
+    "eth_getBlockByNumber": 0,
+    "eth_call": 1,
+    "eth_getCode": 1,
+    "eth_getBalance": 1,
+    "eth_getStorageAt": 2,
+}
+
+# Methods whose response never changes on a given chain
+STATIC_METHODS = {"eth_chainId", "net_version"}
+
+
+class DiskLRU:
+    """
+    Size-bounded LRU of bytes values stored in a SQLite file.
+
+    Hits only read: their access times are kept in memory and written back
+    `touch_batch` at a time, or before an eviction needs them. The database
+    runs in WAL mode with `synchronous=NORMAL`, so commits do not fsync.
+    """
+
+    def __init__(
+        self, path: str, max_bytes: int = 512 * 1024 * 1024, touch_batch: int = 256
+    ) -> None:
+        self.max_bytes = max_bytes
+        self.touch_batch = touch_batch
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        # key -> access time not written yet
+        self._touched: Dict[str, float] = {}
+        (total,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        self.size = total
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._touched[key] = time.time()
+            if len(self._touched) >= self.touch_batch:
+                with self._conn:
+                    self._write_touched()
+            return row[0]
+
+    def _write_touched(self) -> None:
+        self._conn.executemany(
+            "UPDATE responses SET atime = ? WHERE key = ?",
+            [(atime, key) for key, atime in self._touched.items()],
+        )
+        self._touched.clear()
+
+    def set(self, key: str, value: bytes) -> None:
+        with self._lock, self._conn:
+            row = self._conn.execute(
+                "SELECT size FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None:
+                self.size -= row[0]
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, atime) "
+                "VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time()),
+            )
+            self.size += len(value)
+            self._touched.pop(key, None)
+            if self.size > self.max_bytes and self._touched:
+                # Evict by the actual access times
+                self._write_touched()
+            while self.size > self.max_bytes:
+                oldest = self._conn.execute(
+                    "SELECT key, size FROM responses ORDER BY atime LIMIT 64"
+                ).fetchall()
+                if not oldest:
+                    break
+                for old_key, old_size in oldest:
+                    self._conn.execute(
+                        "DELETE FROM responses WHERE key = ?", (old_key,)
+                    )
+                    self.size -= old_size
+                    if self.size <= self.max_bytes:
+                        break
+
+    def close(self) -> None:
+        with self._lock:
+            if self._touched:
+                with self._conn:
+                    self._write_touched()
+            self._conn.close()
+
+
+class ResponseCache:
+    """
+    Web3 middleware caching JSON-RPC responses of finalized blocks on disk.
+
+    Transactions, receipts, headers and pinned `eth_call`s below the finalized
+    head never change, so they are served from a `DiskLRU` keyed by method and
+    params. Responses of pending or non-final blocks, block tags such as
+    "latest" and errors bypass the cache. Inject it at the innermost layer so
+    the raw JSON responses are cached, before web3 formats them:
+
+        w3.middleware_onion.inject(ResponseCache("rpc_cache.sqlite"), layer=0)
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 512 * 1024 * 1024,
+        finality_depth: int = 64,
+        head_ttl: float = 12.0,
+    ) -> None:
+        self.store = DiskLRU(path, max_bytes)
+        self.finality_depth = finality_depth
+        self.head_ttl = head_ttl
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+        self._finalized = -1
+        self._finalized_at = 0.0
+        self._finalized_tag = True
+        self._lock = threading.Lock()
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_ratio": self.hit_ratio,
+            "size": self.store.size,
+        }
+
+    def _finalized_block(self, make_request: Callable) -> int:
+        with self._lock:
+            if time.monotonic() - self._finalized_at < self.head_ttl:
+                return self._finalized
+            block = None
+            if self._finalized_tag:
+                resp = make_request(
+                    RPCEndpoint("eth_getBlockByNumber"), ["finalized", False]
+                )
+                if resp.get("result"):
+                    block = int(resp["result"]["number"], 16)
+                else:
+                    # Pre-merge nodes do not know the "finalized" tag
+                    self._finalized_tag = False
+            if block is None:
+                resp = make_request(RPCEndpoint("eth_blockNumber"), [])
+                block = int(resp["result"], 16) - self.finality_depth
+            self._finalized = block
+            self._finalized_at = time.monotonic()
+            return block
+
+    @staticmethod
+    def _param_block(method: str, params: Any) -> Optional[int]:
+        pos = PARAM_BLOCK_METHODS[method]
+        if len(params) <= pos:
+            return None
+        block = params[pos]
+        if isinstance(block, int):
+            return block
+        if isinstance(block, str) and block.startswith("0x"):
+            return int(block, 16)
+        # "latest", "pending", ... or a block hash object
+        return None
+
+    def __call__(
+        self, make_request: Callable[[RPCEndpoint, Any], RPCResponse], w3: Web3
+    ) -> Callable[[RPCEndpoint, Any], RPCResponse]:
+        def middleware(method: RPCEndpoint, params: Any) -> RPCResponse:
+            if method in PARAM_BLOCK_METHODS:
+                if self._param_block(method, params) is None:
+                    self.bypassed += 1
+                    return make_request(method, params)
+            elif method not in RESULT_BLOCK_METHODS and method not in STATIC_METHODS:
+                return make_request(method, params)
+
+            key = json.dumps([method, params], sort_keys=True, separators=(",", ":"))
+            value = self.store.get(key)
+            if value is not None:
+                self.hits += 1
+                return json.loads(zlib.decompress(value))
+            self.misses += 1
+
+            resp = make_request(method, params)
+            result = resp.get("result")
+            if "error" in resp or result is None:
+                return resp
+            if method in PARAM_BLOCK_METHODS:
+                block = self._param_block(method, params)
+            elif method in RESULT_BLOCK_METHODS:
+                block = result.get(RESULT_BLOCK_METHODS[method])
+                if block is None:
+                    # Pending transaction
+                    return resp
+                block = int(block, 16)
+            else:
+                block = -1
+            if block <= self._finalized_block(make_request):
+                payload = json.dumps(resp, separators=(",", ":"))
+                self.store.set(key, zlib.compress(payload.encode(), 6))
+            return resp
+
+        return middleware
@@ -0,0 +1,281 @@
+import asyncio
+import re
+import time
+from collections import deque
+from concurrent.futures import Executor, ThreadPoolExecutor
+from os import getenv
+from typing import Any, Callable, Deque, Dict, Generic, List, Optional, Tuple, TypeVar
+
+from aiohttp import web
+
+from batcher import MulticallBatcher
+from calldata import CalldataDecoder
+from main import build_call_cache, build_evt_decoder, build_rpc_pool, logger
+from pipeline import BatchDecoder
+from prefetch import prefetch_hot
+from provider import RawRPCProvider, get_provider
+from resolver import ReverseResolver
+from rpc import PooledMulticall, RawJSONRPC
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+TXHASH_RE = re.compile(r"0x[0-9a-fA-F]{64}")
+
+
+class MicroBatcher(Generic[T, R]):
+    """
+    Coalesces concurrent submissions into one call of `fn` per time window.
+
+    The first queued item opens a `window` seconds window and the batch is
+    flushed when it closes, or as soon as `max_batch` items are queued. `fn`
+    runs in `executor` and returns one result per item, an Exception instance
+    fails its item alone. When `fn` raises, the items of the batch are retried
+    one by one so that only the offending ones fail.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[T]], List[R]],
+        executor: Executor,
+        window: float = 0.005,
+        max_batch: int = 64,
+    ) -> None:
+        self.fn = fn
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.items = 0
+        self._queue: List[Tuple[T, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def submit(self, item: T) -> R:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._queue.append((item, future))
+        if len(self._queue) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        queue, self._queue = self._queue, []
+        if queue:
+            self.batches += 1
+            self.items += len(queue)
+            asyncio.ensure_future(self._run(queue))
+
+    def _run_one(self, item: T) -> R:
+        (result,) = self.fn([item])
+        return result
+
+    async def _run(self, queue: List[Tuple[T, asyncio.Future]]) -> None:
+        loop = asyncio.get_running_loop()
+        items = [item for item, _ in queue]
+        try:
+            results = await loop.run_in_executor(self.executor, self.fn, items)
+        except Exception as e:
+            if len(items) == 1:
+                results = [e]
+            else:
+                results = await asyncio.gather(
+                    *(
+                        loop.run_in_executor(self.executor, self._run_one, item)
+                        for item in items
+                    ),
+                    return_exceptions=True,
+                )
+        for (_, future), result in zip(queue, results):
+            if future.done():
+                # The client went away
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "items": self.items,
+            "mean_batch": self.items / self.batches if self.batches else 0.0,
+        }
+
+
+class LatencyStats:
+    """
+    Sliding window of request latencies per route.
+    """
+
+    def __init__(self, size: int = 10_000) -> None:
+        self.size = size
+        self._samples: Dict[str, Deque[float]] = {}
+
+    def record(self, route: str, elapsed: float) -> None:
+        if route not in self._samples:
+            self._samples[route] = deque(maxlen=self.size)
+        self._samples[route].append(elapsed)
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        snapshot = {}
+        for route, samples in self._samples.items():
+            ordered = sorted(samples)
+            last = len(ordered) - 1
+            snapshot[route] = {
+                "count": len(ordered),
+                "p50_ms": ordered[int(last * 0.5)] * 1000,
+                "p99_ms": ordered[int(last * 0.99)] * 1000,
+            }
+        return snapshot
+
+
+def _is_txhash(value: Any) -> bool:
+    return isinstance(value, str) and TXHASH_RE.fullmatch(value) is not None
+
+
+def _is_log(value: Any) -> bool:
+    return (
+        isinstance(value, dict)
+        and isinstance(value.get("address"), str)
+        and isinstance(value.get("topics"), list)
+        and all(isinstance(topic, str) for topic in value["topics"])
+        and isinstance(value.get("data", ""), str)
+    )
+
+
+async def _read_body(request: web.Request) -> Dict[str, Any]:
+    try:
+        body = await request.json()
+    except ValueError:
+        raise web.HTTPBadRequest(text="Expected a JSON body")
+    if not isinstance(body, dict):
+        raise web.HTTPBadRequest(text="Expected a JSON object")
+    return body
+
+
+class DecoderService:
+    """
+    Long-lived HTTP decoder keeping the decoders and their caches warm.
+
+    Concurrent requests arriving within the batching window are decoded as
+    one `BatchDecoder` batch. Bodies are validated before being queued, a
+    malformed one gets a 400 and never reaches a batch.
+
+    Routes:
+        POST /tx      {"txhash": ...} or {"txhashes": [...]}
+        POST /logs    {"logs": [...]}
+        GET  /metrics latency percentiles and batching statistics
+    """
+
+    def __init__(
+        self,
+        decoder: BatchDecoder,
+        window: float = 0.005,
+        max_batch: int = 64,
+        workers: int = 8,
+    ) -> None:
+        self.decoder = decoder
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.txs = MicroBatcher(decoder.decode_txs, self.executor, window, max_batch)
+        self.logs = MicroBatcher(decoder.decode_logs, self.executor, window, max_batch)
+        self.latency = LatencyStats()
+
+    @web.middleware
+    async def _timing(self, request: web.Request, handler: Callable) -> Any:
+        start = time.perf_counter()
+        try:
+            return await handler(request)
+        finally:
+            self.latency.record(request.path, time.perf_counter() - start)
+
+    async def handle_tx(self, request: web.Request) -> web.Response:
+        body = await _read_body(request)
+        txhashes = body["txhashes"] if "txhashes" in body else [body.get("txhash")]
+        if not isinstance(txhashes, list) or not all(map(_is_txhash, txhashes)):
+            raise web.HTTPBadRequest(
+                text="Expected txhash or txhashes as 0x-prefixed 32-byte hex"
+            )
+        results = await asyncio.gather(
+            *(self.txs.submit(txhash) for txhash in txhashes), return_exceptions=True
+        )
+        txs = [
+            {"txhash": txhash, "error": str(result)}
+            if isinstance(result, Exception)
+            else result
+            for txhash, result in zip(txhashes, results)
+        ]
+        if "txhashes" in body:
+            return web.json_response({"txs": txs})
+        status = 200
+        if isinstance(results[0], LookupError):
+            status = 404
+        elif isinstance(results[0], Exception):
+            status = 502
+        return web.json_response(txs[0], status=status)
+
+    async def handle_logs(self, request: web.Request) -> web.Response:
+        body = await _read_body(request)
+        logs = body.get("logs")
+        if not isinstance(logs, list) or not all(map(_is_log, logs)):
+            raise web.HTTPBadRequest(
+                text="Expected logs as a list of objects with address and topics"
+            )
+        try:
+            actions = await self.logs.submit(logs)
+        except Exception as e:
+            return web.json_response({"error": str(e)}, status=502)
+        return web.json_response({"actions": actions})
+
+    async def handle_metrics(self, request: web.Request) -> web.Response:
+        return web.json_response(
+            {
+                "latency": self.latency.snapshot(),
+                "tx_batches": self.txs.stats(),
+                "log_batches": self.logs.stats(),
+            }
+        )
+
+    def app(self) -> web.Application:
+        app = web.Application(middlewares=[self._timing])
+        app.add_routes(
+            [
+                web.post("/tx", self.handle_tx),
+                web.post("/logs", self.handle_logs),
+                web.get("/metrics", self.handle_metrics),
+            ]
+        )
+        return app
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    df = pd.read_csv("func_sign.csv")
+    rpc_pool = build_rpc_pool()
+    mc = MulticallBatcher(PooledMulticall(rpc_pool), logger=logger)
+    cache = build_call_cache()
+    # Warm the cache with the most active tokens and pools before serving
+    prefetch_top = int(getenv("PREFETCH_TOP", "0"))
+    if prefetch_top:
+        prefetch_hot(
+            get_provider("sql"), mc, cache, prefetch_top, prefetch_top, logger=logger
+        )
+    decoder = BatchDecoder(
+        provider=RawRPCProvider(RawJSONRPC(rpc_pool)),
+        evt_decoder=build_evt_decoder(df, mc, cache),
+        calldata_decoder=CalldataDecoder(df),
+        resolver=ReverseResolver(mc),
+    )
+    service = DecoderService(
+        decoder, window=float(getenv("SERVICE_BATCH_WINDOW", "0.005"))
+    )
+    web.run_app(
+        service.app(),
+        host=getenv("SERVICE_HOST", "127.0.0.1"),
+        port=int(getenv("SERVICE_PORT", "8080")),
+    )
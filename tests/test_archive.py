@@ -0,0 +1,124 @@
+from types import SimpleNamespace
+from typing import Dict, List
+
+import pytest
+
+from archive import ArchiveProvider
+
+
+def make_block(blknum: int, n_txs: int) -> Dict:
+    txs = [
+        {
+            "hash": f"0x{blknum:04x}{txpos:060x}",
+            "from": "0x" + "a" * 40,
+            "to": "0x" + "b" * 40,
+            "value": txpos,
+            "gasPrice": 10**9,
+            "input": "0x",
+        }
+        for txpos in range(n_txs)
+    ]
+    return {
+        "number": blknum,
+        "timestamp": 1_600_000_000 + blknum,
+        "transactions": txs,
+    }
+
+
+def make_receipt(blknum: int, txpos: int, tx: Dict) -> Dict:
+    return {
+        "transactionHash": tx["hash"],
+        "blockNumber": blknum,
+        "transactionIndex": txpos,
+        "gasUsed": 21000,
+        "status": 1,
+        "logs": [
+            {
+                "blockNumber": blknum,
+                "logIndex": txpos,
+                "address": "0x" + "c" * 40,
+                "topics": ["0x" + "d" * 64],
+                "data": "0x",
+            }
+        ],
+    }
+
+
+class FakeUpstream:
+    """
+    Upstream provider serving `blocks`, counting the blocks it fetched.
+    """
+
+    def __init__(self, blocks: Dict[int, Dict]) -> None:
+        self.blocks = blocks
+        self.fetched: List[int] = []
+        receipts = {
+            tx["hash"]: make_receipt(blknum, txpos, tx)
+            for blknum, block in blocks.items()
+            for txpos, tx in enumerate(block["transactions"])
+        }
+        self.receipts = receipts
+        self.w3 = SimpleNamespace(
+            eth=SimpleNamespace(get_transaction_receipt=receipts.__getitem__)
+        )
+
+    def get_raw_block(self, blknum: int):
+        self.fetched.append(blknum)
+        block = self.blocks[blknum]
+        return block, [self.receipts[tx["hash"]] for tx in block["transactions"]]
+
+
+@pytest.fixture
+def upstream() -> FakeUpstream:
+    return FakeUpstream({blknum: make_block(blknum, 3) for blknum in range(10, 14)})
+
+
+def test_record_then_replay_offline(tmp_path, upstream):
+    path = str(tmp_path / "archive.db")
+    recorder = ArchiveProvider(path, upstream=upstream)
+    recorded = list(recorder.iter_txs_by_range(10, 13))
+    recorder.close()
+    assert upstream.fetched == [10, 11, 12, 13]
+    assert [tx["blknum"] for tx in recorded] == sorted([10, 11, 12, 13] * 3)
+
+    replay = ArchiveProvider(path)
+    assert list(replay.iter_txs_by_range(10, 13)) == recorded
+    assert replay.get_txs_by_block(12) == recorded[6:9]
+    tx = recorded[4]
+    assert replay.get_tx_by_hash("0x" + tx["txhash"][2:].upper()) == tx
+    assert tx["block_timestamp"] == 1_600_000_011
+    assert tx["logs"][0]["topics"] == ["0x" + "d" * 64]
+
+
+def test_recording_a_tx_archives_its_whole_block(tmp_path, upstream):
+    path = str(tmp_path / "archive.db")
+    txhash = upstream.blocks[11]["transactions"][1]["hash"]
+    recorder = ArchiveProvider(path, upstream=upstream)
+    assert recorder.get_tx_by_hash(txhash)["txhash"] == txhash
+    recorder.close()
+
+    replay = ArchiveProvider(path)
+    assert len(replay.get_txs_by_block(11)) == 3
+    assert upstream.fetched == [11]
+
+
+def test_replaying_a_partly_archived_block_raises(tmp_path, upstream):
+    path = str(tmp_path / "archive.db")
+    recorder = ArchiveProvider(path, upstream=upstream)
+    recorder.get_txs_by_block(10)
+    recorder.close()
+
+    replay = ArchiveProvider(path)
+    # Drop one transaction, as an archive recorded per transaction would
+    with replay._conn:
+        replay._conn.execute("DELETE FROM txs WHERE txpos = 1")
+    with pytest.raises(KeyError, match="not fully archived, first 10"):
+        replay.get_txs_by_block(10)
+    # Blocks never recorded raise too, rather than replaying as empty
+    with pytest.raises(KeyError, match="first 11"):
+        list(ArchiveProvider(path).iter_txs_by_range(11, 11))
+
+    # With an upstream, the missing transactions are recorded again
+    recorder = ArchiveProvider(path, upstream=upstream)
+    assert len(recorder.get_txs_by_block(10)) == 3
+    assert upstream.fetched == [10, 10]
@@ -0,0 +1,84 @@
+from typing import Dict, List
+
+import pytest
+from multicall import Call
+
+from batcher import MulticallBatcher
+
+
+class FakeMulticall:
+    """
+    Answers `agg` from a table of results, failing the whole aggregate when it
+    contains a call to a target listed in `reverts`.
+    """
+
+    def __init__(self, results: Dict[str, int], reverts=(), error=None) -> None:
+        self.results = results
+        self.reverts = set(reverts)
+        self.error = error
+        self.sizes: List[int] = []
+
+    def agg(self, calls: List[Call], block_identifier=None) -> List[Dict]:
+        self.sizes.append(len(calls))
+        if self.error is not None:
+            raise self.error
+        if any(call.target in self.reverts for call in calls):
+            raise ValueError("execution reverted")
+        return [
+            {"request_id": call.request_id, "result": self.results[call.target]}
+            for call in calls
+        ]
+
+
+def make_calls(targets: List[str]) -> List[Call]:
+    return [Call(target=target, function="decimals()(uint8)") for target in targets]
+
+
+def test_fetch_returns_results_in_input_order():
+    mc = FakeMulticall({"a": 18, "b": 6, "c": 8})
+    batcher = MulticallBatcher(mc)
+    assert batcher.fetch(make_calls(["c", "a", "b"])) == [8, 18, 6]
+
+
+def test_fetch_splits_chunks_by_max_calls():
+    targets = [f"t{i}" for i in range(10)]
+    mc = FakeMulticall({target: i for i, target in enumerate(targets)})
+    batcher = MulticallBatcher(mc, max_calls=4)
+    assert batcher.fetch(make_calls(targets)) == list(range(10))
+    assert mc.sizes == [4, 4, 2]
+
+
+def test_fetch_isolates_reverting_calls():
+    targets = [f"t{i}" for i in range(8)]
+    mc = FakeMulticall({target: i for i, target in enumerate(targets)}, {"t5"})
+    batcher = MulticallBatcher(mc)
+    results = batcher.fetch(make_calls(targets))
+    assert results == [0, 1, 2, 3, 4, None, 6, 7]
+
+
+def test_transport_error_is_raised_without_bisecting():
+    mc = FakeMulticall({}, error=ConnectionError("connection refused"))
+    batcher = MulticallBatcher(mc, max_retries=2, backoff=0)
+    with pytest.raises(ConnectionError):
+        batcher.fetch(make_calls([f"t{i}" for i in range(16)]))
+    # One chunk, tried once plus two retries
+    assert mc.sizes == [16, 16, 16]
+
+
+def test_rate_limit_error_is_raised_without_bisecting():
+    error = ValueError({"code": 429, "message": "Too Many Requests"})
+    mc = FakeMulticall({}, error=error)
+    batcher = MulticallBatcher(mc, max_retries=1, backoff=0)
+    with pytest.raises(ValueError):
+        batcher.fetch(make_calls([f"t{i}" for i in range(16)]))
+    assert mc.sizes == [16, 16]
+
+
+def test_agg_omits_failed_calls():
+    mc = FakeMulticall({"a": 18, "b": 6}, {"b"})
+    batcher = MulticallBatcher(mc)
+    calls = [
+        Call(target="a", function="decimals()(uint8)", request_id="a"),
+        Call(target="b", function="decimals()(uint8)", request_id="b"),
+    ]
+    assert batcher.agg(calls) == [{"request_id": "a", "result": 18}]
@@ -0,0 +1,121 @@
+from typing import List, Sequence
+
+import pandas as pd
+from eth_utils import keccak
+
+from bloom import BloomFilter, bloom_mask
+from decoder import EventLogsDecoder
+from provider import RawRPCProvider
+
+# Transfer(address,address,uint256) and Uniswap V2 Swap(...)
+TRANSFER = "0xddf252ad1be2c89b69c2b068fc378daa952ba7f163c4a11628f55a4df523b3ef"
+SWAP = "0xd78ad95fa46c994b6551d0da85fc275fe613ce37657fb8d5e3d130840159d822"
+USDC = "0xa0b86991c6218b36c1d19d4a2e9eb0ce3606eb48"
+PAIR = "0xb4e16d0168e52d35cacd2c6185b44281ec28c9dc"
+EMPTY = "0x" + "00" * 256
+
+
+def logs_bloom(logs: Sequence[Sequence[str]]) -> str:
+    """
+    Encodes a `logsBloom` the way nodes do: a 256 bytes big-endian bit array
+    where every address and topic sets 3 bits.
+    """
+    bloom = bytearray(256)
+    for log in logs:
+        for item in log:
+            digest = keccak(bytes.fromhex(item[2:]))
+            for i in (0, 2, 4):
+                bit = ((digest[i] << 8) | digest[i + 1]) & 2047
+                bloom[255 - bit // 8] |= 1 << (bit % 8)
+    return "0x" + bloom.hex()
+
+
+def test_bloom_mask_sets_the_bits_of_a_logs_bloom():
+    encoded = logs_bloom([[USDC]])
+    assert bloom_mask(bytes.fromhex(USDC[2:])) == int(encoded, 16)
+    assert bin(int(logs_bloom([[TRANSFER]]), 16)).count("1") <= 3
+
+
+def test_matches_topics_and_addresses():
+    transfer = logs_bloom([[USDC, TRANSFER, "0x" + "00" * 32]])
+    swap = logs_bloom([[PAIR, SWAP], [USDC, TRANSFER]])
+    by_topic = BloomFilter([SWAP])
+    assert by_topic.matches(swap)
+    assert not by_topic.matches(transfer)
+    assert not by_topic.matches(EMPTY)
+    # Raw bytes and integers are accepted too
+    assert by_topic.matches(bytes.fromhex(swap[2:]))
+    assert by_topic.matches(int(swap, 16))
+
+    by_address = BloomFilter([TRANSFER], [PAIR])
+    assert by_address.matches(swap)
+    assert not by_address.matches(transfer)
+
+
+def test_filter_keeps_candidate_headers():
+    headers = [
+        {"number": 1, "logsBloom": logs_bloom([[USDC, TRANSFER]])},
+        {"number": 2, "logsBloom": EMPTY},
+        {"number": 3, "logsBloom": logs_bloom([[PAIR, SWAP]])},
+    ]
+    assert [h["number"] for h in BloomFilter([SWAP]).filter(headers)] == [3]
+    assert BloomFilter([SWAP, TRANSFER]).filter(headers) == [headers[0], headers[2]]
+    assert BloomFilter(["0x" + "11" * 32]).filter(headers) == []
+
+
+def test_decoder_builds_the_filter_of_its_events():
+    evt_df = pd.DataFrame({"byte_sign": [], "text_sign": [], "abi": []}, dtype=str)
+    evt_decoder = EventLogsDecoder(evt_df)
+    evt_decoder._register(SWAP, "Swap(...)", lambda payload: "")
+    bloom = evt_decoder.bloom_filter()
+    assert bloom.matches(logs_bloom([[PAIR, SWAP]]))
+    assert not bloom.matches(logs_bloom([[USDC, TRANSFER]]))
+    evt_decoder.close()
+
+
+class FakeClient:
+    def __init__(self, block: dict, receipts: List[dict]) -> None:
+        self.block = block
+        self.receipts = receipts
+        self.batches = 0
+
+    def call(self, method: str, params: list) -> dict:
+        return self.block
+
+    def batch(self, requests: list) -> List[dict]:
+        self.batches += 1
+        return self.receipts
+
+
+def make_receipt(txhash: str, bloom: str) -> dict:
+    return {
+        "transactionHash": txhash,
+        "blockNumber": "0x1",
+        "gasUsed": "0x5208",
+        "status": "0x1",
+        "logsBloom": bloom,
+        "logs": [],
+    }
+
+
+def test_provider_skips_blocks_and_txs_which_cannot_match():
+    tx = {"from": "0xa", "to": "0xb", "value": "0x0", "gasPrice": "0x1", "input": ""}
+    txs = [dict(tx, hash="0x01"), dict(tx, hash="0x02")]
+    receipts = [
+        make_receipt("0x01", logs_bloom([[PAIR, SWAP]])),
+        make_receipt("0x02", logs_bloom([[USDC, TRANSFER]])),
+    ]
+    block = {
+        "timestamp": "0x0",
+        "transactions": txs,
+        "logsBloom": logs_bloom([[PAIR, SWAP], [USDC, TRANSFER]]),
+    }
+    client = FakeClient(block, receipts)
+    provider = RawRPCProvider(client)
+    found = provider.get_txs_by_block(1, BloomFilter([SWAP]))
+    assert [tx["txhash"] for tx in found] == ["0x01"]
+
+    client = FakeClient(dict(block, logsBloom=EMPTY), receipts)
+    assert RawRPCProvider(client).get_txs_by_block(1, BloomFilter([SWAP])) == []
+    # Receipts of a block which cannot match are never fetched
+    assert client.batches == 0
@@ -0,0 +1,164 @@
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import uuid
+
+import pytest
+
+from cache import CallCache, Position, PositionIndex, SharedCallCache
+from quarantine import Quarantine
+
+
+def test_snapshot_round_trip(tmp_path):
+    path = str(tmp_path / "call_cache.json")
+    cache = CallCache(path=path)
+    cache.set(("0xa", "decimals()(uint8)", ()), 18)
+    # Per-block entries are not snapshotted
+    cache.set(("0xa", "balanceOf(address)(uint256)", ("0xb",), 100), 5)
+    cache.save()
+    restored = CallCache(path=path)
+    assert restored.get(("0xa", "decimals()(uint8)", ())) == 18
+    assert len(restored) == 1
+
+
+def test_concurrent_saves_do_not_collide(tmp_path):
+    path = str(tmp_path / "call_cache.json")
+    caches = [CallCache(path=path) for _ in range(8)]
+    for idx, cache in enumerate(caches):
+        cache.set((f"0x{idx}", "decimals()(uint8)", ()), idx)
+    errors = []
+
+    def save(cache: CallCache) -> None:
+        try:
+            for _ in range(20):
+                cache.save()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=(cache,)) for cache in caches]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert len(CallCache(path=path)) == 1
+    assert os.listdir(tmp_path) == ["call_cache.json"]
+
+
+def test_corrupt_snapshots_are_skipped(tmp_path, caplog):
+    logger = logging.getLogger("test_cache")
+    cache_path = tmp_path / "call_cache.json"
+    cache_path.write_text('[["0xa", "decimals()(uint8)", [], 18], ["0x')
+    quarantine_path = tmp_path / "quarantine.json"
+    quarantine_path.write_text('[["0x01", "0xa", "KeyError"')
+    with caplog.at_level(logging.WARNING, logger="test_cache"):
+        cache = CallCache(path=str(cache_path), logger=logger)
+        quarantine = Quarantine(path=str(quarantine_path), logger=logger)
+    assert len(cache) == 0 and len(quarantine) == 0
+    assert "Ignoring call cache snapshot" in caplog.text
+    assert "Ignoring quarantine snapshot" in caplog.text
+
+
+def test_position_index_skips_torn_lines(tmp_path, caplog):
+    logger = logging.getLogger("test_cache")
+    path = tmp_path / "positions.jsonl"
+    path.write_text(
+        '{"manager": "0xm", "token_id": 1, "token0": "0xa", "token1": "0xb", '
+        '"fee": 500}\n{"manager": "0xm", "token_id": 2, "tok'
+    )
+    with caplog.at_level(logging.WARNING, logger="test_cache"):
+        index = PositionIndex(path=str(path), logger=logger)
+    assert index.get("0xM", 1) == Position("0xa", "0xb", 500)
+    assert len(index) == 1
+    assert "Skipped 1 corrupt lines" in caplog.text
+
+    # Appends start on a fresh line and go through a single handle
+    index.add("0xM", 2, Position("0xa", "0xc", 3000))
+    handle = index._file
+    index.add("0xM", 3, Position("0xa", "0xd", 100))
+    assert index._file is handle
+    index.close()
+    restored = PositionIndex(path=str(path))
+    assert len(restored) == 3
+    assert restored.get("0xm", 2) == Position("0xa", "0xc", 3000)
+
+
+def shared_key(idx: int):
+    return (f"0x{idx:040x}", "symbol()(string)", ())
+
+
+def shared_value(idx: int):
+    # Values of every length, a torn read would mix two of them
+    if idx % 3 == 0:
+        return idx * 1_000_003
+    return chr(ord("a") + idx % 26) * (idx % 42 + 1)
+
+
+@pytest.fixture
+def table_name():
+    name = f"deficodex-test-{uuid.uuid4().hex[:8]}"
+    yield name
+    cache = SharedCallCache(name, slots=1)
+    cache.close()
+    cache.unlink()
+    os.remove(os.path.join(tempfile.gettempdir(), f"{name}.lock"))
+
+
+def write_shared(name: str, slots: int, count: int) -> None:
+    cache = SharedCallCache(name, slots=slots)
+    for idx in range(count):
+        cache.set(shared_key(idx), shared_value(idx))
+    cache.close()
+
+
+def test_shared_reads_while_other_processes_write(table_name):
+    count = 20_000
+    reader = SharedCallCache(table_name, slots=1 << 16)
+    ctx = multiprocessing.get_context("fork")
+    # Two writers racing on the same keys, each entry is published once
+    writers = [
+        ctx.Process(target=write_shared, args=(table_name, 1 << 16, count))
+        for _ in range(2)
+    ]
+    for writer in writers:
+        writer.start()
+    while any(writer.is_alive() for writer in writers):
+        for idx in range(count):
+            value = reader.get(shared_key(idx))
+            if value is not None:
+                assert value == shared_value(idx)
+    for writer in writers:
+        writer.join()
+        assert writer.exitcode == 0
+    assert [reader.get(shared_key(idx)) for idx in range(count)] == [
+        shared_value(idx) for idx in range(count)
+    ]
+    assert len(reader) == count
+    reader.close()
+
+
+def test_shared_collisions_and_full_table(table_name):
+    writer = SharedCallCache(table_name, slots=4, max_probes=4)
+    # Every key collides in a 4 slot table, probing keeps them apart
+    for idx in range(4):
+        writer.set(shared_key(idx), shared_value(idx))
+    other = SharedCallCache(table_name)
+    assert other.slots == 4
+    assert [other.get(shared_key(idx)) for idx in range(4)] == [
+        shared_value(idx) for idx in range(4)
+    ]
+    # Once full, entries fall back to the per-process LRU
+    writer.set(shared_key(4), shared_value(4))
+    assert writer.get(shared_key(4)) == shared_value(4)
+    assert other.get(shared_key(4)) is None
+    assert len(other) == 4 and len(writer) == 5
+    # So do values that do not fit a slot, and entries of mutable state
+    writer.set(shared_key(5), "x" * 43)
+    writer.set(shared_key(6) + (100,), 6)
+    assert other.get(shared_key(5)) is None
+    assert writer.get(shared_key(5)) == "x" * 43
+    assert writer.get(shared_key(6) + (100,)) == 6
+    writer.close()
+    other.close()
@@ -0,0 +1,103 @@
+import json
+
+import pandas as pd
+
+from calldata import CalldataDecoder
+
+TRANSFER = "0xa9059cbb"
+TRANSFER_ABI = {
+    "name": "transfer",
+    "type": "function",
+    "inputs": [
+        {"name": "to", "type": "address"},
+        {"name": "amount", "type": "uint256"},
+    ],
+}
+
+
+def word(value: int) -> str:
+    return f"{value:064x}"
+
+
+def text_input(message: str) -> str:
+    return "0x" + message.encode().hex()
+
+
+def make_decoder() -> CalldataDecoder:
+    evt_df = pd.DataFrame(
+        {
+            "byte_sign": [TRANSFER, "0x" + "dd" * 32],
+            "text_sign": ["transfer(address,uint256)", "Transfer(address,uint256)"],
+            "abi": [json.dumps(TRANSFER_ABI), "{}"],
+        }
+    )
+    return CalldataDecoder(evt_df)
+
+
+def test_known_selectors_are_decoded():
+    decoder = make_decoder()
+    call = TRANSFER + word(0x1234 << 16) + word(5)
+    assert decoder.classify(call) == "known"
+    decoded = decoder.decode(call)
+    assert decoded["selector"] == TRANSFER
+    assert decoded["text_sign"] == "transfer(address,uint256)"
+    assert decoded["params"] == {"to": "0x" + "0" * 32 + "12340000", "amount": 5}
+    # Event topics are not function selectors
+    assert decoder.classify("0x" + "dd" * 36) == "unknown"
+
+
+def test_unknown_selectors_are_not_text():
+    decoder = make_decoder()
+    # ABI shaped, its zero padded words rule out text
+    assert decoder.classify("0x12345678" + word(1) + word(2)) == "unknown"
+    assert decoder.classify("0x12345678") == "unknown"
+    # Not word aligned, and not UTF-8
+    assert decoder.classify("0x12345678ffff") == "unknown"
+    assert decoder.classify("0x1234567") == "unknown"
+    # A known selector with packed arguments stays known
+    assert decoder.classify(TRANSFER + "00" * 20) == "known"
+
+
+def test_text_payloads():
+    decoder = make_decoder()
+    assert decoder.classify("") == decoder.classify("0x") == "empty"
+    message = text_input("GM, see you on-chain\n")
+    assert decoder.classify(message) == "text"
+    assert decoder.decode(message)["message"] == "gm, see you on-chain\n"
+    # Text that happens to be as long as a call with one argument
+    aligned = text_input("x" * 36)
+    assert (len(aligned) - 10) % 64 == 0
+    assert decoder.classify(aligned) == "text"
+    # Control characters are not a message
+    assert decoder.classify(text_input("gm\x07")) == "unknown"
+
+
+def test_decode_batch_matches_decode_and_plans_once(monkeypatch):
+    decoder = make_decoder()
+    inputs = [
+        TRANSFER + word(1) + word(2),
+        "0x",
+        text_input("hello"),
+        "0x12345678" + word(1),
+        TRANSFER + word(3) + word(4),
+    ]
+    expected = [decoder.decode(input) for input in inputs]
+    decoder._plans.clear()
+    planned = []
+    get_plan = decoder.get_plan
+
+    def counting_get_plan(selector):
+        planned.append(selector)
+        return get_plan(selector)
+
+    monkeypatch.setattr(decoder, "get_plan", counting_get_plan)
+    results = decoder.decode_batch(inputs)
+    assert results == expected
+    assert [r["kind"] for r in results] == [
+        "known",
+        "empty",
+        "text",
+        "unknown",
+        "known",
+    ]
+    assert planned == [TRANSFER]
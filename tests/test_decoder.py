@@ -0,0 +1,75 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pandas as pd
+
+import decoder
+from decoder import EventLogsDecoder
+from protocols import TOPICS
+
+
+def make_decoder() -> EventLogsDecoder:
+    evt_df = pd.DataFrame({"byte_sign": [], "text_sign": [], "abi": []}, dtype=str)
+    return EventLogsDecoder(evt_df, workers=8)
+
+
+def test_protocol_decoders_are_still_exported():
+    from decoder import UniswapV2Decoder
+    from protocols.uniswap import UniswapV2Decoder as moved
+
+    assert UniswapV2Decoder is moved
+    assert not hasattr(decoder, "NoSuchDecoder")
+
+
+def test_decode_all_keeps_order_and_bounds_workers():
+    evt_decoder = make_decoder()
+    lock = threading.Lock()
+    running, peak = [0], [0]
+
+    def decode(log):
+        with lock:
+            running[0] += 1
+            peak[0] = max(peak[0], running[0])
+        time.sleep(0.01 * (log["logpos"] % 3))
+        with lock:
+            running[0] -= 1
+        return str(log["logpos"])
+
+    evt_decoder.decode = decode
+    logs = [{"logpos": idx, "topics": []} for idx in range(20)]
+    assert evt_decoder.decode_all(logs, workers=2) == [str(i) for i in range(20)]
+    assert peak[0] <= 2
+    assert evt_decoder.decode_all(logs) == [str(i) for i in range(20)]
+    assert evt_decoder.decode_all([]) == []
+    evt_decoder.close()
+
+
+class SlowProtocol:
+    """
+    Stands in for a protocol decoder whose import and construction are slow.
+    """
+
+    def __init__(self, **kwargs) -> None:
+        time.sleep(0.2)
+
+    def handlers(self):
+        for topic0 in TOPICS["uniswap_v2"]:
+            yield topic0, "Event()", lambda payload: "decoded"
+
+    def prefetch(self, logs) -> None:
+        pass
+
+
+def test_concurrent_decodes_wait_for_the_protocol_load(monkeypatch):
+    monkeypatch.setattr(decoder, "load_protocol", lambda name: SlowProtocol)
+    evt_decoder = make_decoder()
+    plan = SimpleNamespace(text_sign="Event()", decode=lambda topics, data: {})
+    evt_decoder.signatures = SimpleNamespace(get=lambda topic0, n_topics: plan)
+    evt_decoder.register_protocol("uniswap_v2")
+    log = {"address": "0xa", "topics": [TOPICS["uniswap_v2"][0]], "data": "0x"}
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(evt_decoder.decode, [log] * 8))
+    assert results == ["decoded"] * 8
+    evt_decoder.close()
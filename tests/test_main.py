@@ -0,0 +1,43 @@
+import io
+import json
+
+from main import run_batch
+
+
+class FlakyBatchDecoder:
+    """
+    Decodes everything but the "bad" records, failing any batch holding one.
+    """
+
+    def decode_txs(self, txhashes):
+        if "0xbad" in txhashes:
+            raise RuntimeError("receipt is malformed")
+        return [{"txhash": txhash, "actions": []} for txhash in txhashes]
+
+    def decode_logs(self, batch):
+        if any(log.get("bad") for logs in batch for log in logs):
+            raise KeyError("data")
+        return [[log["address"] for log in logs] for logs in batch]
+
+
+def test_failed_records_only_fail_their_own_line():
+    lines = [
+        "0x01",
+        json.dumps({"address": "0xa", "topics": ["0x00"]}),
+        "0xbad",
+        json.dumps({"address": "0xb", "topics": ["0x00"], "bad": True}),
+        "{not json",
+        "0x02",
+        json.dumps({"logs": [{"address": "0xc", "topics": []}]}),
+    ]
+    dst = io.StringIO()
+    run_batch(FlakyBatchDecoder(), io.StringIO("\n".join(lines)), dst, batch_size=8)
+    results = [json.loads(line) for line in dst.getvalue().splitlines()]
+    assert len(results) == len(lines)
+    assert results[0] == {"txhash": "0x01", "actions": []}
+    assert results[1] == {"actions": ["0xa"]}
+    assert results[2] == {"txhash": "0xbad", "error": "receipt is malformed"}
+    assert results[3] == {"error": "'data'"}
+    assert "error" in results[4]
+    assert results[5] == {"txhash": "0x02", "actions": []}
+    assert results[6] == {"actions": ["0xc"]}
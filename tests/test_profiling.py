@@ -0,0 +1,120 @@
+import io
+import json
+import time
+from types import SimpleNamespace
+from typing import Dict, List
+
+import pandas as pd
+
+import main
+from batcher import MulticallBatcher
+from decoder import BaseDecoder, EventLogsDecoder, EventPlan, event
+from profiling import Profiler
+
+TRANSFER = "Transfer(address,address,uint256)"
+TRANSFER_ABI = {
+    "name": "Transfer",
+    "type": "event",
+    "anonymous": False,
+    "inputs": [
+        {"name": "from", "type": "address", "indexed": True},
+        {"name": "to", "type": "address", "indexed": True},
+        {"name": "value", "type": "uint256", "indexed": False},
+    ],
+}
+
+
+class DecimalsMulticall:
+    def agg(self, calls: List, block_identifier=None) -> List[Dict]:
+        return [{"request_id": call.request_id, "result": 18} for call in calls]
+
+
+class TransferDecoder(BaseDecoder):
+    @event(TRANSFER)
+    def transfer(self, log: Dict) -> str:
+        (decimals,) = self._get_token_decimals(log["address"], log["blknum"])
+        time.sleep(0.02)
+        return f"transfer {log['params']['value'] / 10**decimals}"
+
+
+def word(value: int) -> str:
+    return f"{value:064x}"
+
+
+def make_tx(blknum: int, topic0: str) -> Dict:
+    logs = [
+        {
+            "blknum": blknum,
+            "logpos": logpos,
+            # A token per log, so that every handler looks its decimals up
+            "address": f"0x{blknum:020x}{logpos:020x}",
+            "topics": [topic0, "0x" + word(1), "0x" + word(2)],
+            "data": "0x" + word(5 * 10**18),
+        }
+        for logpos in range(2)
+    ]
+    return {"txhash": f"0x{blknum:064x}", "blknum": blknum, "logs": logs}
+
+
+def test_profiled_decode(tmp_path):
+    (topic0,) = TransferDecoder.EVENTS
+    evt_df = pd.DataFrame(
+        {
+            "byte_sign": [topic0],
+            "text_sign": [TRANSFER],
+            "abi": [json.dumps(TRANSFER_ABI)],
+        }
+    )
+    evt_decoder = EventLogsDecoder(evt_df, workers=2)
+    mc = MulticallBatcher(DecimalsMulticall())
+    decoder = TransferDecoder(mc)
+    evt_decoder.register_class(decoder)
+    provider = SimpleNamespace(
+        get_txs_by_block=lambda blknum, bloom: [make_tx(blknum, topic0)]
+    )
+    profiler = Profiler(("cprofile", "sample"), interval=0.002)
+    out = io.StringIO()
+    main.run_profile(provider, evt_decoder, mc, 1, 3, out, profiler)
+
+    records = [json.loads(line) for line in out.getvalue().splitlines()]
+    assert [len(record["actions"]) for record in records] == [2, 2, 2]
+    assert records[0]["actions"][0]["action"] == "transfer 5.0"
+
+    # Per-stage totals, nested stages keep the protocol of their caller
+    calls = profiler.stage_calls
+    assert calls[("handler", "TransferDecoder")] == 6
+    assert calls[("multicall", "TransferDecoder")] == 6
+    assert calls[("signature_lookup", None)] == 6
+    assert calls[("eth_decode_log", None)] == 6
+    assert calls[("formatting", None)] == 3
+    # One more to find out the blocks are exhausted
+    assert calls[("provider_fetch", None)] == 4
+    assert profiler.stage_times[("handler", "TransferDecoder")] >= 6 * 0.02
+
+    paths = profiler.write(str(tmp_path))
+    assert {path.rsplit("/", 1)[-1] for path in paths} >= {
+        "stages.txt",
+        "stages.collapsed",
+        "samples.collapsed",
+        "cprofile.pstats",
+    }
+    stages = (tmp_path / "stages.collapsed").read_text().splitlines()
+    flames = dict(line.rsplit(" ", 1) for line in stages)
+    assert int(flames["handler;TransferDecoder"]) >= 6 * 20_000
+    assert "eth_decode_log;-" in flames and "multicall;TransferDecoder" in flames
+    samples = (tmp_path / "samples.collapsed").read_text().splitlines()
+    handler = [line for line in samples if line.startswith("handler;TransferDecoder;")]
+    assert handler
+    # The stage wrappers are left out of the stacks
+    assert any("test_profiling.py:transfer" in line for line in handler)
+    assert not any(";profiling.py:wrapper" in line for line in samples)
+
+    # Every patch is undone
+    assert profiler._patches == []
+    assert not hasattr(EventPlan.decode, "_profiled")
+    assert "get" not in vars(evt_decoder.signatures)
+    assert "fetch" not in vars(mc)
+    assert "prefetch" not in vars(decoder)
+    assert "_register" not in vars(evt_decoder)
+    assert "register_class" not in vars(evt_decoder)
+    assert evt_decoder.hdlrs[topic0] == decoder.transfer
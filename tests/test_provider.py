@@ -0,0 +1,170 @@
+import threading
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session
+
+from model import Base, BlockDay, Log, Transaction, TxIndex
+from provider import SQLProvider, Web3Provider
+from replicas import ReplicaSet
+
+DAY1, DAY2 = date(2024, 1, 1), date(2024, 1, 2)
+# (blknum, _st_day), the last block is missing from the lookup views
+BLOCKS = [(10, DAY1), (11, DAY1), (20, DAY2), (21, DAY2)]
+
+
+def txhash(blknum: int) -> str:
+    return f"0x{blknum:064x}"
+
+
+@pytest.fixture
+def sql(tmp_path) -> SQLProvider:
+    engine = create_engine(f"sqlite:///{tmp_path / 'main.db'}")
+
+    @event.listens_for(engine, "connect")
+    def attach(conn, _):
+        conn.execute(f"ATTACH DATABASE '{tmp_path / 'ethereum.db'}' AS ethereum")
+
+    tables = [t.__table__ for t in (Log, Transaction, TxIndex, BlockDay)]
+    Base.metadata.create_all(engine, tables=tables)
+    with Session(engine) as sess:
+        for idx, (blknum, day) in enumerate(BLOCKS):
+            sess.add(
+                Transaction(
+                    id=idx,
+                    _st_day=day,
+                    blknum=blknum,
+                    txhash=txhash(blknum),
+                    txpos=0,
+                    from_address="0xa",
+                )
+            )
+            sess.add(
+                Log(
+                    id=idx,
+                    _st_day=day,
+                    blknum=blknum,
+                    txhash=txhash(blknum),
+                    logpos=0,
+                    address="0xb",
+                    topics="0x01,0x02",
+                    data="0x",
+                )
+            )
+        # The views were refreshed before block 21 was loaded
+        for blknum, day in BLOCKS[:-1]:
+            sess.add(TxIndex(txhash=txhash(blknum), blknum=blknum, _st_day=day))
+        sess.add(BlockDay(_st_day=DAY1, start_blknum=10, end_blknum=11))
+        sess.add(BlockDay(_st_day=DAY2, start_blknum=20, end_blknum=20))
+        sess.commit()
+
+    provider = SQLProvider.__new__(SQLProvider)
+    provider.engine = engine
+    provider.db = ReplicaSet(engine)
+    provider.topic_columns = False
+    provider.workers = 2
+    provider.shard_size = 1
+    provider._days, provider._day_starts = [], []
+    return provider
+
+
+def test_indexed_tx_is_read(sql):
+    tx = sql.get_tx_by_hash(txhash(11))
+    assert (tx["blknum"], len(tx["logs"])) == (11, 1)
+    assert tx["logs"][0]["topics"] == ["0x01", "0x02"]
+
+
+def test_tx_newer_than_the_views_is_read(sql):
+    assert sql.get_tx_by_hash(txhash(21))["blknum"] == 21
+    assert sql.get_tx_by_hash(txhash(21), blknum=21)["logs"][0]["blknum"] == 21
+
+
+def test_unknown_tx_raises(sql):
+    with pytest.raises(ValueError, match="not found"):
+        sql.get_tx_by_hash(txhash(99))
+
+
+def test_range_read_keeps_unindexed_blocks(sql):
+    txs = list(sql.iter_txs_by_range(9, 30))
+    assert [tx["blknum"] for tx in txs] == [10, 11, 20, 21]
+    assert all(len(tx["logs"]) == 1 for tx in txs)
+    assert [tx["blknum"] for tx in sql.get_txs_by_block(21)] == [21]
+
+
+class FakeEth:
+    """
+    One log per block, ranges wider than `max_range` blocks are rejected,
+    unless they start at `sparse_from` or later.
+    """
+
+    def __init__(
+        self, max_range: int, error: Exception = None, sparse_from: int = None
+    ) -> None:
+        self.max_range = max_range
+        self.error = error
+        self.sparse_from = sparse_from
+        self.ranges = []
+        self.in_flight = self.peak = 0
+        self._lock = threading.Lock()
+
+    def get_logs(self, params: dict) -> list:
+        start, end = params["fromBlock"], params["toBlock"]
+        with self._lock:
+            self.ranges.append((start, end))
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            if self.error is not None:
+                raise self.error
+            sparse = self.sparse_from is not None and start >= self.sparse_from
+            if end - start + 1 > self.max_range and not sparse:
+                message = "query returned more than 10000 results"
+                raise ValueError({"code": -32005, "message": message})
+            return [
+                {
+                    "blockNumber": blknum,
+                    "logIndex": 0,
+                    "transactionHash": txhash(blknum),
+                    "address": "0xb",
+                    "topics": ["0x01"],
+                    "data": "0x",
+                }
+                for blknum in range(start, end + 1)
+            ]
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+def test_scan_logs_carries_the_accepted_window_forward():
+    eth = FakeEth(max_range=25)
+    provider = Web3Provider(SimpleNamespace(eth=eth))
+    logs = list(provider.scan_logs(1, 1000, ["0x01"], window=100, workers=4))
+    assert [tx_logs[0]["blknum"] for _, tx_logs in logs] == list(range(1, 1001))
+    assert eth.peak <= 4
+    rejected = [(start, end) for start, end in eth.ranges if end - start + 1 > 25]
+    # The first windows, sent before a split was seen, and one round probing a
+    # larger window are too large
+    assert len(rejected) <= 4 * 4
+
+
+def test_scan_logs_grows_the_window_back():
+    # Dense blocks first, then the node accepts the full window again
+    eth = FakeEth(max_range=10, sparse_from=201)
+    provider = Web3Provider(SimpleNamespace(eth=eth))
+    logs = list(provider.scan_logs(1, 3000, ["0x01"], window=100, workers=2))
+    assert [tx_logs[0]["blknum"] for _, tx_logs in logs] == list(range(1, 3001))
+    sizes = [end - start + 1 for start, end in eth.ranges]
+    assert min(sizes) <= 10
+    assert sizes[-2] == 100
+
+
+def test_scan_logs_does_not_split_rate_limited_windows():
+    limited = ValueError({"code": -32005, "message": "request rate limited"})
+    eth = FakeEth(max_range=25, error=limited)
+    provider = Web3Provider(SimpleNamespace(eth=eth))
+    with pytest.raises(ValueError, match="rate limited"):
+        list(provider.scan_logs(1, 1000, ["0x01"], window=100, workers=2))
+    assert all(end - start + 1 == 100 for start, end in eth.ranges)
@@ -0,0 +1,40 @@
+from quarantine import LookupFailed, Quarantine
+
+TOPIC0 = "0xd78ad95fa46c994b6551d0da85fc275fe613ce37657fb8d5e3d130840159d822"
+POOL = "0xB4e16d0168e52d35CaCD2c6185b44281Ec28C9Dc"
+
+
+def test_repeated_decode_failures_quarantine_the_pair():
+    quarantine = Quarantine(threshold=2)
+    quarantine.record_failure(TOPIC0, POOL, KeyError("amount0In"))
+    assert not quarantine.is_quarantined(TOPIC0, POOL)
+    quarantine.record_failure(TOPIC0, POOL, KeyError("amount0In"))
+    assert quarantine.is_quarantined(TOPIC0, POOL.lower())
+
+
+def test_success_resets_the_failure_count():
+    quarantine = Quarantine(threshold=2)
+    quarantine.record_failure(TOPIC0, POOL, KeyError("amount0In"))
+    quarantine.record_success(TOPIC0, POOL)
+    quarantine.record_failure(TOPIC0, POOL, KeyError("amount0In"))
+    assert not quarantine.is_quarantined(TOPIC0, POOL)
+
+
+def test_transient_failures_never_quarantine():
+    quarantine = Quarantine(threshold=1)
+    errors = [
+        ValueError({"code": -32005, "message": "request rate limited"}),
+        ConnectionError("connection reset"),
+    ]
+    for error in errors:
+        quarantine.record_failure(TOPIC0, POOL, error)
+    assert not quarantine.is_quarantined(TOPIC0, POOL)
+    assert len(quarantine) == 0
+
+
+def test_failed_lookups_quarantine_non_conforming_contracts():
+    quarantine = Quarantine(threshold=2)
+    for _ in range(2):
+        error = LookupFailed(f"Cannot fetch token pair of {POOL}")
+        quarantine.record_failure(TOPIC0, POOL, error)
+    assert quarantine.is_quarantined(TOPIC0, POOL)
@@ -0,0 +1,131 @@
+import threading
+import time
+from types import SimpleNamespace
+from typing import List
+
+import pytest
+
+from ratelimit import BACKFILL, INTERACTIVE, RateLimiter, is_rate_limited, retry_after
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def advance(limiter: RateLimiter, clock: FakeClock, seconds: float) -> None:
+    clock.now += seconds
+    # Waiters sleep on real time, wake them to read the new time
+    with limiter._cond:
+        limiter._cond.notify_all()
+
+
+def wait_for(predicate, timeout: float = 2.0) -> None:
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def acquire_in_thread(
+    limiter: RateLimiter, methods: List[str], priority: int, name: str, order: List
+) -> threading.Thread:
+    def run() -> None:
+        limiter.acquire(methods, priority)
+        order.append(name)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    return thread
+
+
+def test_costs_are_charged_per_method():
+    clock = FakeClock()
+    limiter = RateLimiter(100, costs={"eth_call": 30}, clock=clock)
+    assert limiter.cost(["eth_call", "eth_getLogs", "custom"]) == 30 + 75 + 20
+    limiter.acquire(["eth_call", "eth_call"])
+    assert limiter.tokens == 40
+    advance(limiter, clock, 0.1)
+    limiter.acquire(["eth_call"])
+    assert limiter.tokens == pytest.approx(20)
+
+
+def test_interactive_requests_go_before_backfill():
+    clock = FakeClock()
+    limiter = RateLimiter(100, clock=clock)
+    limiter.acquire(["eth_getLogs"])
+    order: List[str] = []
+    threads = [acquire_in_thread(limiter, ["eth_getLogs"], BACKFILL, "backfill", order)]
+    wait_for(lambda: limiter._waiting[BACKFILL] == 1)
+    threads.append(
+        acquire_in_thread(limiter, ["eth_getLogs"], INTERACTIVE, "interactive", order)
+    )
+    wait_for(lambda: limiter._waiting[INTERACTIVE] == 1)
+    # Enough for one of them, the backfill request queued first keeps waiting
+    advance(limiter, clock, 0.5)
+    wait_for(lambda: order == ["interactive"])
+    assert limiter._waiting[BACKFILL] == 1
+    advance(limiter, clock, 0.75)
+    wait_for(lambda: order == ["interactive", "backfill"])
+    for thread in threads:
+        thread.join()
+
+
+def test_rate_limited_pauses_with_backoff():
+    clock = FakeClock()
+    limiter = RateLimiter(100, max_backoff=1.5, clock=clock)
+    limiter.on_rate_limited()
+    assert limiter._paused_until == clock.now + 0.5
+    limiter.on_rate_limited()
+    assert limiter._paused_until == clock.now + 1.0
+    limiter.on_rate_limited()
+    assert limiter._paused_until == clock.now + 1.5
+    assert limiter.rate_limited == 3 and limiter.tokens == 0
+    # The server's Retry-After wins over the backoff
+    limiter.on_rate_limited(5.0)
+    assert limiter._paused_until == clock.now + 5.0
+    limiter.on_success()
+    assert limiter._backoff == 0.0
+
+    order: List[str] = []
+    thread = acquire_in_thread(limiter, ["eth_call"], INTERACTIVE, "call", order)
+    wait_for(lambda: limiter._waiting[INTERACTIVE] == 1)
+    # The bucket restarts empty once the pause is over
+    advance(limiter, clock, 5.0)
+    advance(limiter, clock, 0.2)
+    time.sleep(0.05)
+    assert order == []
+    advance(limiter, clock, 0.1)
+    wait_for(lambda: order == ["call"])
+    thread.join()
+
+
+def http_error(status: int, headers: dict = None) -> Exception:
+    e = Exception(f"{status} Client Error")
+    e.response = SimpleNamespace(status_code=status, headers=headers or {})
+    return e
+
+
+def test_retry_after_parsing():
+    assert retry_after(http_error(429, {"Retry-After": "3"})) == 3.0
+    assert retry_after(http_error(429, {"Retry-After": "0.5"})) == 0.5
+    assert retry_after(http_error(429, {"Retry-After": "soon"})) is None
+    assert retry_after(http_error(429)) is None
+    assert retry_after(ValueError("no response")) is None
+
+
+def test_is_rate_limited():
+    assert is_rate_limited(http_error(429))
+    assert not is_rate_limited(http_error(503))
+    assert is_rate_limited(ValueError({"code": 429, "message": "slow down"}))
+    limited = {"code": -32005, "message": "Request rate limit exceeded"}
+    assert is_rate_limited(ValueError(limited))
+    assert is_rate_limited(ValueError("429 Too Many Requests"))
+    # -32005 also means an eth_getLogs range returned too much data
+    oversized = {"code": -32005, "message": "query returned more than 10000 results"}
+    assert not is_rate_limited(ValueError(oversized))
+    assert not is_rate_limited(ValueError("execution reverted"))
+    assert not is_rate_limited(Exception())
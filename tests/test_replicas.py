@@ -0,0 +1,18 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from sqlalchemy import create_engine, text
+
+from replicas import ReplicaSet
+
+
+def test_in_flight_is_balanced_under_concurrency(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+    db = ReplicaSet(engine)
+
+    def query(_):
+        return db.run(lambda sess: sess.execute(text("SELECT 1")).scalar())
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        assert sum(executor.map(query, range(2000))) == 2000
+    assert db.primary.in_flight == 0
+    assert db.primary.latency > 0
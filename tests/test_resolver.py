@@ -0,0 +1,64 @@
+from typing import List
+
+from multicall import Call
+
+from resolver import ADDR_FUNC, NAME_FUNC, RESOLVER_FUNC, ReverseResolver
+
+ALICE = "0x" + "a1" * 20
+BOB = "0x" + "b0" * 20
+RESOLVER = "0x" + "4e" * 20
+ZERO = "0x" + "00" * 20
+
+
+class FakeENS:
+    """
+    ALICE has the verified name alice.eth, BOB has no reverse record. While
+    `down`, every name() call fails as during an RPC outage.
+    """
+
+    def __init__(self) -> None:
+        self.down = False
+        self.fetches = 0
+
+    def fetch(self, calls: List[Call], block=None) -> list:
+        self.fetches += 1
+        return [self.result(call) for call in calls]
+
+    def result(self, call: Call):
+        if call.function == RESOLVER_FUNC:
+            # Only alice's reverse and forward nodes have a resolver
+            return RESOLVER if self.owner(call.args[0]) == ALICE else ZERO
+        if call.function == NAME_FUNC:
+            return None if self.down else "alice.eth"
+        if call.function == ADDR_FUNC:
+            return ALICE
+
+    def owner(self, node: bytes):
+        from ens import ENS
+
+        for addr, name in ((ALICE, "alice.eth"), (BOB, None)):
+            reverse = ENS.namehash(ENS.reverse_domain(addr))
+            if node == reverse or (name and node == ENS.namehash(name)):
+                return addr
+        return None
+
+
+def test_failed_lookups_are_not_cached():
+    ens = FakeENS()
+    resolver = ReverseResolver(ens)
+    ens.down = True
+    assert resolver.names([ALICE, BOB]) == {ALICE: None, BOB: None}
+    ens.down = False
+    assert resolver.name(ALICE) == "alice.eth"
+
+
+def test_confirmed_names_and_empty_records_are_cached():
+    ens = FakeENS()
+    resolver = ReverseResolver(ens)
+    assert resolver.names([ALICE.upper().replace("0X", "0x"), BOB]) == {
+        ALICE: "alice.eth",
+        BOB: None,
+    }
+    fetches = ens.fetches
+    assert resolver.names([ALICE, BOB]) == {ALICE: "alice.eth", BOB: None}
+    assert ens.fetches == fetches
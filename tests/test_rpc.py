@@ -0,0 +1,155 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterator, List
+
+import pytest
+
+from rpc import RawJSONRPC, RPCPool
+
+
+class StubNode:
+    """
+    JSON-RPC server answering `eth_blockNumber` with its own `block`, after
+    `delay` seconds, or with an HTTP `status` / JSON-RPC `error` instead.
+    """
+
+    def __init__(self, block: int, delay=0.0, status=200, error=None) -> None:
+        self.block = block
+        self.delay = delay
+        self.status = status
+        self.error = error
+        self.requests: List = []
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self) -> None:
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                node.requests.append(body)
+                time.sleep(node.delay)
+                if node.status != 200:
+                    self.send_response(node.status)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                if isinstance(body, list):
+                    # Nodes may answer a batch in any order
+                    resp = [node.reply(req) for req in reversed(body)]
+                else:
+                    resp = node.reply(body)
+                data = json.dumps(resp).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args) -> None:
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def reply(self, req: dict) -> dict:
+        if self.error is not None:
+            return {"jsonrpc": "2.0", "id": req["id"], "error": self.error}
+        if req["method"] == "eth_blockNumber":
+            result = hex(self.block)
+        else:
+            result = req["params"]
+        return {"jsonrpc": "2.0", "id": req["id"], "result": result}
+
+
+@pytest.fixture
+def nodes() -> Iterator[List[StubNode]]:
+    started: List[StubNode] = []
+    yield started
+    for node in started:
+        node.server.shutdown()
+        node.server.server_close()
+
+
+def make_pool(nodes: List[StubNode], **kwargs) -> RPCPool:
+    pool = RPCPool([node.url for node in nodes], timeout=5, **kwargs)
+    # Rank the endpoints in the order of `nodes`
+    for rank, ep in enumerate(pool.endpoints, 1):
+        ep.latency = rank * 1e-3
+    return pool
+
+
+def test_call_and_batch_results(nodes):
+    nodes.append(StubNode(block=100))
+    client = RawJSONRPC(make_pool(nodes))
+    assert client.call("eth_blockNumber", []) == "0x64"
+    assert client.batch(
+        [("eth_blockNumber", []), ("eth_getBalance", ["0xab", "latest"])]
+    ) == ["0x64", ["0xab", "latest"]]
+
+
+def test_fails_over_on_http_error(nodes):
+    nodes.extend([StubNode(block=1, status=503), StubNode(block=2)])
+    pool = make_pool(nodes)
+    assert RawJSONRPC(pool).call("eth_blockNumber", []) == "0x2"
+    assert pool.endpoints[0].failures == 1
+    assert pool.endpoints[1].failures == 0
+
+
+def test_fails_over_on_rate_limit_error(nodes):
+    limited = {"code": -32005, "message": "request rate limited"}
+    nodes.extend([StubNode(block=1, error=limited), StubNode(block=2)])
+    pool = make_pool(nodes)
+    assert RawJSONRPC(pool).call("eth_blockNumber", []) == "0x2"
+    assert len(nodes[0].requests) == len(nodes[1].requests) == 1
+
+
+def test_call_error_is_raised(nodes):
+    nodes.append(StubNode(block=1, error={"code": 3, "message": "reverted"}))
+    with pytest.raises(ValueError, match="reverted"):
+        RawJSONRPC(make_pool(nodes)).call("eth_call", [{}, "latest"])
+
+
+def test_all_endpoints_failing_raises(nodes):
+    nodes.extend([StubNode(block=1, status=500), StubNode(block=2, status=502)])
+    with pytest.raises(Exception, match="502"):
+        RawJSONRPC(make_pool(nodes)).call("eth_blockNumber", [])
+
+
+def test_slow_request_is_hedged_once(nodes):
+    nodes.extend(
+        [
+            StubNode(block=1, delay=0.3),
+            StubNode(block=2, delay=0.3),
+            StubNode(block=3),
+        ]
+    )
+    pool = make_pool(nodes)
+    # A 10ms p95 on the best endpoint triggers the hedge
+    pool.endpoints[0].samples.extend([0.01] * 20)
+    client = RawJSONRPC(pool)
+    assert client.call("eth_getTransactionByHash", ["0x01"]) == ["0x01"]
+    assert len(nodes[0].requests) == len(nodes[1].requests) == 1
+    # The third endpoint is only a failover target, never a second hedge
+    assert nodes[2].requests == []
+
+
+def test_unhedged_request_waits_for_best_endpoint(nodes):
+    nodes.extend([StubNode(block=1, delay=0.1), StubNode(block=2)])
+    pool = make_pool(nodes)
+    pool.endpoints[0].samples.extend([0.01] * 20)
+    assert RawJSONRPC(pool).call("eth_blockNumber", [], hedge=False) == "0x1"
+    assert nodes[1].requests == []
+
+
+def test_build_rpc_pool_requires_provider_url(monkeypatch):
+    import main
+
+    monkeypatch.delenv("WEB3_PROVIDER_URL", raising=False)
+    with pytest.raises(ValueError, match="WEB3_PROVIDER_URL is not set"):
+        main.build_rpc_pool()
+    monkeypatch.setenv("WEB3_PROVIDER_URL", "http://a, http://b,")
+    assert [ep.url for ep in main.build_rpc_pool().endpoints] == [
+        "http://a",
+        "http://b",
+    ]
@@ -0,0 +1,46 @@
+import time
+
+from rpccache import DiskLRU
+
+
+def test_hits_defer_access_time_writes(tmp_path):
+    store = DiskLRU(str(tmp_path / "cache.sqlite"), touch_batch=3)
+    for key in ("a", "b", "c"):
+        store.set(key, b"x")
+    writes = store._conn.total_changes
+    assert store.get("a") == b"x"
+    assert store.get("b") == b"x"
+    assert store.get("a") == b"x"
+    assert store.get("missing") is None
+    assert store._conn.total_changes == writes
+    # The third key read writes the batch back
+    store.get("c")
+    assert store._conn.total_changes == writes + 3
+    mode = store._conn.execute("PRAGMA journal_mode").fetchone()[0]
+    assert mode == "wal"
+    store.close()
+
+
+def test_eviction_uses_deferred_access_times(tmp_path):
+    store = DiskLRU(str(tmp_path / "cache.sqlite"), max_bytes=3, touch_batch=100)
+    for key in ("a", "b", "c"):
+        store.set(key, b"x")
+    # "a" was written first but read last, "b" is the least recently used
+    store.get("a")
+    store.set("d", b"x")
+    assert store.get("b") is None
+    assert [store.get(key) for key in ("a", "c", "d")] == [b"x"] * 3
+
+
+def test_close_writes_pending_access_times(tmp_path):
+    path = str(tmp_path / "cache.sqlite")
+    store = DiskLRU(path, touch_batch=100)
+    store.set("a", b"x")
+    (written,) = store._conn.execute("SELECT atime FROM responses").fetchone()
+    time.sleep(0.01)
+    store.get("a")
+    store.close()
+    store = DiskLRU(path)
+    (read,) = store._conn.execute("SELECT atime FROM responses").fetchone()
+    assert read > written
+    assert store.size == 1
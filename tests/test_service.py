@@ -0,0 +1,96 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from aiohttp.test_utils import TestClient, TestServer
+
+from service import DecoderService, MicroBatcher
+
+GOOD = "0x" + "11" * 32
+BAD = "0x" + "ba" * 32
+MISSING = "0x" + "00" * 32
+
+
+class FakeBatchDecoder:
+    """
+    Fails any batch holding the BAD hash, answers MISSING with a LookupError.
+    """
+
+    def __init__(self) -> None:
+        self.batches = []
+
+    def decode_txs(self, txhashes):
+        self.batches.append(list(txhashes))
+        if BAD in txhashes:
+            raise RuntimeError("receipt is malformed")
+        return [
+            LookupError(f"Transaction {txhash} not found")
+            if txhash == MISSING
+            else {"txhash": txhash, "actions": []}
+            for txhash in txhashes
+        ]
+
+    def decode_logs(self, batch):
+        return [[log["address"] for log in logs] for logs in batch]
+
+
+async def _request(service: DecoderService, requests):
+    async with TestClient(TestServer(service.app())) as client:
+        responses = await asyncio.gather(
+            *(client.post(path, data=body) for path, body in requests)
+        )
+        return [(resp.status, await resp.text()) for resp in responses]
+
+
+def request(requests, window=0.05):
+    service = DecoderService(FakeBatchDecoder(), window=window)
+    return service, asyncio.run(_request(service, requests))
+
+
+def test_failing_item_does_not_fail_its_batch():
+    async def run():
+        batcher = MicroBatcher(FakeBatchDecoder().decode_txs, executor, window=0.05)
+        return await asyncio.gather(
+            *(batcher.submit(txhash) for txhash in (GOOD, BAD, MISSING)),
+            return_exceptions=True,
+        )
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        good, bad, missing = asyncio.run(run())
+    assert good == {"txhash": GOOD, "actions": []}
+    assert isinstance(bad, RuntimeError)
+    assert isinstance(missing, LookupError)
+
+
+def test_coalesced_requests_fail_alone():
+    service, responses = request(
+        [
+            ("/tx", f'{{"txhash": "{GOOD}"}}'),
+            ("/tx", f'{{"txhash": "{BAD}"}}'),
+            ("/tx", f'{{"txhash": "{MISSING}"}}'),
+        ]
+    )
+    assert [status for status, _ in responses] == [200, 502, 404]
+    assert service.txs.stats()["batches"] == 1
+
+
+def test_invalid_bodies_are_rejected():
+    bodies = [
+        ("/tx", "[1, 2]"),
+        ("/tx", '"0x11"'),
+        ("/tx", "{not json"),
+        ("/tx", '{"txhash": "0x1234"}'),
+        ("/tx", f'{{"txhashes": "{GOOD}"}}'),
+        ("/logs", '{"logs": [1]}'),
+        ("/logs", '{"logs": [{"address": "0xa"}]}'),
+        ("/logs", "null"),
+    ]
+    service, responses = request(bodies)
+    assert [status for status, _ in responses] == [400] * len(bodies)
+    assert service.decoder.batches == []
+
+
+def test_logs_are_decoded():
+    _, responses = request(
+        [("/logs", '{"logs": [{"address": "0xa", "topics": ["0x00"], "data": "0x"}]}')]
+    )
+    assert responses == [(200, '{"actions": ["0xa"]}')]
@@ -0,0 +1,19 @@
+from decimal import Decimal
+
+from utils import make_token_scale
+
+
+def test_token_amounts_print_in_plain_notation():
+    scale = make_token_scale(18)
+    assert str(scale(1_500_000_000_000_000_000)) == "1.5"
+    assert str(scale(1000)) == "0.000000000000001"
+    assert f"{scale(10**21)}" == "1000"
+    assert "{amount}".format(amount=scale(0)) == "0"
+
+
+def test_token_amounts_are_exact():
+    digits = str(2**256 - 1)
+    amount = make_token_scale(18)(2**256 - 1)
+    assert str(amount) == f"{digits[:-18]}.{digits[-18:]}"
+    scale = make_token_scale(6)
+    assert [scale(2_500_000), scale(0)] == [Decimal("2.5"), 0]
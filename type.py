@@ -3,6 +3,7 @@ from typing import TypedDict, List
 LogDict = TypedDict(
     "LogDict",
     {
+        "blknum": int,
         "logpos": int,
         "address": str,
         "topics": List[str],
@@ -14,6 +15,7 @@ TxDict = TypedDict(
     "TxDict",
     {
         "txhash": str,
+        "blknum": int,
         "from": str,
         "to": str,
         "block_timestamp": int,
@@ -1,11 +1,40 @@
 import json
-import requests
-from model import Log
-from decimal import Decimal
-import pandas as pd
-from datetime import datetime, timezone
-
-_addr_labels = json.load(open("addr_labels.json", "r"))
+import os
+import tempfile
+from decimal import Context, Decimal
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Dict
+from datetime import datetime
+
+if TYPE_CHECKING:
+    from calldata import CalldataDecoder
+
+
+@lru_cache(maxsize=None)
+def _addr_labels() -> Dict[str, dict]:
+    # Only loaded once an address is first formatted
+    with open("addr_labels.json", "r") as f:
+        return json.load(f)
+
+
+def dump_json_atomic(obj: Any, path: str) -> None:
+    """
+    Writes `obj` as JSON to `path` through a temporary file of its own in the
+    same directory, so that concurrent writers never mix their output and
+    readers only ever see a complete file.
+    """
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(os.path.abspath(path)),
+        prefix=f".{os.path.basename(path)}.",
+        suffix=".tmp",
+    )
+    try:
+        with os.fdopen(fd, "w") as f:
+            json.dump(obj, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
 
 
 def truncate_addr(addr: str, offset: int = 4) -> str:
@@ -14,8 +43,9 @@ def truncate_addr(addr: str, offset: int = 4) -> str:
 
 def get_addr_entry(addr: str, inplace: bool = True) -> str:
     addr = addr.lower()
-    if addr in _addr_labels:
-        label: dict = _addr_labels[addr]
+    addr_labels = _addr_labels()
+    if addr in addr_labels:
+        label: dict = addr_labels[addr]
         name = label.get("name", "")
         name_str = f"{name}"
         labels = label.get("labels", [])
@@ -28,6 +58,53 @@ def get_addr_entry(addr: str, inplace: bool = True) -> str:
         return f"{truncate_addr(addr)}"
 
 
+# Wide enough to multiply any uint256 amount by a scale factor without rounding
+_DECIMAL_CTX = Context(prec=100)
+
+
+class TokenAmount(Decimal):
+    """
+    Scaled token amount, printed in plain notation without trailing zeros
+    ("1.5" rather than "1.500000000000000000", "0.000000000000001" rather
+    than "1E-15").
+    """
+
+    __slots__ = ()
+
+    def __str__(self) -> str:
+        return format(self, "f")
+
+    def __format__(self, spec: str) -> str:
+        return super().__format__(spec or "f")
+
+
+_ZERO = TokenAmount(0)
+
+
+class TokenScale:
+    """
+    Exact fixed-point conversion of raw token amounts for a number of decimals.
+    """
+
+    __slots__ = ("decimals", "factor")
+
+    def __init__(self, decimals: int) -> None:
+        self.decimals = decimals
+        self.factor = Decimal(1).scaleb(-decimals)
+
+    def __call__(self, amount: int) -> TokenAmount:
+        if not amount:
+            return _ZERO
+        return TokenAmount(
+            _DECIMAL_CTX.multiply(Decimal(amount), self.factor).normalize(_DECIMAL_CTX)
+        )
+
+
+@lru_cache(maxsize=None)
+def make_token_scale(decimals: int) -> TokenScale:
+    return TokenScale(decimals)
+
+
 def get_gas_entry(gas: int) -> str:
     return f"{gas} Gwei"
 
@@ -46,33 +123,29 @@ def get_status_entry(status: int) -> str:
 
 def decode_hex_to_utf8(hex: str) -> str | None:
     try:
-        bytes_data = bytes.fromhex(hex.lstrip("0x"))
+        # Only strip the prefix, lstrip("0x") would also eat leading zero nibbles
+        bytes_data = bytes.fromhex(hex[2:] if hex.startswith("0x") else hex)
         decoded_text = bytes_data.decode("utf-8")
         transformed_text = decoded_text.lower()
         return transformed_text
-    except UnicodeDecodeError:
+    except (UnicodeDecodeError, ValueError):
         return None
 
 
-def get_input_entry(input: str, evt_df: pd.DataFrame) -> str:
-    # Check if input is empty
-    if input == "0x":
+def get_input_entry(input: str, decoder: "CalldataDecoder") -> str:
+    decoded = decoder.decode(input)
+    kind = decoded["kind"]
+    if kind == "empty":
         return ""
-
-    # Try to decode as utf-8
-    decoded_text = decode_hex_to_utf8(input)
-    if decoded_text:
-        return f"Message: {decoded_text}"
-
-    # Try to decode as function signature
-    byte_sign = input[:10]
-    filtered = evt_df["byte_sign"] == byte_sign
-    candidate = evt_df[filtered][["abi", "text_sign"]].values
-    if len(candidate) == 0:
-        return f"Call Method: {byte_sign}"
-
-    abi, text_sign = candidate[0]
-    return f"Call Method: {text_sign}"
+    if kind == "text":
+        return f"Message: {decoded['message']}"
+    if not decoded["text_sign"]:
+        return f"Call Method: {decoded['selector']}"
+
+    entry = f"Call Method: {decoded['text_sign']}"
+    for name, value in decoded["params"].items():
+        entry += f"\n    {name}: {value}"
+    return entry
     # url = "https://www.4byte.directory/api/v1/signatures"
     # candidates = requests.get(url, params={"hex_signature": func_sig}).json()
     # if not candidates or not candidates.get("result", []):